@@ -0,0 +1,62 @@
+# ------------------------------------------------------------------------------
+#  Created by Tyler Stegmaier.
+
+# ------------------------------------------------------------------------------
+
+import timeit
+import tracemalloc
+from typing import *
+
+
+
+
+__all__ = ['Measure', 'Compare', 'PeakMemory', 'RetainedMemory']
+
+def Measure(name: str, func: Callable[[], Any], *, number: int = 1, repeat: int = 3) -> float:
+    """
+        Runs func `number` times per round, `repeat` rounds, and prints the best time per call.
+
+    :return: best time per call in seconds
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print(f'{name:<60} {best * 1000:>12.3f} ms')
+    return best
+
+def Compare(title: str, baseline: Tuple[str, Callable[[], Any]], *candidates: Tuple[str, Callable[[], Any]], number: int = 1, repeat: int = 3) -> Dict[str, float]:
+    """ Measures the baseline and every candidate, printing the speed up of each candidate over the baseline. """
+    print()
+    print(title)
+    print('-' * len(title))
+
+    name, func = baseline
+    results = { name: Measure(name, func, number=number, repeat=repeat) }
+    for name, func in candidates:
+        results[name] = Measure(name, func, number=number, repeat=repeat)
+        print(f'{"":<60} {results[baseline[0]] / results[name]:>12.2f} x')
+
+    return results
+
+def PeakMemory(name: str, func: Callable[[], Any]) -> int:
+    """ Runs func once under tracemalloc and prints the peak traced allocation. """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(f'{name:<60} {peak / 1024 ** 2:>12.3f} MB peak')
+    return peak
+
+def RetainedMemory(name: str, func: Callable[[], Any], count: int = 1) -> int:
+    """ Runs func once under tracemalloc and prints the memory still held by its result, in total and per item when count is given. """
+    tracemalloc.start()
+    try:
+        result = func()
+        current, _ = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    print(f'{name:<60} {current / 1024 ** 2:>12.3f} MB {current / count:>10.1f} B / item')
+    return current
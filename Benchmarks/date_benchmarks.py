@@ -0,0 +1,67 @@
+# ------------------------------------------------------------------------------
+#  Created by Tyler Stegmaier.
+
+# ------------------------------------------------------------------------------
+
+"""
+    python -m Benchmarks.date_benchmarks [elements ...]
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from PythonExtensions.Dates import DateTimeParser
+from PythonExtensions.Json import BaseObjectModel
+
+from . import Compare
+
+
+
+
+def CreateColumns(count: int):
+    start = datetime(2021, 1, 1)
+    return dict(iso=[(start + timedelta(seconds=i * 37)).isoformat() for i in range(count)],
+                us=[(start + timedelta(seconds=i * 37)).strftime('%m/%d/%Y %I:%M:%S %p') for i in range(count)],
+                seconds=[str(i) for i in range(count)],
+                durations=[f'{i % 24}hr{i % 60}m{i % 59}s' for i in range(count)])
+
+
+
+def PerElement(convert, values):
+    parser = DateTimeParser()
+    return [convert(v, parser=parser) for v in values]
+
+def column_benchmarks(count: int):
+    columns = CreateColumns(count)
+
+    for name in ('iso', 'us'):
+        values = columns[name]
+        assert DateTimeParser().ParseDateTimes(values[:1000]) == list(map(DateTimeParser().ParseDateTime, values[:1000]))
+
+        # a fresh parser every round, so the per element loop can not be served from a warm cache.
+        Compare(f'{count} {name} timestamps',
+                ('convert_date_time per element', lambda: PerElement(BaseObjectModel.convert_date_time, values)),
+                ('convert_date_times', lambda: BaseObjectModel.convert_date_times(values, parser=DateTimeParser())),
+                ('convert_date_times(processes=None)', lambda: BaseObjectModel.convert_date_times(values, parser=DateTimeParser(), processes=None)),
+                repeat=1)
+
+    for name in ('seconds', 'durations'):
+        values = columns[name]
+        assert DateTimeParser().ParseTimeDeltas(values[:1000]) == list(map(DateTimeParser().ParseTimeDelta, values[:1000]))
+
+        Compare(f'{count} {name} durations',
+                ('convert_time_delta per element', lambda: PerElement(BaseObjectModel.convert_time_delta, values)),
+                ('convert_time_deltas', lambda: BaseObjectModel.convert_time_deltas(values, parser=DateTimeParser())),
+                ('convert_time_deltas(processes=None)', lambda: BaseObjectModel.convert_time_deltas(values, parser=DateTimeParser(), processes=None)),
+                repeat=1)
+
+
+
+def main(*counts: int):
+    for count in counts or (10_000, 1_000_000):
+        column_benchmarks(count)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,230 @@
+# ------------------------------------------------------------------------------
+#  Created by Tyler Stegmaier.
+
+# ------------------------------------------------------------------------------
+
+"""
+    python -m Benchmarks.file_benchmarks [size in MB]
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from typing import *
+
+from aiofiles import open as async_open
+
+from PythonExtensions.Files import FileIO, FilePath
+from PythonExtensions.Files.Hashing import *
+from PythonExtensions.Files.MultiThreadedCopier import *
+from PythonExtensions.Files.Sync import *
+
+from . import Compare, Measure, PeakMemory
+
+
+
+
+def legacy_hash_id(path: str, BlockSize: int = 65536) -> str:
+    """ FilePath.GetHashID before HashFile: sha1 over read() calls of BlockSize. """
+    _hasher = hashlib.sha1()
+    with open(path, 'rb') as f:
+        buf = f.read(BlockSize)
+        while len(buf) > 0:
+            _hasher.update(buf)
+            buf = f.read(BlockSize)
+    return base64.urlsafe_b64encode(_hasher.digest()).decode()
+
+async def legacy_copy_to_async(source: str, destination: str):
+    """ FileIO.CopyToAsync before the chunked copy: the whole file in one read. """
+    async with async_open(destination, 'wb') as out:
+        async with async_open(source, 'rb') as _in:
+            await out.write(await _in.read())
+
+def CreateFile(root: str, size: int, name: str = 'data.bin') -> str:
+    path = os.path.join(root, name)
+    block = os.urandom(1 << 20)
+    with open(path, 'wb') as f:
+        for _ in range(size // len(block)): f.write(block)
+        f.write(block[:size % len(block)])
+    return path
+
+
+
+def hash_benchmarks(size: int):
+    with tempfile.TemporaryDirectory() as root:
+        path = CreateFile(root, size)
+        assert legacy_hash_id(path) == HashFile(path) == HashFile(path, memory_map=False)
+
+        # the file was just written, so it is hashed from the page cache: these are cpu / copy costs, not disk throughput.
+        title = f'hash a {size / 1024 ** 2:.0f} MB file (page cache)'
+        print()
+        print(title)
+        print('-' * len(title))
+        for name, func in (('legacy: sha1, read() 64 KB blocks', lambda: legacy_hash_id(path)),
+                           ('HashFile: sha1, mmap', lambda: HashFile(path)),
+                           ('HashFile: sha1, readinto', lambda: HashFile(path, memory_map=False)),
+                           ('HashFile: sha256', lambda: HashFile(path, 'sha256')),
+                           ('HashFile: blake2b', lambda: HashFile(path, 'blake2b')),
+                           (f'HashFile: fast ({NewHasher("fast").name})', lambda: HashFile(path, 'fast'))):
+            elapsed = Measure(name, func)
+            print(f'{"":<60} {size / 1024 ** 2 / elapsed:>12.0f} MB/s')
+
+        Measure('HashFile: sha1, partial=64 KB', lambda: HashFile(path, partial=65536))
+
+
+
+def CreateTree(root: str, files: int, size: int, per_folder: int = 100) -> str:
+    """ files of size bytes (distinct contents), per_folder per sub folder, with mtimes in the past (see HashIndex racy) """
+    tree = os.path.join(root, 'tree')
+    block = os.urandom(size)
+    for i in range(files):
+        folder = os.path.join(tree, str(i // per_folder))
+        if i % per_folder == 0: os.makedirs(folder)
+        path = os.path.join(folder, f'{i}.bin')
+        with open(path, 'wb') as f:
+            f.write(i.to_bytes(8, 'little'))
+            f.write(block)
+        os.utime(path, (0, 1_600_000_000))
+
+    return tree
+
+def index_benchmarks(files: int, size: int):
+    with tempfile.TemporaryDirectory() as root:
+        tree = CreateTree(root, files, size)
+        database = os.path.join(root, 'hashes.db')
+        paths = [os.path.join(folder, name) for folder, _, names in os.walk(tree) for name in names]
+
+        def cold():
+            if os.path.exists(database): os.remove(database)
+            with HashIndex(database) as index: index.HashDirectory(tree)
+
+        def warm():
+            with HashIndex(database) as index: index.HashDirectory(tree)
+
+        cold()
+        Compare(f'hash a tree of {files} files of {size / 1024:.0f} KB',
+                ('HashFile per file', lambda: [HashFile(path) for path in paths]),
+                ('HashIndex.HashDirectory, empty index', cold),
+                ('HashIndex.HashDirectory, after a restart (unchanged tree)', warm))
+
+def copy_benchmarks(files: int, size: int):
+    with tempfile.TemporaryDirectory() as root:
+        tree = CreateTree(root, files, size)
+        destination = os.path.join(root, 'copy')
+
+        def copy(func: Callable[[], Any]) -> Callable[[], Any]:
+            def run():
+                # removing the previous copy and flushing it to disk are part of every measurement, so no candidate pays for the writes of another
+                shutil.rmtree(destination, ignore_errors=True)
+                os.sync()
+                func()
+            return run
+
+        def copier(workers: int) -> Callable[[], Any]:
+            def run():
+                with MultiThreadedCopier(workers) as c: c.CopyTree(tree, destination)
+            return copy(run)
+
+        Compare(f'copy a tree of {files} files of {size / 1024:.0f} KB',
+                ('shutil.copytree', copy(lambda: shutil.copytree(tree, destination))),
+                ('MultiThreadedCopier.CopyTree, 1 worker', copier(1)),
+                ('MultiThreadedCopier.CopyTree, 4 workers', copier(4)),
+                ('MultiThreadedCopier.CopyTree, 16 workers', copier(16)))
+
+def sync_benchmarks(files: int, size: int):
+    with tempfile.TemporaryDirectory() as root:
+        tree = CreateTree(root, files, size)
+        destination = os.path.join(root, 'mirror')
+        Measure('SyncDirectory, first sync', lambda: SyncDirectory(tree, destination), repeat=1)
+        report = SyncDirectory(tree, destination)
+        assert not report.Changed and report.unchanged == files, report
+
+        Compare(f'mirror an unchanged tree of {files} files of {size / 1024:.0f} KB',
+                ('shutil.copytree(dirs_exist_ok=True), copies everything', lambda: shutil.copytree(tree, destination, dirs_exist_ok=True)),
+                ('SyncDirectory', lambda: SyncDirectory(tree, destination)),
+                ('SyncDirectory, dry run', lambda: SyncDirectory(tree, destination, dry_run=True)))
+
+def copy_async_benchmarks(size: int, files: int = 64):
+    with tempfile.TemporaryDirectory() as root:
+        path = CreateFile(root, size)
+        destination = os.path.join(root, 'copy.bin')
+        source = FileIO(FilePath(path))
+
+        Compare(f'copy a {size / 1024 ** 2:.0f} MB file with asyncio',
+                ('legacy CopyToAsync: one read', lambda: asyncio.run(legacy_copy_to_async(path, destination))),
+                ('CopyToAsync: 1 MB chunks', lambda: asyncio.run(source.CopyToAsync(destination))),
+                ('CopyToAsync: 8 MB chunks', lambda: asyncio.run(source.CopyToAsync(destination, buffer_size=8 << 20))))
+        print()
+        PeakMemory('legacy CopyToAsync: one read', lambda: asyncio.run(legacy_copy_to_async(path, destination)))
+        PeakMemory('CopyToAsync: 1 MB chunks', lambda: asyncio.run(source.CopyToAsync(destination)))
+
+        os.remove(path)
+        sources = [CreateFile(root, size // files, f'{i}.bin') for i in range(files)]
+        pairs = [(path, os.path.join(root, f'copy {i}.bin')) for i, path in enumerate(sources)]
+
+        async def one_by_one():
+            for path, target in pairs: await FileIO(FilePath(path)).CopyToAsync(target)
+
+        Compare(f'copy {files} files of {size / files / 1024 ** 2:.0f} MB with asyncio',
+                ('CopyToAsync, one at a time', lambda: asyncio.run(one_by_one())),
+                ('CopyManyAsync, concurrency=8', lambda: asyncio.run(FileIO.CopyManyAsync(pairs))),
+                ('CopyManyAsync, concurrency=32', lambda: asyncio.run(FileIO.CopyManyAsync(pairs, concurrency=32))))
+
+def CreateLog(root: str, size: int) -> str:
+    path = os.path.join(root, 'log.txt')
+    block = ''.join(f'2022-01-01 00:00:{i % 60:02} INFO request {i} served in {i % 997} ms, {"é" * (i % 7)} status=200\n' for i in range(10_000)).encode()
+    with open(path, 'wb') as f:
+        for _ in range(size // len(block)): f.write(block)
+    return path
+
+def read_benchmarks(size: int):
+    with tempfile.TemporaryDirectory() as root:
+        file = FileIO(FilePath(CreateLog(root, size)))
+
+        def count_lines(lines: Iterable) -> int: return sum(1 for _ in lines)
+        def text_mode() -> int:
+            with open(file, encoding='utf-8') as f: return count_lines(f)
+
+        title = f'scan a {size / 1024 ** 2:.0f} MB log'
+        Compare(f'{title}: bytes',
+                ('ReadBytes', lambda: len(file.ReadBytes())),
+                ('IterChunks', lambda: sum(map(len, file.IterChunks()))),
+                ('IterChunksAsync', lambda: asyncio.run(_sum_async(file.IterChunksAsync()))))
+        Compare(f'{title}: lines',
+                ('Read().split', lambda: count_lines(file.Read().split('\n'))),
+                ('open() text mode iteration', text_mode),
+                ('IterLines', lambda: count_lines(file.IterLines())),
+                ('IterLinesAsync', lambda: asyncio.run(_sum_async(file.IterLinesAsync()))))
+        Compare(f'{title}: records',
+                ('ReadBytes().split', lambda: count_lines(file.ReadBytes().split(b'\n'))),
+                ('IterRecords', lambda: count_lines(file.IterRecords())))
+
+        print()
+        PeakMemory('Read', file.Read)
+        PeakMemory('IterLines', lambda: count_lines(file.IterLines()))
+        PeakMemory('IterRecords', lambda: count_lines(file.IterRecords()))
+
+async def _sum_async(iterator: AsyncIterator) -> int:
+    total = 0
+    async for item in iterator: total += len(item)
+    return total
+
+
+
+def main(size: int = 1024):
+    hash_benchmarks(size * 1024 ** 2)
+    index_benchmarks(10_000, 64 * 1024)
+    copy_benchmarks(10_000, 4 * 1024)
+    copy_benchmarks(4, size // 4 * 1024 ** 2)
+    sync_benchmarks(100_000, 1024)
+    copy_async_benchmarks(size * 1024 ** 2)
+    read_benchmarks(size // 4 * 1024 ** 2)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,374 @@
+# ------------------------------------------------------------------------------
+#  Created by Tyler Stegmaier.
+
+# ------------------------------------------------------------------------------
+
+"""
+    python -m Benchmarks.json_benchmarks [records]
+"""
+
+import copy
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+from enum import Enum
+from json import dumps
+
+from dateutil import parser
+
+from PythonExtensions.BinaryFormat import BinaryFormat
+from PythonExtensions.Dates import DateTimeParser
+from PythonExtensions.Files import FilePath
+
+from PythonExtensions.Json import *
+from PythonExtensions.JsonBackends import *
+from PythonExtensions.JsonPatch import *
+from PythonExtensions.Misc import get_size
+
+from . import Compare, Measure, PeakMemory
+
+
+
+
+class Status(Enum):
+    Active = 'active'
+    Inactive = 'inactive'
+
+
+
+class Tags(BaseSetModel[str]): pass
+
+
+
+class Record(BaseDictModel[str, object]): pass
+
+
+
+class Records(BaseListModel[Record]): pass
+
+
+
+@BinaryFormat.Register
+class Location(object):
+    __slots__ = ['x', 'y']
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    def ToDict(self): return dict(x=self.x, y=self.y)
+
+
+
+def CreateRecords(count: int) -> Records:
+    now = datetime.now()
+    return Records(Record(id=i,
+                          name=f'record {i}',
+                          status=Status.Active if i % 2 else Status.Inactive,
+                          created=now,
+                          start=time(hour=i % 24),
+                          duration=timedelta(seconds=i),
+                          tags=Tags({ 'a', 'b' }),
+                          location=Location(i, -i))
+                   for i in range(count))
+
+
+
+def legacy_serialize(obj):
+    """ BaseObjectModel._serialize before the JsonSerializers cache. """
+    if isinstance(obj, Enum): return obj.value
+
+    if isinstance(obj, time): return obj.isoformat()
+
+    if isinstance(obj, datetime): return obj.isoformat()
+
+    if isinstance(obj, timedelta): return obj.total_seconds()
+
+    if isinstance(obj, BaseSetModel): return obj.ToList()
+
+    if isinstance(obj, BaseListModel): return obj
+
+    if isinstance(obj, BaseDictModel): return obj.ToDict()
+
+    if hasattr(obj, 'ToList') and callable(obj.ToList): return obj.ToList()
+
+    if hasattr(obj, 'ToTuple') and callable(obj.ToTuple): return obj.ToTuple()
+
+    if hasattr(obj, 'ToDict') and callable(obj.ToDict): return obj.ToDict()
+
+    return obj
+
+def legacy_to_dict(o):
+    """ BaseObjectModel._ToDict before the JsonSerializers cache. """
+    d = { }
+    for key, value in o.items():
+        if isinstance(value, Enum): d[key] = value.value
+        elif isinstance(value, BaseListModel): d[key] = value
+        elif isinstance(value, BaseSetModel): d[key] = value.ToList()
+        elif isinstance(value, BaseDictModel): d[key] = value.ToDict()
+        elif hasattr(value, 'ToList') and callable(value.ToList): d[key] = value.ToList()
+        elif hasattr(value, 'ToTuple') and callable(value.ToTuple): d[key] = value.ToTuple()
+        elif hasattr(value, 'ToDict') and callable(value.ToDict): d[key] = value.ToDict()
+        elif hasattr(value, 'ToString') and callable(value.ToString): d[key] = value.ToString()
+        else: d[key] = value
+    return d
+
+
+
+def serializer_benchmarks(records: Records):
+    assert dumps(records, indent=4, default=legacy_serialize) == records.ToJsonString()
+
+    Compare(f'ToJsonString: {len(records)} records',
+            ('legacy isinstance / hasattr chain', lambda: dumps(records, indent=4, default=legacy_serialize)),
+            ('JsonSerializers', lambda: records.ToJsonString()))
+
+    Compare(f'_ToDict: {len(records)} records',
+            ('legacy isinstance / hasattr chain', lambda: [legacy_to_dict(r) for r in records]),
+            ('JsonSerializers', lambda: [r.ToDict() for r in records]))
+
+
+
+def stream_benchmarks(records: Records):
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'records.json')
+
+        def to_json_string():
+            with open(path, 'w') as f: f.write(records.ToJsonString())
+
+        def to_json_stream(): records.ToJsonStream(path)
+
+        Compare(f'write {len(records)} records to disk',
+                ('ToJsonString + write', to_json_string),
+                ('ToJsonStream', to_json_stream))
+
+        PeakMemory('ToJsonString + write', to_json_string)
+        PeakMemory('ToJsonStream', to_json_stream)
+
+
+
+def parse_stream_benchmarks(records: Records):
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'records.json')
+        records.ToJsonStream(path, indent=None)
+
+        def from_json():
+            with open(path) as f:
+                for _ in Records.FromJson(f.read()): pass
+
+        def from_json_stream():
+            for _ in Records.FromJsonStream(path): pass
+
+        Compare(f'read {len(records)} records from disk',
+                ('read + FromJson', from_json),
+                ('FromJsonStream', from_json_stream))
+
+        PeakMemory('read + FromJson', from_json)
+        PeakMemory('FromJsonStream', from_json_stream)
+
+
+
+def backend_benchmarks(records: Records):
+    title = f'json backends: {len(records)} records'
+    print()
+    print(title)
+    print('-' * len(title))
+
+    for name in JsonBackends.Names():
+        backend = JsonBackends.Get(name)
+        document = records.ToJsonString(None, backend=backend)
+        size = len(document.encode()) / 1024 ** 2
+
+        elapsed = Measure(f'{name}: ToJsonString(indent=None)', lambda: records.ToJsonString(None, backend=backend))
+        print(f'{"":<60} {size / elapsed:>12.2f} MB/s')
+
+        elapsed = Measure(f'{name}: FromJson', lambda: Records.FromJson(document, backend=backend))
+        print(f'{"":<60} {size / elapsed:>12.2f} MB/s')
+
+
+
+def clone_benchmarks(records: Records):
+    plain = Records.FromJson(records.ToJsonString())
+    Compare(f'Clone: {len(plain)} records decoded from json',
+            ('copy.deepcopy', lambda: copy.deepcopy(plain)),
+            ('Clone()', lambda: plain.Clone()),
+            ('Clone(copy_on_write=True)', lambda: plain.Clone(copy_on_write=True)))
+
+    Compare(f'Clone: {len(records)} records',
+            ('copy.deepcopy', lambda: copy.deepcopy(records)),
+            ('Clone()', lambda: records.Clone()),
+            ('Clone(copy_on_write=True)', lambda: records.Clone(copy_on_write=True)))
+
+    PeakMemory('copy.deepcopy', lambda: copy.deepcopy(records))
+    PeakMemory('Clone()', lambda: records.Clone())
+    PeakMemory('Clone(copy_on_write=True)', lambda: records.Clone(copy_on_write=True))
+
+
+
+def legacy_parse_date_time(value: str):
+    """ BaseObjectModel.parse_date_time before DateTimeParser. """
+    if value == str(None): return None
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parser.parse(value)
+
+def parse_benchmarks(count: int):
+    start = datetime(2021, 1, 1)
+    unique = [(start + timedelta(seconds=i * 37)).strftime('%m/%d/%Y %I:%M:%S %p') for i in range(count)]
+    repeated = unique[:100] * (count // 100)
+
+    for title, values in ((f'parse {len(unique)} unique non-iso timestamps', unique), (f'parse {len(repeated)} timestamps, 100 distinct', repeated)):
+        assert list(map(legacy_parse_date_time, values[:1000])) == list(map(DateTimeParser().ParseDateTime, values[:1000]))
+
+        # a fresh parser every round, so the rounds measure learning the format and filling the cache too.
+        Compare(title,
+                ('fromisoformat / dateutil', lambda: list(map(legacy_parse_date_time, values))),
+                ('DateTimeParser', lambda: list(map(DateTimeParser().ParseDateTime, values))))
+
+
+
+def typed_from_json(document: str, backend: str = None) -> Records:
+    """ FromJson plus the conversions needed to get back the same objects FromBytes returns. """
+    records = Records.FromJson(document, backend=backend)
+    for i, d in enumerate(records):
+        records[i] = Record(d,
+                            status=Status(d['status']),
+                            created=datetime.fromisoformat(d['created']),
+                            start=time.fromisoformat(d['start']),
+                            duration=timedelta(seconds=d['duration']),
+                            tags=Tags(d['tags']),
+                            location=Location(**d['location']))
+    return records
+
+def binary_benchmarks(records: Records):
+    document = records.ToJsonString(None)
+    data = records.ToBytes()
+    assert typed_from_json(document)[0].keys() == Records.FromBytes(data)[0].keys()
+
+    title = f'ToBytes / FromBytes: {len(records)} records'
+    print()
+    print(title)
+    print('-' * len(title))
+    print(f'{"ToJsonString(indent=None)":<60} {len(document.encode()) / 1024 ** 2:>12.3f} MB')
+    print(f'{"ToBytes":<60} {len(data) / 1024 ** 2:>12.3f} MB')
+
+    for backend in JsonBackends.Names():
+        Compare(f'encode {len(records)} records, json backend {backend}',
+                ('ToJsonString(indent=None)', lambda: records.ToJsonString(None, backend=backend)),
+                ('ToBytes', lambda: records.ToBytes()))
+
+        # FromJson alone only restores plain dicts / lists / strings; FromBytes restores the models, Enums and datetimes as well.
+        Compare(f'decode {len(records)} records, json backend {backend}',
+                ('FromJson + typed conversion', lambda: typed_from_json(document, backend)),
+                ('FromJson (untyped)', lambda: Records.FromJson(document, backend=backend)),
+                ('FromBytes', lambda: Records.FromBytes(data)))
+
+
+
+def patch_benchmarks(count: int):
+    # a large configuration: count sections of settings, where one value changes between updates.
+    config = BaseDictModel({ f'section {i}': dict(enabled=bool(i % 2), limits=dict(low=i, high=i * 2), hosts=[f'host {i}.{j}' for j in range(5)]) for i in range(count) })
+    key = f'section {count // 2}'
+
+    def update(model):
+        model[key] = dict(model[key], enabled=not model[key]['enabled'])
+
+    snapshot = config.Clone(copy_on_write=True)
+    copy_snapshot = config.Clone()
+    update(config)
+    patch = JsonPatch.ToJsonString(snapshot.Diff(config))
+    assert patch == JsonPatch.ToJsonString(copy_snapshot.Diff(config))
+
+    title = f'send one changed value of a {count} section config'
+    print()
+    print(title)
+    print('-' * len(title))
+    print(f'{"ToJsonString(indent=None)":<60} {len(config.ToJsonString(None)) / 1024:>12.1f} KB')
+    print(f'{"Diff patch":<60} {len(patch) / 1024:>12.1f} KB')
+
+    Compare(title,
+            ('ToJsonString(indent=None)', lambda: config.ToJsonString(None)),
+            ('Diff vs Clone() snapshot + ToJsonString', lambda: JsonPatch.ToJsonString(copy_snapshot.Diff(config))),
+            ('Diff vs Clone(copy_on_write=True) snapshot + ToJsonString', lambda: JsonPatch.ToJsonString(snapshot.Diff(config))))
+
+    target = BaseDictModel.FromJson(copy_snapshot.ToJsonString())
+    Compare(f'apply the change to a {count} section config',
+            ('FromJson of the full document', lambda: BaseDictModel.FromJson(config.ToJsonString(None))),
+            ('ApplyPatch', lambda: target.ApplyPatch(patch)))
+
+
+
+def intern_benchmarks(count: int):
+    # telemetry: many small messages with the same keys, a few sensor names / units / hosts and repeated readings.
+    messages = [dumps([dict(sensor=f'sensor {j % 20}', unit='celsius', host=f'host {i % 8}', status='ok', value=round(20 + j % 10 * 0.5, 1), sequence=i * 10 + j) for j in range(10)])
+                for i in range(count // 10)]
+
+    plain = [Records.FromJson(message) for message in messages]
+    pool = InternPool()
+    interned = [Records.FromJson(message, intern=pool) for message in messages]
+    assert plain == interned
+
+    title = f'parse {len(messages)} telemetry messages ({count} readings)'
+    print()
+    print(title)
+    print('-' * len(title))
+    print(f'{"FromJson: get_size":<60} {get_size(plain) / 1024 ** 2:>12.2f} MB')
+    print(f'{"FromJson(intern=pool): get_size":<60} {get_size(interned) / 1024 ** 2:>12.2f} MB')
+    print(f'{"InternPool.Statistics":<60} {pool.Statistics}')
+
+    Compare(title,
+            ('FromJson', lambda: [Records.FromJson(message) for message in messages]),
+            ('FromJson(intern=pool)', lambda: [Records.FromJson(message, intern=pool) for message in messages]))
+
+
+
+def json_lines_benchmarks(records: Records):
+    with tempfile.TemporaryDirectory() as root:
+        array, lines = FilePath.Join(root, 'events.json')(), FilePath.Join(root, 'events.jsonl')()
+        array.Write(records.ToJsonString(None))
+        lines.Write(records.ToJsonLines())
+        event = records[0]
+
+        def rewrite():
+            log = Records.FromJson(array.Read())
+            log.append(event)
+            array.Write(log.ToJsonString(None))
+
+        Compare(f'append one event to a {len(records)} event log',
+                ('FromJson + append + ToJsonString + Write', rewrite),
+                ('AppendJsonLine', lambda: lines.AppendJsonLine(event)))
+
+        def read_all():
+            for _ in Records.FromJson(array.Read()): pass
+
+        def stream(**kwargs):
+            for _ in lines.IterJsonLines(**kwargs): pass
+
+        Compare(f'read a {len(records)} event log',
+                ('Read + FromJson', read_all),
+                ('IterJsonLines', stream),
+                ('IterJsonLines(workers=2)', lambda: stream(workers=2)))
+
+        PeakMemory('Read + FromJson', read_all)
+        PeakMemory('IterJsonLines', stream)
+
+
+
+def main(count: int = 200_000):
+    records = CreateRecords(count)
+    serializer_benchmarks(records)
+    stream_benchmarks(records)
+    parse_stream_benchmarks(records)
+    backend_benchmarks(records)
+    clone_benchmarks(records)
+    parse_benchmarks(count // 10)
+    binary_benchmarks(records)
+    patch_benchmarks(count // 2)
+    intern_benchmarks(count)
+    json_lines_benchmarks(records)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
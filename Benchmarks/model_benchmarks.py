@@ -0,0 +1,330 @@
+# ------------------------------------------------------------------------------
+#  Created by Tyler Stegmaier.
+
+# ------------------------------------------------------------------------------
+
+"""
+    python -m Benchmarks.model_benchmarks [records]
+"""
+
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, time, timedelta
+from time import sleep
+from typing import *
+
+from PythonExtensions.Json import *
+from PythonExtensions.Models import *
+from PythonExtensions.Threads import AutoStartTargetedThread
+
+from . import Compare, Measure, PeakMemory, RetainedMemory
+from .json_benchmarks import Status, Tags
+
+
+
+
+class DictRecord(BaseDictModel[str, Any]):
+    @classmethod
+    def Parse(cls, d):
+        record = cls(d)
+        record['status'] = Status(d['status'])
+        record['created'] = BaseObjectModel.convert_date_time(d['created'])
+        record['start'] = BaseObjectModel.convert_time(d['start'])
+        record['duration'] = BaseObjectModel.convert_time_delta(d['duration'])
+        record['tags'] = Tags.Parse(d['tags'])
+        return record
+
+
+
+class SchemaRecord(BaseSchemaModel):
+    id: int
+    name: str
+    status: Status
+    created: datetime
+    start: time
+    duration: timedelta
+    tags: Tags
+
+
+
+def CreateDocuments(count: int) -> List[Dict[str, Any]]:
+    now = datetime(2021, 1, 1)
+    return [json.loads(DictRecord(id=i,
+                                  name=f'record {i}',
+                                  status=Status.Active if i % 2 else Status.Inactive,
+                                  created=now + timedelta(seconds=i),
+                                  start=time(hour=i % 24),
+                                  duration=timedelta(seconds=i),
+                                  tags=Tags({ 'a', 'b' })).ToJsonString())
+            for i in range(count)]
+
+
+
+def schema_benchmarks(count: int):
+    documents = CreateDocuments(count)
+    dict_records = [DictRecord.Parse(d) for d in documents]
+    schema_records = [SchemaRecord.Parse(d) for d in documents]
+    assert all(a.ToJsonString() == b.ToJsonString() for a, b in zip(dict_records[:100], schema_records[:100]))
+
+    print()
+    RetainedMemory('BaseDictModel', lambda: [DictRecord.Parse(d) for d in documents], count)
+    RetainedMemory('BaseSchemaModel', lambda: [SchemaRecord.Parse(d) for d in documents], count)
+
+    Compare(f'Parse: {count} records',
+            ('BaseDictModel', lambda: [DictRecord.Parse(d) for d in documents]),
+            ('BaseSchemaModel', lambda: [SchemaRecord.Parse(d) for d in documents]))
+
+    Compare(f'ToDict: {count} records',
+            ('BaseDictModel', lambda: [r.ToDict() for r in dict_records]),
+            ('BaseSchemaModel', lambda: [r.ToDict() for r in schema_records]))
+
+    Compare(f'ToJsonString: {count} records',
+            ('BaseDictModel', lambda: BaseListModel(dict_records).ToJsonString(None)),
+            ('BaseSchemaModel', lambda: BaseListModel(schema_records).ToJsonString(None)),
+            ('BaseSchemaModel.ToJsonString per record', lambda: [r.ToJsonString(None) for r in schema_records]))
+
+
+
+def columnar_benchmarks(count: int):
+    # one document, like a single api response or file: the decoder shares key strings but not repeated values.
+    document = BaseListModel(dict(id=i, score=i / 3, name=f'user {i % 100}', status=('active', 'inactive')[i % 2], active=bool(i % 2)) for i in range(count)).ToJsonString(None)
+    items = BaseListModel.FromJson(document)
+    columns = ColumnarListModel.FromListModel(items)
+    assert columns.ToJsonString() == items.ToJsonString()
+
+    print()
+    RetainedMemory('BaseListModel of dicts', lambda: BaseListModel.FromJson(document), count)
+    RetainedMemory('ColumnarListModel', lambda: ColumnarListModel.FromJson(document), count)
+    RetainedMemory('ColumnarListModel.FromListModel (columns only)', lambda: ColumnarListModel.FromListModel(items), count)
+
+    print()
+    Measure('ColumnarListModel.FromListModel', lambda: ColumnarListModel.FromListModel(items))
+    Measure('ColumnarListModel.ToListModel', lambda: columns.ToListModel())
+    Measure('BaseListModel.FromJson (for scale)', lambda: BaseListModel.FromJson(document))
+
+    Compare(f'Filter {count} rows',
+            ('BaseListModel', lambda: items.Filter(lambda row: row['active'])),
+            ('ColumnarListModel', lambda: columns.Filter(lambda row: row['active'])))
+
+    Compare(f'ToJsonString {count} rows',
+            ('BaseListModel', lambda: items.ToJsonString(None)),
+            ('ColumnarListModel', lambda: columns.ToJsonString(None)))
+
+
+
+def lazy_benchmarks(count: int):
+    # a large response where the caller only needs a few of its values.
+    document = json.dumps(dict(status='ok', page=1, total=count, records=CreateDocuments(count), users={ f'user {i}': dict(id=i, groups=['a', 'b']) for i in range(count) }))
+    size = f'{len(document) / 1024 ** 2:.1f} MB'
+
+    def read_top_level(model): return model['status'], model['page'], model['total']
+    def read_nested(model): return model['users'][f'user {count // 2}']['id']  # indexes every key of the 'users' object
+
+    assert read_top_level(BaseDictModel.FromJson(document)) == read_top_level(LazyDictModel.FromJson(document))
+    assert read_nested(BaseDictModel.FromJson(document)) == read_nested(LazyDictModel.FromJson(document))
+
+    for name, read in (('top level values', read_top_level), (f'one value of a {count} key nested object', read_nested)):
+        Compare(f'read {name} of a {size} document',
+                ('BaseDictModel.FromJson', lambda: read(BaseDictModel.FromJson(document))),
+                ('LazyDictModel.FromJson', lambda: read(LazyDictModel.FromJson(document))),
+                ('LazyDictModel.FromJson (bytes)', lambda: read(LazyDictModel.FromJson(document.encode()))))
+
+    print()
+    PeakMemory('BaseDictModel.FromJson', lambda: read_top_level(BaseDictModel.FromJson(document)))
+    PeakMemory('LazyDictModel.FromJson', lambda: read_top_level(LazyDictModel.FromJson(document)))
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'document.json')
+        with open(path, 'w') as f: f.write(document)
+
+        def from_file():
+            with open(path) as file: return read_top_level(BaseDictModel.FromJson(file.read()))
+
+        Compare(f'read top level values of a {size} file',
+                ('open + read + BaseDictModel.FromJson', from_file),
+                ('LazyDictModel.FromJsonFile (mmap)', lambda: read_top_level(LazyDictModel.FromJsonFile(path))))
+
+    def update(model):
+        model['page'] = 2
+        return model.ToJsonString(None)
+
+    Compare(f'change one value and re-encode a {size} document',
+            ('BaseDictModel.FromJson + ToJsonString', lambda: update(BaseDictModel.FromJson(document))),
+            ('LazyDictModel.FromJson + ToJsonString (verbatim)', lambda: update(LazyDictModel.FromJson(document))))
+
+
+
+def index_benchmarks(count: int, lookups: int = 1000):
+    items = BaseListModel(dict(id=i, group=i % 100, name=f'item {i}') for i in range(count))
+    indexed = BaseListModel(items)
+    indexed.CreateIndex('id', unique=True)
+    indexed.CreateIndex('group')
+    ids = range(0, count, count // lookups)
+
+    assert [items.Filter(lambda item: item['id'] == i)[0] for i in ids[:10]] == [indexed.Find(i, index='id') for i in ids[:10]]
+
+    Compare(f'look up {len(ids)} items by id in {count} items',
+            ('Filter', lambda: [items.Filter(lambda item: item['id'] == i)[0] for i in ids]),
+            ('Find', lambda: [indexed.Find(i, index='id') for i in ids]))
+
+    Compare(f'look up the items of {len(ids)} groups in {count} items',
+            ('Filter', lambda: [items.Filter(lambda item: item['group'] == i % 100) for i in ids]),
+            ('FindAll', lambda: [indexed.FindAll(i % 100, index='group') for i in ids]))
+
+    print()
+    Measure(f'CreateIndex: {count} items, unique', lambda: BaseListModel(items).CreateIndex('id', unique=True))
+
+    def append(model):
+        for item in items: model.append(item)
+
+    def indexed_model():
+        model = BaseListModel()
+        model.CreateIndex('id', unique=True)
+        return model
+
+    Compare(f'append {count} items',
+            ('BaseListModel', lambda: append(BaseListModel())),
+            ('BaseListModel with a unique index', lambda: append(indexed_model())))
+
+
+
+def many_benchmarks(count: int, workers: int = None):
+    workers = max(workers or os.cpu_count(), 2)  # at least 2, so the pool path is measured on single cpu machines too
+    payloads = [json.dumps(d) for d in CreateDocuments(count)]
+    assert DictRecord.FromJsonMany(payloads, workers=2, chunk_size=count // 4) == [DictRecord.FromJson(payload) for payload in payloads]
+
+    print()
+    print(f'{count} payloads, {workers} workers ({os.cpu_count()} cpus)')
+    for cls in (DictRecord, SchemaRecord):
+        with ProcessPoolExecutor(workers) as pool:
+            Compare(f'{cls.__name__}: decode {count} payloads',
+                    ('FromJson per payload', lambda: [cls.FromJson(payload) for payload in payloads]),
+                    ('FromJsonMany, in process', lambda: cls.FromJsonMany(payloads, workers=1)),
+                    (f'FromJsonMany, {workers} workers', lambda: cls.FromJsonMany(payloads, workers=workers)),
+                    (f'FromJsonMany, {workers} workers, reused pool', lambda: cls.FromJsonMany(payloads, workers=workers, pool=pool)))
+
+
+
+def multi_dict_benchmarks(aliases: int = 100_000, per_group: int = 4, lookups: int = 100):
+    groups = [KeyCollection(f'alias {i}.{j}' for j in range(per_group)) for i in range(aliases // per_group)]
+    legacy = dict.fromkeys(groups, 0)  # the former BaseMultiDictModel: a dict of KeyCollection keys, searched by scanning them
+    model = BaseMultiDictModel(dict.fromkeys(groups, 0))
+    keys = [f'alias {i}.{i % per_group}' for i in range(0, aliases // per_group, aliases // per_group // lookups)]
+
+    def legacy_get(alias): return next(value for group, value in legacy.items() if alias in group)
+
+    assert [legacy_get(key) for key in keys] == [model[key] for key in keys]
+
+    Compare(f'contains: {len(keys)} aliases in {aliases} aliases',
+            ('scan of the KeyCollection keys', lambda: [any(key in group for group in legacy) for key in keys]),
+            ('alias index', lambda: [key in model for key in keys]))
+
+    Compare(f'get: {len(keys)} aliases in {aliases} aliases',
+            ('scan of the KeyCollection keys', lambda: [legacy_get(key) for key in keys]),
+            ('alias index', lambda: [model[key] for key in keys]))
+
+    frozen = [group.Freeze() for group in groups]
+    Compare(f'hash {len(groups)} groups of {per_group} aliases',
+            ('KeyCollection', lambda: list(map(hash, groups))),
+            ('FrozenKeyCollection', lambda: list(map(hash, frozen))))
+
+    print()
+    Measure(f'BaseMultiDictModel: build {aliases} aliases', lambda: BaseMultiDictModel(dict.fromkeys(groups, 0)))
+
+
+
+def dispatcher_benchmarks(count: int = 1000, distinct: int = 10, workers: int = 8, latency: float = 0.002):
+    # UI threads flooding the backend with refresh requests: count requests, distinct different ones, each taking latency seconds to serve.
+    def handler(request: InternalRequest):
+        sleep(latency)
+        return request.kwargs
+
+    requests = [InternalRequest('refresh', page=i % distinct) for i in range(count)]
+
+    def executor():
+        with ThreadPoolExecutor(workers) as pool: wait([pool.submit(handler, request) for request in requests])
+
+    def dispatcher(**kwargs):
+        with RequestDispatcher(handler, workers=workers, **kwargs) as d: wait([d.Submit(request) for request in requests])
+
+    def batches(request_list: List[InternalRequest]):
+        sleep(latency)
+        return [request.kwargs for request in request_list]
+
+    def batch_dispatcher():
+        with RequestDispatcher(batch_handler=batches, window=0.005) as d: wait([d.Submit(request) for request in requests])
+
+    Compare(f'serve {count} requests ({distinct} distinct, {latency * 1000:.0f} ms each, {workers} threads)',
+            ('ThreadPoolExecutor.submit per request', executor),
+            ('RequestDispatcher', dispatcher),
+            ('RequestDispatcher(batch_handler, window=5 ms)', batch_dispatcher))
+
+    with RequestDispatcher(handler, workers=workers) as d:
+        futures = [d.Submit(request) for request in requests]
+        assert [future.result() for future in futures] == [request.kwargs for request in requests]
+        print(f'{"RequestDispatcher.Statistics":<60} {d.Statistics}')
+
+    unique = [InternalRequest('refresh', page=i) for i in range(count)]
+
+    def noop(request: InternalRequest): return None
+
+    def submit_executor():
+        with ThreadPoolExecutor(workers) as pool: wait([pool.submit(noop, request) for request in unique])
+
+    def submit_dispatcher():
+        with RequestDispatcher(noop, workers=workers) as d: wait([d.Submit(request) for request in unique])
+
+    Compare(f'overhead: {count} distinct requests, no work',
+            ('ThreadPoolExecutor.submit', submit_executor),
+            ('RequestDispatcher.Submit', submit_dispatcher))
+
+
+
+def bus_benchmarks(count: int = 5000, work: int = 2000):
+    def handler(request: InternalRequest): return sum(range(work)) + request.args[0]
+
+    def thread_per_request():
+        threads = [AutoStartTargetedThread(handler, InternalRequest('refresh', i)) for i in range(count)]
+        for thread in threads: thread.join()
+
+    def bus():
+        with RequestBus(workers=8, capacity=count) as b:
+            b.Register('refresh', handler)
+            for future in [b.Post('refresh', i) for i in range(count)]: future.result()
+
+    Compare(f'serve {count} requests',
+            ('AutoStartTargetedThread per request', thread_per_request),
+            ('RequestBus, 8 workers', bus))
+
+    # an urgent request submitted behind a full low priority lane: served next instead of after the backlog.
+    with RequestBus(workers=8, capacity=count) as b:
+        b.Register('refresh', handler, priority=2)
+        b.Register('urgent', handler, priority=0)
+        backlog = [b.Post('refresh', i) for i in range(count)]
+        urgent = [b.Post('urgent', i) for i in range(10)]
+        for future in urgent + backlog: future.result()
+
+    print()
+    for action in ('refresh', 'urgent'):
+        metrics = b.Metrics(action).ToDict()
+        print(f'{f"RequestBus latency, {action} (p50 / p99 / max wait)":<60} {metrics["p50"] * 1000:>8.2f} / {metrics["p99"] * 1000:.2f} / {metrics["max_wait"] * 1000:.2f} ms')
+
+
+
+def main(count: int = 100_000):
+    schema_benchmarks(count)
+    columnar_benchmarks(count)
+    lazy_benchmarks(count)
+    index_benchmarks(count)
+    many_benchmarks(count)
+    multi_dict_benchmarks(count)
+    dispatcher_benchmarks()
+    bus_benchmarks()
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
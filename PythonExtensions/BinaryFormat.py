@@ -0,0 +1,131 @@
+import array
+import io
+import pickle
+import struct
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+from os import PathLike
+from zoneinfo import ZoneInfo
+from typing import *
+
+from dateutil import _common as _dateutil_common, relativedelta as _relativedelta, tz as _tz
+
+from .Exceptions import BinaryFormatError
+from .Json import BaseObjectModel, throw
+
+
+
+
+__all__ = ['BinaryFormat']
+
+class _Unpickler(pickle.Unpickler):
+    """
+        Only resolves the classes a model tree can contain: Base*Model subclasses, Enums, the datetime types and classes registered with BinaryFormat.Register.
+        Classes are looked up in already imported modules, so decoding never imports or runs arbitrary code.
+        The time zones of the datetimes are those of datetime, zoneinfo and dateutil.tz (which DateTimeParser returns).
+    """
+    _builtin: Final[Dict[Tuple[str, str], Any]] = {
+        (value.__module__, value.__qualname__): value for value in (date, datetime, time, timedelta, timezone, ZoneInfo, set, frozenset, complex, bytearray, array._array_reconstructor,
+                                                                     _tz.tzutc, _tz.tzoffset, _tz.tzlocal, _tz.tzfile, _tz.tz._ttinfo, _tz.tzrange, _tz.tzstr,
+                                                                     _relativedelta.relativedelta, _dateutil_common.weekday)
+        }
+
+    def find_class(self, module: str, name: str) -> Any:
+        result = self._builtin.get((module, name))
+        if result is not None: return result
+
+        if module == 'builtins' and name == 'getattr': return _ZoneInfoGetAttr  # ZoneInfo pickles as getattr(ZoneInfo, '_unpickle')
+
+        if module == 'PythonExtensions.Json' and name == '_identity':  # copy on write snapshots, see BaseObjectModel.Clone
+            return super().find_class(module, name)
+
+        result = sys.modules.get(module)
+        for part in name.split('.'):
+            result = getattr(result, part, None)
+
+        if isinstance(result, type) and (issubclass(result, (BaseObjectModel, Enum)) or result in BinaryFormat._registered): return result
+
+        raise BinaryFormatError(f'{module}.{name} is not allowed in {BinaryFormat.__name__} data')
+
+
+def _ZoneInfoGetAttr(obj: Any, name: str) -> Any:
+    if obj is ZoneInfo and name == '_unpickle': return ZoneInfo._unpickle
+    raise BinaryFormatError(f'getattr({obj!r}, {name!r}) is not allowed in {BinaryFormat.__name__} data')
+
+
+class BinaryFormat(object):
+    """
+        Compact binary encoding of BaseObjectModel trees, used by BaseObjectModel.ToBytes / FromBytes / FromBytesStream.
+
+        A frame is a 1 byte version, a 4 byte little endian payload length and a pickle (protocol 5) payload,
+        so frames can be concatenated in a file or pipe and read back one by one.
+        Unlike json, every type round trips exactly: Base*Model subclasses, Enums, datetime / date / time / timedelta, sets, tuples and nested models.
+        Decoding only accepts those types (see _Unpickler) and raises BinaryFormatError for anything else.
+    """
+    VERSION: Final[int] = 1
+    _header: Final[struct.Struct] = struct.Struct('<BI')
+    _registered: Set[Type] = set()
+
+    @classmethod
+    def Register(cls, _type: Type) -> Type:
+        """ Allows instances of _type (a plain class held by the models, picklable) to be decoded. Can be used as a class decorator. """
+        if not isinstance(_type, type): throw(_type, type)
+
+        cls._registered.add(_type)
+        return _type
+    @classmethod
+    def Unregister(cls, _type: Type): cls._registered.discard(_type)
+
+    @classmethod
+    def Dumps(cls, obj: Any) -> bytes:
+        payload = pickle.dumps(obj, protocol=5)
+        return cls._header.pack(cls.VERSION, len(payload)) + payload
+
+    @classmethod
+    def Loads(cls, data: Union[bytes, bytearray, memoryview]) -> Any:
+        data = memoryview(data)
+        length = cls._ReadHeader(data[:cls._header.size])
+        if len(data) != cls._header.size + length: raise BinaryFormatError(f'expected a single frame of {cls._header.size + length} bytes   got {len(data)} bytes')
+
+        return cls._Decode(data[cls._header.size:])
+
+    @classmethod
+    def Dump(cls, obj: Any, fp: IO[bytes]) -> int: return fp.write(cls.Dumps(obj))
+
+    @classmethod
+    def Iter(cls, fp: Union[IO[bytes], PathLike, str]) -> Iterator[Any]:
+        """ Yields the object of every frame in fp (a binary file object or a path), reading one frame at a time. """
+        if isinstance(fp, (str, PathLike)):
+            with open(fp, 'rb') as f:
+                yield from cls.Iter(f)
+                return
+
+        while True:
+            header = fp.read(cls._header.size)
+            if not header: return
+
+            length = cls._ReadHeader(header)
+            payload = fp.read(length)
+            if len(payload) != length: raise BinaryFormatError(f'truncated frame: expected {length} bytes   got {len(payload)}')
+
+            yield cls._Decode(payload)
+
+
+    @classmethod
+    def _ReadHeader(cls, header: Union[bytes, memoryview]) -> int:
+        if len(header) != cls._header.size: raise BinaryFormatError(f'truncated frame header: {len(header)} bytes')
+
+        version, length = cls._header.unpack(header)
+        if version != cls.VERSION: raise BinaryFormatError(f'unsupported {BinaryFormat.__name__} version {version}')
+
+        return length
+
+    @staticmethod
+    def _Decode(payload: Union[bytes, memoryview]) -> Any:
+        try:
+            return _Unpickler(io.BytesIO(payload)).load()
+        except BinaryFormatError:
+            raise
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError) as e:
+            raise BinaryFormatError(f'invalid {BinaryFormat.__name__} payload: {e}') from e
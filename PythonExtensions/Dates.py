@@ -1,14 +1,19 @@
-from datetime import date as Date, datetime as DateTime, time as Time, tzinfo
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, datetime as DateTime, time as Time, timedelta, tzinfo
+from functools import lru_cache
+from itertools import product, repeat
 from time import time
 from typing import *
 
 from attr import attrib, attrs, validators
+from dateutil import parser as _dateutil
 
 
 
 
 
-__all__ = ['IsoFormat', 'time', 'DateTime', 'Date', 'Time', 'tzinfo', ]
+__all__ = ['IsoFormat', 'DateTimeParser', 'time', 'DateTime', 'Date', 'Time', 'tzinfo', ]
 
 
 @attrs(slots=True, hash=True, order=True, eq=True, auto_attribs=True)
@@ -54,3 +59,366 @@ class IsoFormat(object):
     def FromTime(cls, obj: Optional[Time], _format: Optional[str], tz: tzinfo = None):
         if obj is None: return None
         return cls(obj, _format, tz)
+
+
+
+
+_time_delta = re.compile(r'((?P<hours>\d+?)hr)?((?P<minutes>\d+?)m)?((?P<seconds>\d+?)s)?')
+# _time_delta applied to every line of a joined column in a single scan; `rest` is anything the hr/m/s form does not consume.
+_time_deltas = re.compile(r'^(?:(\d+?)hr)?(?:(\d+?)m)?(?:(\d+?)s)?(.*)$', re.MULTILINE)
+
+# ordered like dateutil's defaults (month before day, day before year) so the first matching format agrees with dateutil on ambiguous strings.
+_DATE_FORMATS: Final[Tuple[str, ...]] = (
+    '%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d',
+    '%m/%d/%Y', '%m-%d-%Y', '%m.%d.%Y', '%m/%d/%y', '%m-%d-%y',
+    '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y',
+    '%b %d %Y', '%b %d, %Y', '%B %d %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y', '%d-%b-%Y',
+    '%a %b %d %Y', '%a, %d %b %Y', '%A, %B %d, %Y',
+    )
+_TIME_FORMATS: Final[Tuple[str, ...]] = (
+    '%H:%M', '%H:%M:%S', '%H:%M:%S.%f', '%H%M%S',
+    '%I:%M %p', '%I:%M:%S %p', '%I:%M:%S.%f %p', '%I:%M%p', '%I %p', '%I%p',
+    )
+_ZONE_FORMATS: Final[Tuple[str, ...]] = ('', '%z', ' %z')
+_DATE_TIME_FORMATS: Final[Tuple[str, ...]] = _DATE_FORMATS + tuple(f'{d}{separator}{t}{z}' for d, separator, t, z in product(_DATE_FORMATS, (' ', 'T', ', '), _TIME_FORMATS, _ZONE_FORMATS))
+_TIME_ONLY_FORMATS: Final[Tuple[str, ...]] = tuple(f'{t}{z}' for t, z in product(_TIME_FORMATS, _ZONE_FORMATS))
+_TIME_CANDIDATES: Final[Tuple[str, ...]] = _TIME_ONLY_FORMATS + _DATE_TIME_FORMATS
+_SHAPES: Final[Dict[int, str]] = { **{ ord(c): '9' for c in '0123456789' }, **{ ord(c): 'a' for c in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ' } }
+_ALPHANUMERIC: Final[Dict[int, None]] = dict.fromkeys(map(ord, '9a'))
+_ZONE_SEPARATORS: Final[FrozenSet[str]] = frozenset('+-:')
+# the numeric strptime directives, with the same patterns _strptime uses, so a compiled format accepts a subset of what strptime accepts.
+_NUMERIC_DIRECTIVES: Final[Dict[str, str]] = {
+    'Y': r'(\d\d\d\d)',
+    'y': r'(\d\d)',
+    'm': r'(1[0-2]|0[1-9]|[1-9])',
+    'd': r'(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])',
+    'H': r'(2[0-3]|[0-1]\d|\d)',
+    'I': r'(1[0-2]|0[1-9]|[1-9])',
+    'M': r'([0-5]\d|\d)',
+    'S': r'(6[0-1]|[0-5]\d|\d)',
+    'f': r'([0-9]{1,6})',
+    'p': r'(?i:(am|pm))',
+    }
+
+class DateTimeParser(object):
+    """
+        Cached parsing of date, time and duration strings, used by BaseObjectModel.convert_date_time / convert_time / convert_time_delta.
+
+        Results are kept in a bounded LRU keyed by the string. Strings that are not iso formatted are parsed once with dateutil;
+        the parser then looks for a strptime format that reproduces dateutil's result and remembers it for the "shape" of the string
+        (digits -> 9, letters -> a), so the next string with that shape skips dateutil. Learned formats are tried in dateutil's
+        preference order (month before day), so ambiguous strings are resolved the same way dateutil resolves them.
+
+        Keep one instance per call site (field, feed, ...) so each learns only the formats it actually sees; DateTimeParser.Default is shared.
+    """
+    __slots__ = ['_maxsize', '_date_time', '_time', '_time_delta', '_formats', '_unknown', '_workers', 'Iso', 'Learned', 'DateUtil', '__weakref__']
+    Default: ClassVar['DateTimeParser']
+    def __init__(self, maxsize: int = 4096):
+        """
+        :param maxsize: number of strings cached per kind (datetime, time, timedelta). None is unbounded, 0 disables the cache.
+        """
+        self._maxsize = maxsize
+        self._date_time = lru_cache(maxsize)(self._ParseDateTime)
+        self._time = lru_cache(maxsize)(self._ParseTime)
+        self._time_delta = lru_cache(maxsize)(self._ParseTimeDelta)
+        self._formats: Dict[Tuple[str, str], List[int]] = { }
+        self._unknown: Set[Tuple[str, str]] = set()
+        self._workers = [0, 0]  # cache hits and misses of the worker processes, see _Bulk
+        self.Iso = 0
+        self.Learned = 0
+        self.DateUtil = 0
+
+
+    def ParseDateTime(self, value: str) -> Optional[DateTime]: return self._date_time(value)
+    def ParseTime(self, value: str) -> Optional[Time]: return self._time(value)
+    def ParseTimeDelta(self, value: str) -> Optional[timedelta]: return self._time_delta(value)
+
+
+    def ParseDateTimes(self, values: Iterable[str], *, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[DateTime]]:
+        """
+            Parses a whole column, giving the same results as calling ParseDateTime on every value.
+
+            The format is inferred once from the first value (iso or a learned strptime format) and applied to the column with map;
+            only values it rejects go through ParseDateTime.
+
+        :param values: column of strings
+        :param processes: number of worker processes for columns larger than chunk_size. 1 parses in this process, None uses every cpu.
+            Workers parse with a copy of this parser (its maxsize and learned formats); the formats they learn and their statistics are merged back into it.
+        :param chunk_size: number of values sent to a worker at a time
+        """
+        return self._Bulk('ParseDateTimes', values, processes, chunk_size)
+
+    def ParseTimes(self, values: Iterable[str], *, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[Time]]:
+        """ Column version of ParseTime; see ParseDateTimes. """
+        return self._Bulk('ParseTimes', values, processes, chunk_size)
+
+    def ParseTimeDeltas(self, values: Iterable[str], *, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[timedelta]]:
+        """
+            Column version of ParseTimeDelta; see ParseDateTimes.
+
+            Columns of integers are converted with map, and hr/m/s durations are matched by one regex scan over the joined column.
+        """
+        return self._Bulk('ParseTimeDeltas', values, processes, chunk_size)
+
+
+    @property
+    def Statistics(self) -> Dict[str, int]:
+        """
+            hits / misses / size: lru cache counters summed over datetime, time and timedelta (hits and misses include those of the worker processes).
+            iso: misses parsed by fromisoformat. learned: misses parsed by a learned format. dateutil: misses that needed dateutil.
+            formats: number of learned (shape, format) pairs.
+        """
+        infos = (self._date_time.cache_info(), self._time.cache_info(), self._time_delta.cache_info())
+        return dict(hits=sum(i.hits for i in infos) + self._workers[0],
+                    misses=sum(i.misses for i in infos) + self._workers[1],
+                    size=sum(i.currsize for i in infos),
+                    iso=self.Iso,
+                    learned=self.Learned,
+                    dateutil=self.DateUtil,
+                    formats=sum(map(len, self._formats.values())))
+
+    def Clear(self):
+        """ Clears the cached values, the learned formats and the statistics. """
+        self._date_time.cache_clear()
+        self._time.cache_clear()
+        self._time_delta.cache_clear()
+        self._formats.clear()
+        self._unknown.clear()
+        self._workers = [0, 0]
+        self.Iso = self.Learned = self.DateUtil = 0
+
+
+    def _Bulk(self, name: str, values: Iterable[str], processes: Optional[int], chunk_size: int) -> list:
+        if not isinstance(values, list): values = list(values)
+
+        if processes == 1 or len(values) <= chunk_size: return getattr(self, f'_{name}')(values)
+
+        # the first chunk is parsed here, so the workers start from the formats learned on the start of the column, like a single process would.
+        results = getattr(self, f'_{name}')(values[:chunk_size])
+        chunks = [values[i:i + chunk_size] for i in range(chunk_size, len(values), chunk_size)]
+        with ProcessPoolExecutor(processes) as pool: parts = list(pool.map(_ParseColumn, repeat(name), repeat((self._maxsize, self._formats, self._unknown)), chunks))
+
+        for part, state in parts:
+            results.extend(part)
+            self._Merge(*state)
+
+        return results
+
+    def _Merge(self, formats: Dict[Tuple[str, str], List[int]], unknown: Set[Tuple[str, str]], counters: Tuple[int, ...]):
+        """ adds the formats learned and the statistics of a worker's copy of this parser """
+        for key, indices in formats.items(): self._formats[key] = sorted(set(self._formats.get(key, ())).union(indices))
+        self._unknown |= unknown - self._formats.keys()
+
+        iso, learned, dateutil, hits, misses = counters
+        self.Iso += iso
+        self.Learned += learned
+        self.DateUtil += dateutil
+        self._workers[0] += hits
+        self._workers[1] += misses
+
+    def _Column(self, values: List[str], kind: str, iso: Callable[[str], Any], parse: Callable[[str], Any], candidates: Tuple[str, ...], convert: Callable[[DateTime], Any]) -> list:
+        sample = next((value for value in values if value != str(None)), None)
+        if sample is None: return list(map(parse, values))
+
+        try:
+            iso(sample)
+            fast = iso
+        except ValueError:
+            parse(sample)
+            formats = self._formats.get((kind, sample.translate(_SHAPES)))
+            if not formats: return list(map(parse, values))
+
+            strptime = _Strptime(candidates[formats[0]])
+            def fast(value: str): return convert(strptime(value))
+
+        try:
+            return list(map(fast, values))
+        except ValueError:
+            pass
+
+        # mixed column: 'None', other shapes or ambiguous values that need the learned formats in order.
+        results = []
+        append = results.append
+        for value in values:
+            try:
+                append(fast(value))
+            except ValueError:
+                append(parse(value))
+
+        return results
+
+    def _ParseDateTimes(self, values: List[str]) -> List[Optional[DateTime]]: return self._Column(values, 'datetime', DateTime.fromisoformat, self.ParseDateTime, _DATE_TIME_FORMATS, _same)
+    def _ParseTimes(self, values: List[str]) -> List[Optional[Time]]: return self._Column(values, 'time', Time.fromisoformat, self.ParseTime, _TIME_CANDIDATES, DateTime.time)
+    def _ParseTimeDeltas(self, values: List[str]) -> List[Optional[timedelta]]:
+        try:
+            return list(map(timedelta, repeat(0), map(int, values)))
+        except ValueError:
+            pass
+
+        text = '\n'.join(values)
+        if text.count('\n') != len(values) - 1: return list(map(self.ParseTimeDelta, values))
+
+        results = []
+        append = results.append
+        for value, (hours, minutes, seconds, rest) in zip(values, _time_deltas.findall(text)):
+            if rest: append(self.ParseTimeDelta(value))  # integers, 'None' and trailing text keep ParseTimeDelta's exact semantics
+            else: append(timedelta(0, (int(hours) * 3600 if hours else 0) + (int(minutes) * 60 if minutes else 0) + (int(seconds) if seconds else 0)))
+
+        return results
+
+
+    def _Parse(self, kind: str, value: str, candidates: Tuple[str, ...], convert: Callable[[DateTime], Any]):
+        shape = value.translate(_SHAPES)
+        key = (kind, shape)
+        formats = self._formats.get(key, ())
+        for index in formats:
+            try:
+                result = convert(_Strptime(candidates[index])(value))
+            except ValueError:
+                continue
+
+            self.Learned += 1
+            return result
+
+        self.DateUtil += 1
+        expected = convert(_dateutil.parse(value))
+        if key in self._unknown: return expected
+
+        # only formats with the same separators can match, which keeps the search (and the formats compiled by _Strptime) small.
+        separators = shape.translate(_ALPHANUMERIC)
+        for index, fmt in enumerate(candidates):
+            if index in formats or not _Matches(separators, fmt): continue
+            try:
+                result = convert(_Strptime(fmt)(value))
+            except ValueError:
+                continue
+
+            if result == expected and result.utcoffset() == expected.utcoffset():
+                self._formats[key] = sorted((*formats, index))
+                return expected
+
+        # no candidate reproduces dateutil for this shape (time zone names, partial dates, ...), don't search again.
+        self._unknown.add(key)
+        return expected
+
+    def _ParseDateTime(self, value: str) -> Optional[DateTime]:
+        if value == str(None): return None
+
+        try:
+            result = DateTime.fromisoformat(value)
+        except ValueError:
+            return self._Parse('datetime', value, _DATE_TIME_FORMATS, _same)
+
+        self.Iso += 1
+        return result
+
+    def _ParseTime(self, value: str) -> Optional[Time]:
+        if value == str(None): return None
+
+        try:
+            result = Time.fromisoformat(value)
+        except ValueError:
+            return self._Parse('time', value, _TIME_CANDIDATES, DateTime.time)
+
+        self.Iso += 1
+        return result
+
+    @staticmethod
+    def _ParseTimeDelta(value: str) -> Optional[timedelta]:
+        if value == str(None): return None
+
+        try:
+            seconds = int(value)
+            return timedelta(seconds=seconds)
+        except ValueError:
+            parts = _time_delta.match(value)
+            if not parts:
+                return None
+
+            parts = parts.groupdict()
+            time_params = { }
+            for name, param in parts.items():
+                if param:
+                    time_params[name] = int(param)
+            return timedelta(**time_params)
+
+
+
+def _same(o): return o
+
+@lru_cache(None)
+def _Strptime(fmt: str) -> Callable[[str], DateTime]:
+    """
+        Returns a function equivalent to `DateTime.strptime(value, fmt)`.
+
+        Formats made only of numeric directives (%Y %m %d %H %M %S %f %I %p %y) are compiled into a single regex and build the DateTime directly,
+        which is several times faster than strptime; every other format uses strptime. Both raise ValueError for values that do not match.
+        Two digit years (%y) follow dateutil (within 50 years of now) rather than strptime (69-99 -> 1900s), so learned formats keep agreeing with it.
+    """
+    parts = re.split('(%.)', fmt)
+    directives = [part[1] for part in parts[1::2]]
+    if not set(directives).issubset(_NUMERIC_DIRECTIVES) or len(set(directives)) != len(directives) or ('p' in directives and not _EnglishAmPm()):
+        if 'y' in directives: return lambda value: _Century(DateTime.strptime(value, fmt))
+        return lambda value: DateTime.strptime(value, fmt)
+
+    pattern = re.compile(''.join(_NUMERIC_DIRECTIVES[part[1]] if i % 2 else re.escape(part) for i, part in enumerate(parts)))
+    positions = { directive: i for i, directive in enumerate(directives) }
+    Y, y, m, d, H, I, M, S, f, p = map(positions.get, 'YymdHIMSfp')
+
+    def strptime(value: str) -> DateTime:
+        match = pattern.fullmatch(value)
+        if match is None: raise ValueError(f'time data {value!r} does not match format {fmt!r}')
+
+        groups = match.groups()
+        if Y is not None: year = int(groups[Y])
+        elif y is not None: year = _dateutil.DEFAULTPARSER.info.convertyear(int(groups[y]))
+        else: year = 1900
+
+        if H is not None: hour = int(groups[H])
+        elif I is not None:
+            hour = int(groups[I])
+            if p is None or groups[p].lower() == 'am':
+                if hour == 12: hour = 0
+            elif hour != 12: hour += 12
+        else: hour = 0
+
+        return DateTime(year,
+                        1 if m is None else int(groups[m]),
+                        1 if d is None else int(groups[d]),
+                        hour,
+                        0 if M is None else int(groups[M]),
+                        0 if S is None else int(groups[S]),
+                        0 if f is None else int(groups[f].ljust(6, '0')))
+
+    return strptime
+
+def _Century(value: DateTime) -> DateTime: return value.replace(year=_dateutil.DEFAULTPARSER.info.convertyear(value.year % 100))
+
+@lru_cache(None)
+def _EnglishAmPm() -> bool: return (DateTime(2000, 1, 1, 1).strftime('%p').lower(), DateTime(2000, 1, 1, 13).strftime('%p').lower()) == ('am', 'pm')
+
+def _ParseColumn(name: str, state: Tuple[Optional[int], Dict[Tuple[str, str], List[int]], Set[Tuple[str, str]]], values: List[str]) -> Tuple[list, Tuple]:
+    """ process pool entry point for DateTimeParser._Bulk: parses values with a copy of the calling parser, and returns what the copy learned (see _Merge) """
+    maxsize, formats, unknown = state
+    parser = DateTimeParser(maxsize)
+    parser._formats.update(formats)
+    parser._unknown.update(unknown)
+    results = getattr(parser, name)(values)
+
+    statistics = parser.Statistics
+    return results, (parser._formats, parser._unknown - unknown, (parser.Iso, parser.Learned, parser.DateUtil, statistics['hits'], statistics['misses']))
+
+@lru_cache(None)
+def _FormatSeparators(fmt: str) -> Tuple[str, bool]:
+    """ literal (non alphanumeric) characters of a strptime format, and whether it ends with a %z offset. """
+    return re.sub(r'%.', '', fmt), fmt.endswith('%z')
+
+def _Matches(separators: str, fmt: str) -> bool:
+    literal, zone = _FormatSeparators(fmt)
+    if not zone: return separators == literal
+
+    return separators.startswith(literal) and _ZONE_SEPARATORS.issuperset(separators[len(literal):])
+
+
+
+DateTimeParser.Default = DateTimeParser()
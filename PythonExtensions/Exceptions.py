@@ -7,6 +7,14 @@
 class ArgumentError(Exception): pass
 class InstanceError(Exception): pass
 class DelimiterError(Exception): pass
+class BinaryFormatError(ValueError): pass
+class JsonPatchError(ValueError): pass
+class RequestRejectedError(Exception): pass
+class CopyError(OSError):
+    """ the files a copy failed on: errors maps each source path to its exception """
+    def __init__(self, errors: dict):
+        super().__init__(f'{len(errors)} file(s) could not be copied, the first: ' + ', '.join(f'{path}: {error!r}' for path, error in list(errors.items())[:1]))
+        self.errors = errors
 
 
 class BreakCase(Exception): pass
@@ -4,12 +4,13 @@
 #  Copyright (c) 2021.
 # --------------------------------------------------------------------------------------------------
 
-import json
 import pickle
 from typing import *
 
 from cryptography.fernet import Fernet
 
+from ..JsonBackends import JsonBackend, JsonBackends
+
 
 
 
@@ -32,13 +33,13 @@ class Encryptor(object):
 
 
     @staticmethod
-    def _from_json(s: Union[str, bytes, bytearray], **kwargs) -> Dict:
-        try: return json.loads(s, **kwargs)
+    def _from_json(s: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, **kwargs) -> Dict:
+        try: return JsonBackends.Get(backend).loads(s, **kwargs)
         except Exception:
             print('_____from__json_____', type(s), s, sep='\n\n', end='\n\n\n')
             raise
     @staticmethod
-    def _to_json(s: Dict, **kwargs) -> str: return json.dumps(s, **kwargs)
+    def _to_json(s: Dict, *, backend: Union[str, JsonBackend] = None, **kwargs) -> str: return JsonBackends.Get(backend).dumps(s, **kwargs)
 
 
     @staticmethod
@@ -59,8 +60,8 @@ class Encryptor(object):
     def EncryptFile(self, value: bytes): return self._WriteFile(self.Encrypt(value))
 
 
-    def ReadJson(self, **kwargs) -> Dict: return self._from_json(self._ReadFile(), **kwargs)
-    def WriteJson(self, value: Dict, **kwargs): return self._WriteFile(self._to_json(value, **kwargs).encode())
+    def ReadJson(self, *, backend: Union[str, JsonBackend] = None, **kwargs) -> Dict: return self._from_json(self._ReadFile(), backend=backend, **kwargs)
+    def WriteJson(self, value: Dict, *, backend: Union[str, JsonBackend] = None, **kwargs): return self._WriteFile(self._to_json(value, backend=backend, **kwargs).encode())
 
 
     def ReadPickle(self) -> Dict: return self._from_pickle(self.DecryptFile())
@@ -0,0 +1,285 @@
+import base64
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from os import PathLike
+from typing import *
+
+try:
+    import xxhash
+except ImportError:  # optional dependency
+    xxhash = None
+
+
+
+
+__all__ = ['HashFile', 'NewHasher', 'HashAlgorithms', 'HashIndex']
+
+def HashAlgorithms() -> List[str]:
+    """ names accepted by NewHasher / HashFile in this process: the hashlib algorithms, the xxhash ones when it is installed, and 'fast' """
+    names = sorted(hashlib.algorithms_available)
+    if xxhash is not None: names += sorted(name for name in dir(xxhash) if name.startswith('xxh') and name.endswith(('32', '64', '128')) and callable(getattr(xxhash, name)))
+    return names + ['fast']
+
+def NewHasher(algorithm: str = 'sha1'):
+    """
+        A new hash object of algorithm: any hashlib name (sha1, sha256, blake2b, ...), an xxhash name (xxh64, xxh3_64, xxh3_128, ...) when xxhash is installed,
+        or 'fast': xxh3_64 with xxhash, otherwise the faster of blake2b and sha256 on this cpu (see _FastAlgorithm).
+        'fast' digests are only comparable between processes that resolve it to the same algorithm. Raises ValueError for unknown names.
+    """
+    if algorithm == 'fast': algorithm = _FastAlgorithm()
+
+    if algorithm.startswith('xxh'):
+        if xxhash is None: raise ValueError(f'{algorithm!r} requires the xxhash package')
+        factory = getattr(xxhash, algorithm, None)
+        if factory is None: raise ValueError(f'unknown xxhash algorithm {algorithm!r}')
+        return factory()
+
+    return hashlib.new(algorithm)
+
+@lru_cache(maxsize=None)
+def _FastAlgorithm() -> str:
+    """ xxh3_64 when available; otherwise sha256 beats blake2b on cpus with sha extensions and loses elsewhere, so both are timed once """
+    if xxhash is not None: return 'xxh3_64'
+
+    data = bytes(1 << 20)
+    def elapsed(name: str) -> float:
+        start = time.perf_counter()
+        hashlib.new(name, data)
+        return time.perf_counter() - start
+
+    return min(('blake2b', 'sha256'), key=lambda name: min(elapsed(name) for _ in range(3)))
+
+def HashFile(path: Union[str, PathLike], algorithm: str = 'sha1', *, block_size: int = 1 << 20, partial: int = None, memory_map: bool = True) -> str:
+    """
+        Hashes a file without allocating a bytes object per block: the file is memory mapped and hashed a block_size slice at a time,
+        or (memory_map=False, empty files and files that can not be mapped) read into one reused buffer.
+
+    :param algorithm: see NewHasher
+    :param block_size: bytes hashed per call; the hash functions release the GIL for each call, so several files can be hashed in parallel threads.
+    :param partial: if given, only hashes the file size and its first and last `partial` bytes: a quick change detection, not a content hash.
+    :return: url safe base64 of the digest
+    """
+    hasher = NewHasher(algorithm)
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if partial is not None:
+            hasher.update(size.to_bytes(8, 'little'))
+            if size > 2 * partial:
+                _Update(hasher, f, partial, partial)
+                f.seek(size - partial)
+                _Update(hasher, f, partial, partial)
+                return _Encode(hasher)
+
+        if memory_map and size:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                m = None
+
+            if m is not None:
+                with m, memoryview(m) as view:
+                    if hasattr(m, 'madvise'): m.madvise(mmap.MADV_SEQUENTIAL)
+                    for offset in range(0, size, block_size):
+                        with view[offset:offset + block_size] as block: hasher.update(block)
+
+                return _Encode(hasher)
+
+        _Update(hasher, f, block_size)
+
+    return _Encode(hasher)
+
+def _Update(hasher, f: IO[bytes], block_size: int, limit: int = None):
+    """ hashes the rest of f (or its next limit bytes), reading into one buffer """
+    buffer = bytearray(block_size if limit is None else min(block_size, limit))
+    with memoryview(buffer) as view:
+        while limit is None or limit > 0:
+            count = f.readinto(view if limit is None or limit >= len(buffer) else view[:limit])
+            if not count: return
+
+            with view[:count] as block: hasher.update(block)
+            if limit is not None: limit -= count
+
+def _Encode(hasher) -> str: return base64.urlsafe_b64encode(hasher.digest()).decode()
+
+
+
+class _ConnectionHolder(object):
+    """ the thread local value of HashIndex._Connection, which can be weakly referenced (a sqlite3.Connection cannot) """
+    __slots__ = ['connection', '__weakref__']
+    def __init__(self, connection: sqlite3.Connection): self.connection = connection
+
+def _CloseConnection(connection: sqlite3.Connection, connections: List[sqlite3.Connection], lock: threading.Lock):
+    with lock:
+        if connection in connections: connections.remove(connection)
+    connection.close()
+
+
+
+class HashIndex(object):
+    """
+        Persistent cache of file hashes (a sqlite database), so unchanged files are not read again after a restart.
+
+        Entries are keyed by (device, inode, algorithm, partial) and are only valid while the file still has the size and mtime_ns it had when it was hashed.
+        Files modified less than `racy` seconds before they were hashed are hashed but not stored: within the mtime resolution of the file system,
+        a later write of the same size would keep the same mtime and go unnoticed.
+
+        The database uses write ahead logging and a busy timeout, so several threads (one connection per thread, closed when its thread ends) and processes
+        can read and update it concurrently.
+        HashIndex.Default, when set, is used by FilePath.GetHashID.
+    """
+    Default: ClassVar[Optional['HashIndex']] = None
+    _schema: Final[str] = '''
+        CREATE TABLE IF NOT EXISTS hashes (
+            device INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            algorithm TEXT NOT NULL,
+            partial INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (device, inode, algorithm, partial)
+        ) WITHOUT ROWID
+    '''
+
+    def __init__(self, path: Union[str, PathLike], *, timeout: float = 30.0, racy: float = 2.0):
+        """
+        :param path: database file, created if needed.
+        :param timeout: seconds to wait for a lock held by another connection.
+        :param racy: see the class documentation.
+        """
+        self.path = os.fspath(path)
+        self.timeout = timeout
+        self.racy = racy
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        with self._Connection() as connection: connection.execute(self._schema)
+
+    @classmethod
+    def SetDefault(cls, index: Union['HashIndex', str, PathLike, None]) -> Optional['HashIndex']:
+        """ Sets HashIndex.Default (an index, the path of one, or None) """
+        cls.Default = index if index is None or isinstance(index, HashIndex) else cls(index)
+        return cls.Default
+
+
+    def _Connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # the thread local values of a thread are released when it ends, and the holder closes the connection with them (pool threads come and go)
+            holder = self._local.holder = _ConnectionHolder(connection)
+            weakref.finalize(holder, _CloseConnection, connection, self._connections, self._lock)
+            with self._lock: self._connections.append(connection)
+
+        return holder.connection
+
+    def Close(self):
+        with self._lock:
+            for connection in self._connections: connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_val, exc_tb): self.Close()
+    def __len__(self) -> int: return self._Connection().execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+
+
+    @staticmethod
+    def _Key(st: os.stat_result, algorithm: str, partial: Optional[int]) -> Tuple[int, int, str, int]: return st.st_dev, st.st_ino, algorithm, -1 if partial is None else partial  # -1: full content
+
+    def Lookup(self, path: Union[str, PathLike], algorithm: str = 'sha1', *, partial: int = None, st: os.stat_result = None) -> Optional[str]:
+        """ the stored digest of path, or None if it is unknown or the file changed since """
+        st = st or os.stat(path)
+        row = self._Connection().execute('SELECT size, mtime_ns, digest FROM hashes WHERE device = ? AND inode = ? AND algorithm = ? AND partial = ?',
+                                          self._Key(st, algorithm, partial)).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns: return None
+        return row[2]
+
+    def Hash(self, path: Union[str, PathLike], algorithm: str = 'sha1', *, partial: int = None, block_size: int = 1 << 20) -> str:
+        """ HashFile(path, ...), reading the file only if the index has no valid digest for it """
+        st = os.stat(path)
+        digest = self.Lookup(path, algorithm, partial=partial, st=st)
+        if digest is not None: return digest
+
+        digest = HashFile(path, algorithm, block_size=block_size, partial=partial)
+        self._Store([(path, st, digest)], algorithm, partial)
+        return digest
+
+    def HashDirectory(self, root: Union[str, PathLike], algorithm: str = 'sha1', *, partial: int = None, recursive: bool = True, workers: int = None,
+                      block_size: int = 1 << 20) -> Dict[str, str]:
+        """
+            Digests of every regular file under root (symbolic links are not followed). Only files without a valid entry are read,
+            in a thread pool of workers threads (the hash functions release the GIL); the new entries are stored in one transaction.
+
+        :return: path -> digest
+        """
+        files: List[Tuple[str, os.stat_result]] = []
+        pending = [os.fspath(root)]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive: pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False): files.append((entry.path, entry.stat(follow_symlinks=False)))
+
+        rows = self._Connection().execute('SELECT device, inode, size, mtime_ns, digest FROM hashes WHERE algorithm = ? AND partial = ?', (algorithm, -1 if partial is None else partial))
+        known = { (device, inode): (size, mtime_ns, digest) for device, inode, size, mtime_ns, digest in rows }
+
+        result: Dict[str, str] = { }
+        stale: List[Tuple[str, os.stat_result]] = []
+        for path, st in files:
+            entry = known.get((st.st_dev, st.st_ino))
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns: result[path] = entry[2]
+            else: stale.append((path, st))
+
+        if stale:
+            def task(item: Tuple[str, os.stat_result]) -> Tuple[str, os.stat_result, str]: return item[0], item[1], HashFile(item[0], algorithm, block_size=block_size, partial=partial)
+
+            with ThreadPoolExecutor(workers) as pool: hashed = list(pool.map(task, stale))
+
+            self._Store(hashed, algorithm, partial)
+            result.update((path, digest) for path, _, digest in hashed)
+
+        return result
+
+    def _Store(self, items: Iterable[Tuple[str, os.stat_result, str]], algorithm: str, partial: Optional[int]):
+        """ stores the digests of files that were not modified while they were hashed, and are not racily recent """
+        horizon = time.time_ns() - int(self.racy * 1e9)
+        rows = []
+        for path, st, digest in items:
+            try:
+                current = os.stat(path)
+            except OSError:
+                continue
+
+            if (current.st_ino, current.st_size, current.st_mtime_ns) != (st.st_ino, st.st_size, st.st_mtime_ns) or st.st_mtime_ns > horizon: continue
+            rows.append(self._Key(st, algorithm, partial) + (st.st_size, st.st_mtime_ns, digest, os.fspath(path)))
+
+        if not rows: return
+
+        connection = self._Connection()
+        with connection: connection.executemany('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def Prune(self) -> int:
+        """ Removes the entries of files that no longer exist (or whose path now holds another file). Returns the number of removed entries. """
+        connection = self._Connection()
+        stale = []
+        for device, inode, path in connection.execute('SELECT DISTINCT device, inode, path FROM hashes').fetchall():
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is None or (st.st_dev, st.st_ino) != (device, inode): stale.append((device, inode))
+
+        with connection: connection.executemany('DELETE FROM hashes WHERE device = ? AND inode = ?', stale)
+        return len(stale)
@@ -0,0 +1,188 @@
+import os
+import queue
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import *
+
+from ..Constants import CPU_COUNT
+from .Hashing import HashFile, HashIndex
+from .MultiThreadedCopier import CopyProgress, MultiThreadedCopier
+
+
+
+
+__all__ = ['SyncDirectory', 'SyncReport']
+
+_Path = Union[str, PathLike]
+
+
+class SyncReport(object):
+    """
+        What SyncDirectory did (or, for a dry run, would do). Paths are relative to the synced roots.
+
+        created / updated: files copied because they are missing / differ in the destination; deleted: destination entries not in the source;
+        directories: destination directories created; confirmed: files of the same size but another mtime, found identical by their hashes (only their metadata is copied);
+        unchanged: count of files that are the same size and mtime; bytes: size of the created and updated files; errors: path -> exception.
+    """
+    __slots__ = ['dry_run', 'created', 'updated', 'deleted', 'directories', 'confirmed', 'unchanged', 'bytes', 'errors', 'elapsed']
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.created: List[str] = []
+        self.updated: List[str] = []
+        self.deleted: List[str] = []
+        self.directories: List[str] = []
+        self.confirmed: List[str] = []
+        self.unchanged = 0
+        self.bytes = 0
+        self.errors: Dict[str, BaseException] = { }
+        self.elapsed = 0.0
+
+    @property
+    def Changed(self) -> bool: return bool(self.created or self.updated or self.deleted or self.directories or self.confirmed)
+
+    def _Merge(self, other: 'SyncReport'):
+        self.created += other.created
+        self.updated += other.updated
+        self.deleted += other.deleted
+        self.directories += other.directories
+        self.confirmed += other.confirmed
+        self.unchanged += other.unchanged
+        self.bytes += other.bytes
+        self.errors.update(other.errors)
+
+    def ToDict(self) -> Dict[str, Any]:
+        return dict(dry_run=self.dry_run, created=self.created, updated=self.updated, deleted=self.deleted, directories=self.directories, confirmed=self.confirmed,
+                    unchanged=self.unchanged, bytes=self.bytes, errors={ path: repr(error) for path, error in self.errors.items() }, elapsed=self.elapsed)
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} dry_run={self.dry_run} created={len(self.created)} updated={len(self.updated)} deleted={len(self.deleted)} '
+                f'directories={len(self.directories)} confirmed={len(self.confirmed)} unchanged={self.unchanged} bytes={self.bytes} errors={len(self.errors)}>')
+
+
+
+def SyncDirectory(source: _Path, destination: _Path, *, delete: bool = False, checksum: bool = False, dry_run: bool = False, workers: int = None,
+                  index: Union[HashIndex, bool, None] = None, progress: Callable[[CopyProgress], Any] = None) -> SyncReport:
+    """
+        Makes destination a mirror of the directory source, copying only the files that are missing or differ in size or mtime (copies keep the mtime of their source,
+        so a synced file compares equal afterwards). Symbolic links are followed; entries that are neither files nor directories are ignored.
+
+        Directories are compared in a pool of workers threads, and the files to copy are handed to a MultiThreadedCopier while the walk goes on,
+        so comparing and copying overlap. A second sync of an unchanged tree only lists and stats both trees.
+
+    :param delete: also delete destination entries that are not in source. A destination entry whose type differs from its source (file / directory) is always replaced.
+    :param checksum: files of the same size but another mtime are compared by hash (see FilePath.GetHashID), and only their metadata is copied if they are identical.
+    :param dry_run: change nothing, only report what would be done.
+    :param workers: threads of the compare and of the copy pools, defaults to Constants.CPU_COUNT
+    :param index: persistent hash cache used by checksum: a HashIndex, None for HashIndex.Default (if set) or False for none.
+    :param progress: see MultiThreadedCopier
+    :return: the report; errors are collected in it instead of being raised.
+    """
+    start = time.perf_counter()
+    source, destination = os.path.abspath(source), os.path.abspath(destination)
+    if not os.path.isdir(source): raise NotADirectoryError(f'path "{source}" is not a valid directory.')
+
+    report = SyncReport(dry_run)
+    if not os.path.isdir(destination):
+        if os.path.lexists(destination): raise NotADirectoryError(f'path "{destination}" is not a directory.')
+        report.directories.append('.')
+        if not dry_run: os.makedirs(destination)
+
+    if index is None: index = HashIndex.Default
+    workers = workers or CPU_COUNT or 1
+    copier = None if dry_run else MultiThreadedCopier(workers, progress=progress)
+    try:
+        # completed tasks are collected in a queue: concurrent.futures.wait would go through every pending task each time
+        results: queue.SimpleQueue = queue.SimpleQueue()
+        with ThreadPoolExecutor(workers) as pool:
+            pool.submit(_Compare, source, destination, '', delete, checksum, dry_run, index, copier).add_done_callback(results.put)
+            pending = 1
+            while pending:
+                partial, folders = results.get().result()
+                pending += len(folders) - 1
+                report._Merge(partial)
+                for folder in folders: pool.submit(_Compare, source, destination, folder, delete, checksum, dry_run, index, copier).add_done_callback(results.put)
+    finally:
+        if copier is not None:
+            copier.Join(raise_errors=False)
+            report.errors.update((os.path.relpath(path, source), error) for path, error in copier.Errors.items())
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def _Scan(folder: str) -> Dict[str, os.DirEntry]:
+    try:
+        with os.scandir(folder) as entries: return { entry.name: entry for entry in entries }
+    except (FileNotFoundError, NotADirectoryError):
+        return { }
+
+def _Compare(source: str, destination: str, folder: str, delete: bool, checksum: bool, dry_run: bool, index: Union[HashIndex, bool, None],
+             copier: Optional[MultiThreadedCopier]) -> Tuple[SyncReport, List[str]]:
+    """ compares (and syncs) one directory: the files are queued in copier, the sub directories are returned to be compared by other tasks """
+    report = SyncReport(dry_run)
+    folders: List[str] = []
+    try:
+        sources = _Scan(os.path.join(source, folder))
+        targets = _Scan(os.path.join(destination, folder))
+    except OSError as e:
+        report.errors[folder or '.'] = e
+        return report, folders
+
+    prefix = folder + os.sep if folder else ''
+    for name, entry in sources.items():
+        relative = prefix + name
+        target = targets.get(name)
+        try:
+            if entry.is_dir():
+                if target is not None and not target.is_dir(follow_symlinks=False):
+                    _Delete(target, relative, dry_run, report)
+                    target = None
+                if target is None:
+                    report.directories.append(relative)
+                    if not dry_run: os.mkdir(os.path.join(destination, relative))
+                folders.append(relative)
+                continue
+
+            if not entry.is_file(): continue
+
+            st = entry.stat()
+            if target is not None and not target.is_file(follow_symlinks=False):
+                _Delete(target, relative, dry_run, report)
+                target = None
+
+            if target is None: report.created.append(relative)
+            else:
+                other = target.stat(follow_symlinks=False)
+                if other.st_size == st.st_size and other.st_mtime_ns == st.st_mtime_ns:
+                    report.unchanged += 1
+                    continue
+
+                if checksum and other.st_size == st.st_size and _Digest(entry.path, index) == _Digest(target.path, index):
+                    report.confirmed.append(relative)
+                    if not dry_run: shutil.copystat(entry.path, target.path)
+                    continue
+
+                report.updated.append(relative)
+
+            report.bytes += st.st_size
+            if copier is not None: copier.Copy(entry.path, os.path.join(destination, relative))
+        except OSError as e:
+            report.errors[relative] = e
+
+    if delete:
+        for name in targets.keys() - sources.keys():
+            try:
+                _Delete(targets[name], prefix + name, dry_run, report)
+            except OSError as e:
+                report.errors[prefix + name] = e
+
+    return report, folders
+
+def _Delete(entry: os.DirEntry, relative: str, dry_run: bool, report: SyncReport):
+    report.deleted.append(relative)
+    if dry_run: return
+
+    if entry.is_dir(follow_symlinks=False): shutil.rmtree(entry.path)
+    else: os.remove(entry.path)
+
+def _Digest(path: str, index: Union[HashIndex, bool, None]) -> str: return HashFile(path) if index is None or index is False else index.Hash(path)
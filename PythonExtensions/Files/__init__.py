@@ -1,13 +1,16 @@
-import base64
-import hashlib
+import asyncio
+import codecs
 import json
 import os
 import pickle
 import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import suppress
 from os import PathLike, chmod, fsencode, listdir, makedirs, remove, rename
 from os.path import *
 from pathlib import Path
-from shutil import rmtree
+from shutil import copymode, copystat, rmtree
 from typing import *
 from typing import BinaryIO
 
@@ -15,7 +18,12 @@ from aiofiles import open as async_open
 from attr import attrib, attrs, validators
 
 from ..Json import *
+from ..Json import _LoadLines
+from ..JsonBackends import JsonBackend, JsonBackends
 from ..Names import nameof
+from .Hashing import HashFile, HashIndex
+from .MultiThreadedCopier import CopyProgress
+from .Sync import SyncDirectory, SyncReport
 
 
 
@@ -35,11 +43,12 @@ class ReadWriteData(Protocol[AnyStr]):
 class FilePath(PathLike):
     FullPath: str = attrib(validator=validators.instance_of((dict, Path, str, PathLike)))
     IsTemporary: bool = attrib(validator=validators.instance_of(bool), init=False)
-    Hash: Optional[str] = attrib(default=None, validator=validators.instance_of(str), init=False)
+    Hash: Optional[str] = attrib(default=None, validator=validators.instance_of(str), init=False, eq=False, hash=False, repr=False)  # a cache, not part of the identity
 
     def __init__(self, _path: Union[str, Dict[str, Any], Path, 'FilePath'], temporary: bool = False):
         self.FullPath = self.convert(_path)
         self.IsTemporary = temporary
+        self.Hash = None
 
     @staticmethod
     def convert(_path: Union[str, Dict[str, Any], Path, 'FilePath']) -> str:
@@ -108,13 +117,13 @@ class FilePath(PathLike):
 
     def __call__(self, mode: int = 0o777, exist_ok: bool = True) -> Optional['FileIO']:
         """
-        Creates the base directories then opens the file for reading / writing via FileIO
+        Creates the parent directories then opens the file for reading / writing via FileIO
 
         :param mode:
         :param exist_ok:
         :return: FileIO
         """
-        makedirs(self.BaseName, mode, exist_ok)
+        makedirs(self.DirectoryName, mode, exist_ok)
 
         return None if self.IsDirectory else FileIO(self)
 
@@ -166,23 +175,32 @@ class FilePath(PathLike):
     def Size(self) -> int: return getsize(self.FullPath)
     def ToUri(self): return Path(self.FullPath).as_uri()
 
-    def GetHashID(self, BlockSize: int = 65536) -> str:
+    def GetHashID(self, BlockSize: int = 1 << 20, *, algorithm: str = 'sha1', partial: int = None, index: Union[HashIndex, bool, None] = None) -> str:
         """
-        :param BlockSize: defaults to 64KB
-        :return:
+        :param BlockSize: bytes hashed at a time, defaults to 1MB. See Hashing.HashFile
+        :param algorithm: see Hashing.NewHasher. Only the default (sha1, full content) hash is cached in Hash.
+        :param partial: if given, a quick change detection hash of the size and the first and last `partial` bytes.
+        :param index: persistent cache consulted before reading the file: a HashIndex, None for HashIndex.Default (if set) or False for none.
+        :return: url safe base64 of the digest
         """
         if self.IsDirectory: raise IsADirectoryError('Argument cannot be a directory.')
 
-        if self.Hash is None:
-            _hasher = hashlib.sha1()
-            with open(self, 'rb') as f:
-                buf = f.read(BlockSize)
-                while len(buf) > 0:
-                    _hasher.update(buf)
-                    buf = f.read(BlockSize)
-            self.Hash = base64.urlsafe_b64encode(_hasher.digest()).decode()
+        cached = algorithm == 'sha1' and partial is None
+        if cached and self.Hash is not None: return self.Hash
 
-        return self.Hash
+        if index is None: index = HashIndex.Default
+        if index is None or index is False: digest = HashFile(self, algorithm, block_size=BlockSize, partial=partial)
+        else: digest = index.Hash(self, algorithm, partial=partial, block_size=BlockSize)
+        if cached: self.Hash = digest
+        return digest
+
+    def SyncTo(self, destination: Union[str, 'FilePath'], *, delete: bool = False, checksum: bool = False, dry_run: bool = False, workers: int = None,
+               index: Union[HashIndex, bool, None] = None, progress: Callable[[CopyProgress], Any] = None) -> SyncReport:
+        """
+            Mirrors this directory into destination, copying only the files that are new or changed (by size and mtime), and returns what was (or, dry_run, would be) done.
+            See Sync.SyncDirectory for the options.
+        """
+        return SyncDirectory(self, destination, delete=delete, checksum=checksum, dry_run=dry_run, workers=workers, index=index, progress=progress)
 
 
 
@@ -252,6 +270,102 @@ class FilePath(PathLike):
 
 _TFileData = TypeVar('_TFileData', bound='FileIO')
 
+def _JsonLine(item: Any, backend: Union[str, JsonBackend, None]) -> bytes: return JsonBackends.Get(backend).dumps(item, default=BaseObjectModel._serialize).encode() + b'\n'
+
+async def _CopyAsync(source: Union[str, PathLike], destination: Union[str, PathLike], buffer_size: int, metadata: bool, progress: Optional[Callable[[int, int], Any]]) -> int:
+    """ copies source into a temporary file next to destination, buffer_size bytes at a time through one reused buffer, and renames it to destination once complete """
+    source, destination = os.fspath(source), abspath(destination)
+    total = os.stat(source).st_size
+    fd, temporary = tempfile.mkstemp(prefix=f'.{basename(destination)}.', suffix='.partial', dir=dirname(destination))
+    copied = 0
+    try:
+        async with async_open(fd, 'wb') as out, async_open(source, 'rb') as _in:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                count = await _in.readinto(buffer)
+                if not count: break
+
+                await out.write(view[:count])
+                copied += count
+                if progress is not None: progress(copied, total)
+
+        if metadata: copystat(source, temporary)
+        else: copymode(source, temporary)
+        os.replace(temporary, destination)
+    except BaseException:  # including asyncio.CancelledError
+        with suppress(OSError): os.remove(temporary)
+        raise
+
+    return copied
+
+
+
+class _Records(object):
+    """ splits a stream of chunks at delimiter: Feed returns the records completed by a chunk, Close the last one. A record spanning several chunks is joined once. """
+    __slots__ = ['delimiter', 'keep', 'parts', 'tail']
+    def __init__(self, delimiter: bytes, keep: bool):
+        if not delimiter: raise ValueError('empty delimiter')
+        self.delimiter = bytes(delimiter)
+        self.keep = keep
+        self.parts: List[bytes] = []
+        self.tail = b''  # the last len(delimiter) - 1 bytes of parts, where a delimiter split by the chunks begins; parts may be shorter than that
+
+    def Feed(self, chunk: Union[bytes, memoryview]) -> List[bytes]:
+        data, delimiter, parts = bytes(chunk), self.delimiter, self.parts
+        if parts and delimiter not in data and (len(delimiter) == 1 or delimiter not in self.tail + data[:len(delimiter) - 1]):
+            parts.append(data)
+            if len(delimiter) > 1: self.tail = (self.tail + data)[1 - len(delimiter):]
+            return []
+
+        if parts:
+            parts.append(data)
+            data = b''.join(parts)
+            parts.clear()
+
+        records = data.split(delimiter)
+        rest = records.pop()
+        parts.append(rest)
+        if len(delimiter) > 1: self.tail = rest[1 - len(delimiter):]
+        return [record + delimiter for record in records] if self.keep else records
+
+    def Close(self) -> List[bytes]:
+        record = b''.join(self.parts)
+        self.parts.clear()
+        self.tail = b''
+        return [record] if record else []
+
+class _Lines(object):
+    """ decodes a stream of chunks and splits it into lines ending with '\n' or '\r\n' (returned as '\n' with keepends) """
+    __slots__ = ['decoder', 'keepends', 'parts']
+    def __init__(self, encoding: str, errors: str, keepends: bool):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors)
+        self.keepends = keepends
+        self.parts: List[str] = []
+
+    def Feed(self, chunk: Union[bytes, memoryview], final: bool = False) -> List[str]:
+        text, parts = self.decoder.decode(chunk, final), self.parts
+        if '\n' not in text and not final:
+            parts.append(text)
+            return []
+
+        if parts:
+            parts.append(text)
+            text = ''.join(parts)
+            parts.clear()
+
+        if '\r' in text: text = text.replace('\r\n', '\n')  # a '\r' ending the text is kept with the rest, next to its '\n'
+        lines = text.split('\n')
+        rest = lines.pop()
+        if self.keepends: lines = [line + '\n' for line in lines]
+        if final:
+            if rest: lines.append(rest)
+        else: parts.append(rest)
+        return lines
+
+    def Close(self) -> List[str]: return self.Feed(b'', True)
+
+
 @attrs(slots=True, hash=True, order=True, eq=True, auto_attribs=True, frozen=True, collect_by_mro=True)
 class FileIO(PathLike, Generic[_TFileData]):
     Path: FilePath = attrib(validator=validators.instance_of(FilePath))
@@ -280,12 +394,28 @@ class FileIO(PathLike, Generic[_TFileData]):
             return file.dump(data, f)
 
 
-    def SaveJson(self, data: _TFileData, **kwargs):
+    def SaveJson(self, data: _TFileData, *, backend: Union[str, JsonBackend] = None, **kwargs):
         with open(self, 'w') as f:
-            return json.dump(data, f, **kwargs)
-    def ReadJson(self, **kwargs) -> _TFileData:
+            return JsonBackends.Get(backend).dump(data, f, **kwargs)
+    def ReadJson(self, *, backend: Union[str, JsonBackend] = None, **kwargs) -> _TFileData:
         with open(self, 'r') as f:
-            return json.load(f, **kwargs)
+            return JsonBackends.Get(backend).load(f, **kwargs)
+
+
+    def AppendJsonLine(self, item: Any, *, backend: Union[str, JsonBackend] = None) -> int:
+        """ Appends item to the json lines file as one line (see BaseListModel.ToJsonLines), with a single write: the existing lines are not read or rewritten. """
+        with open(self, 'ab') as f:
+            return f.write(_JsonLine(item, backend))
+    def AppendJsonLines(self, items: Iterable[Any], *, backend: Union[str, JsonBackend] = None, buffer_size: int = 65536) -> int:
+        """ Appends every item as one line, in writes of roughly buffer_size bytes. """
+        total = 0
+        with open(self, 'ab', buffering=buffer_size) as f:
+            for item in items: total += f.write(_JsonLine(item, backend))
+
+        return total
+    def IterJsonLines(self, *, chunk_size: int = 1 << 20, workers: int = 1, pool: ProcessPoolExecutor = None, backend: Union[str, JsonBackend] = None) -> Iterator[Any]:
+        """ Yields the values of the json lines file, reading blocks of roughly chunk_size bytes. See Json.IterJsonLines. """
+        return IterJsonLines(self, chunk_size=chunk_size, workers=workers, pool=pool, backend=backend)
 
 
     def SavePickle(self, data: Any, **kwargs):
@@ -319,6 +449,35 @@ class FileIO(PathLike, Generic[_TFileData]):
             return f.read()
 
 
+    def IterChunks(self, size: int = 1 << 20) -> Iterator[memoryview]:
+        """
+            Yields the content of the file in chunks of up to size bytes, read into one reused buffer: the memory used does not depend on the size of the file.
+            Each chunk is a view of that buffer, overwritten by the next one; use bytes(chunk) to keep it.
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        with open(self, 'rb', buffering=0) as f:
+            while True:
+                count = f.readinto(buffer)
+                if not count: return
+                yield view[:count]
+
+    def IterLines(self, *, encoding: str = 'utf-8', errors: str = 'strict', keepends: bool = False, buffer_size: int = 1 << 20) -> Iterator[str]:
+        """
+            Yields the lines of the text file, decoding chunks of buffer_size bytes (see IterChunks) at once.
+            Lines end with '\n' or '\r\n'; with keepends they are yielded ending with '\n', like a file opened in text mode.
+        """
+        lines = _Lines(encoding, errors, keepends)
+        for chunk in self.IterChunks(buffer_size): yield from lines.Feed(chunk)
+        yield from lines.Close()
+
+    def IterRecords(self, delimiter: bytes = b'\n', *, keep_delimiter: bool = False, buffer_size: int = 1 << 20) -> Iterator[bytes]:
+        """ Yields the records of the file separated by delimiter (one or more bytes), reading chunks of buffer_size bytes (see IterChunks). An empty last record is not yielded. """
+        records = _Records(delimiter, keep_delimiter)
+        for chunk in self.IterChunks(buffer_size): yield from records.Feed(chunk)
+        yield from records.Close()
+
+
 
 
     async def WriteAsync(self, content: Union[str, bytes], **kwargs) -> int:
@@ -343,10 +502,109 @@ class FileIO(PathLike, Generic[_TFileData]):
             return await f.read()
 
 
-    async def CopyToAsync(self, _outPath: FilePath):
-        async with async_open(_outPath, 'wb') as out:
-            async with async_open(self, 'rb') as _in:
-                await out.write(await _in.read())
+    async def IterChunksAsync(self, size: int = 1 << 20) -> AsyncIterator[memoryview]:
+        """ async version of IterChunks """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        async with async_open(self, 'rb') as f:
+            while True:
+                count = await f.readinto(buffer)
+                if not count: return
+                yield view[:count]
+
+    async def IterLinesAsync(self, *, encoding: str = 'utf-8', errors: str = 'strict', keepends: bool = False, buffer_size: int = 1 << 20) -> AsyncIterator[str]:
+        """ async version of IterLines """
+        lines = _Lines(encoding, errors, keepends)
+        async for chunk in self.IterChunksAsync(buffer_size):
+            for line in lines.Feed(chunk): yield line
+        for line in lines.Close(): yield line
+
+    async def IterRecordsAsync(self, delimiter: bytes = b'\n', *, keep_delimiter: bool = False, buffer_size: int = 1 << 20) -> AsyncIterator[bytes]:
+        """ async version of IterRecords """
+        records = _Records(delimiter, keep_delimiter)
+        async for chunk in self.IterChunksAsync(buffer_size):
+            for record in records.Feed(chunk): yield record
+        for record in records.Close(): yield record
+
+
+    async def AppendJsonLineAsync(self, item: Any, *, backend: Union[str, JsonBackend] = None) -> int:
+        """ async version of AppendJsonLine """
+        async with async_open(self, 'ab') as f:
+            return await f.write(_JsonLine(item, backend))
+
+    async def IterJsonLinesAsync(self, *, chunk_size: int = 1 << 20, executor: Executor = None, backend: Union[str, JsonBackend] = None) -> AsyncIterator[Any]:
+        """
+            async version of IterJsonLines. Blocks of roughly chunk_size bytes of lines are read with aiofiles and decoded in executor
+            (a thread or process pool; None uses the loop's default executor), so the event loop is not blocked by decoding.
+        """
+        loop = asyncio.get_running_loop()
+        backend = JsonBackends.Get(backend).Name
+        first = 1
+        async with async_open(self, 'rb') as f:
+            while True:
+                lines = await f.readlines(chunk_size)
+                if not lines: return
+
+                for item in await loop.run_in_executor(executor, _LoadLines, backend, lines, first): yield item
+                first += len(lines)
+
+
+    async def CopyToAsync(self, _outPath: Union[str, FilePath], *, buffer_size: int = 1 << 20, metadata: bool = False, progress: Callable[[int, int], Any] = None) -> int:
+        """
+            Copies the file to _outPath buffer_size bytes at a time, through one reused buffer: the memory used does not depend on the size of the file,
+            and each aiofiles call only holds its thread for one chunk. The chunks are written to a temporary file next to _outPath, which replaces _outPath once complete,
+            so a failed or cancelled copy leaves _outPath as it was and no partial file.
+
+        :param metadata: also copy the times; the permission bits of the source are always copied (like shutil.copy)
+        :param progress: called with (bytes copied, size of the file) after each chunk
+        :return: bytes copied
+        """
+        return await _CopyAsync(self, _outPath, buffer_size, metadata, progress)
+
+    @classmethod
+    async def CopyManyAsync(cls, files: Iterable[Tuple[Union[str, PathLike], Union[str, PathLike]]], *, concurrency: int = 8, buffer_size: int = 1 << 20,
+                            metadata: bool = False, progress: Callable[[CopyProgress], Any] = None, return_exceptions: bool = False) -> List[Union[int, BaseException]]:
+        """
+            Copies every (source, destination) pair like CopyToAsync, at most concurrency at a time (an asyncio.Semaphore).
+            progress, if given, is called with the CopyProgress of the whole batch after every chunk.
+
+            When a copy fails, the others are cancelled and the error is raised, unless return_exceptions (the result then holds the exception of each failed copy).
+            Cancelled copies remove their temporary file like failed ones: every destination is either complete or untouched.
+
+        :return: bytes copied per pair, in order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        counters = CopyProgress()
+
+        async def copy(source: Union[str, PathLike], destination: Union[str, PathLike]) -> int:
+            done = 0
+            def chunk(copied: int, total: int):
+                nonlocal done
+                counters.bytes += copied - done
+                done = copied
+                if progress is not None:
+                    counters.elapsed = time.perf_counter() - counters.start
+                    progress(counters)
+
+            async with semaphore:
+                try:
+                    size = await _CopyAsync(source, destination, buffer_size, metadata, chunk)
+                except BaseException:
+                    counters.failed += 1
+                    counters.bytes -= done
+                    raise
+
+                counters.files += 1
+                return size
+
+        tasks = [asyncio.ensure_future(copy(source, destination)) for source, destination in files]
+        counters.submitted = len(tasks)
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        except BaseException:
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)  # their temporary files are removed before returning
+            raise
 
 
 
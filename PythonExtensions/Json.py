@@ -1,12 +1,24 @@
+import codecs
 import copy as _copy
+import io
+import pickle
 import re
-from datetime import datetime, time, timedelta
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
 from enum import Enum
-from json import dumps as _dumps, loads as _loads
+from functools import partial
+from itertools import chain
+from json import JSONDecodeError, JSONDecoder, JSONEncoder
+from operator import attrgetter, is_not, itemgetter, methodcaller
+from os import PathLike
 from typing import *
 
-from dateutil import parser
-
+from .Constants import CPU_COUNT
+from .Dates import DateTimeParser
+from .Exceptions import JsonPatchError
+from .JsonBackends import JsonBackend, JsonBackends
 from .Names import nameof, typeof
 
 
@@ -22,6 +34,12 @@ __all__ = ['BaseObjectModel',
            'AssertType',
            'ConvertBool',
            'RaiseKeyError',
+           'JsonSerializers',
+           'IterJsonArray',
+           'IterJsonLines',
+           'FastCopy',
+           'ListIndex',
+           'InternPool',
            ]
 
 
@@ -69,15 +87,510 @@ def RaiseKeyError(key, d: Dict): raise KeyError(f'{key} not in {d.keys()}')
 
 
 
-_regex = re.compile(r'((?P<hours>\d+?)hr)?((?P<minutes>\d+?)m)?((?P<seconds>\d+?)s)?')
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+
+def IterJsonArray(fp: Union[IO, PathLike], *, chunk_size: int = 65536, **kwargs) -> Iterator[Any]:
+    """
+        Incrementally decodes a top-level json array, yielding one item at a time.
+        Only the current item and one chunk of the file are held in memory.
+
+    :param fp: a text or binary (utf-8) file object, or a path (str, FilePath, FileIO) to open for reading.
+    :param chunk_size: number of characters / bytes read at a time.
+    :param kwargs: passed to json.JSONDecoder (object_hook, parse_float, ...)
+    """
+    if isinstance(fp, (str, PathLike)):
+        with open(fp, 'r', encoding='utf-8') as f:
+            yield from IterJsonArray(f, chunk_size=chunk_size, **kwargs)
+        return
+
+    read = fp.read
+    if isinstance(fp, (io.RawIOBase, io.BufferedIOBase)):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        def read(size: int) -> str:
+            data = fp.read(size)
+            return decoder.decode(data, final=not data)
+
+    raw_decode = JSONDecoder(**kwargs).raw_decode
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof: return False
+
+        # read at least as much as is pending, so an item larger than chunk_size is re-scanned a logarithmic number of times.
+        data = read(max(chunk_size, len(buffer) - pos))
+        if not data:
+            eof = True
+            return False
+
+        buffer = buffer[pos:] + data
+        pos = 0
+        return True
+
+    def skip_whitespace() -> Optional[str]:
+        nonlocal pos
+        while True:
+            pos = _whitespace.match(buffer, pos).end()
+            if pos < len(buffer): return buffer[pos]
+            if not fill(): return None
+
+    if skip_whitespace() != '[': raise JSONDecodeError('Expecting top-level array', buffer, pos)
+    pos += 1
+    if skip_whitespace() == ']': return
+
+    while True:
+        if skip_whitespace() is None: raise JSONDecodeError('Expecting value', buffer, pos)
+
+        try:
+            value, end = raw_decode(buffer, pos)
+        except JSONDecodeError:
+            if fill(): continue
+            raise
+
+        # a value is only complete once its delimiter has been read: a number cut by the chunk boundary ("2" of "2.5") still decodes.
+        following = _whitespace.match(buffer, end).end()
+        if (following == len(buffer) or buffer[following] not in ',]') and fill(): continue
+
+        pos = end
+        yield value
+
+        delimiter = skip_whitespace()
+        if delimiter == ']': return
+        if delimiter != ',': raise JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+
+
+
+def _LoadLines(backend: Union[str, JsonBackend, None], lines: Sequence[Union[str, bytes]], first: int = 1) -> list:
+    """ decodes a block of json lines, skipping blank ones; first is the line number of lines[0], for errors. Process pool entry point for IterJsonLines. """
+    loads = JsonBackends.Get(backend).loads
+    try:
+        return [loads(line) for line in lines if line and not line.isspace()]
+    except JSONDecodeError:
+        for number, line in enumerate(lines, first):
+            if not line or line.isspace(): continue
+            try:
+                loads(line)
+            except JSONDecodeError as e:
+                raise JSONDecodeError(f'{e.msg} (line {number})', e.doc, e.pos) from e
+        raise
+
+def IterJsonLines(fp: Union[IO, PathLike], *, chunk_size: int = 1 << 20, workers: int = 1, pool: ProcessPoolExecutor = None, backend: Union[str, JsonBackend] = None) -> Iterator[Any]:
+    """
+        Decodes a json lines file (one json document per line), yielding one value at a time. Blank lines are skipped.
+        Lines are read in blocks of roughly chunk_size bytes, so memory is bounded by a few blocks, not by the file.
+
+        With workers > 1 (or a pool), blocks are decoded in worker processes while the next ones are read; at most 2 blocks per worker are in flight.
+        Like FromJsonMany, that only pays off when decoding costs more than pickling the decoded values back.
+
+    :param fp: a text or binary (utf-8) file object, or a path (str, FilePath, FileIO) to open for reading.
+    :param chunk_size: number of bytes / characters of whole lines per block.
+    :param workers: number of worker processes (with pool: the number of its workers, used to bound the blocks in flight); 1 decodes in this process.
+    :param pool: an existing ProcessPoolExecutor to use instead of starting one.
+    :param backend: json backend (name or instance).
+    """
+    if isinstance(fp, (str, PathLike)):
+        with open(fp, 'rb') as f:
+            yield from IterJsonLines(f, chunk_size=chunk_size, workers=workers, pool=pool, backend=backend)
+        return
+
+    backend = JsonBackends.Get(backend)
+
+    def blocks() -> Iterator[Tuple[List, int]]:
+        first = 1
+        while True:
+            lines = fp.readlines(chunk_size)
+            if not lines: return
+            yield lines, first
+            first += len(lines)
+
+    if pool is None and workers <= 1:
+        for lines, first in blocks(): yield from _LoadLines(backend, lines, first)
+        return
+
+    executor = pool or ProcessPoolExecutor(workers)
+    limit = 2 * max(workers, 1)
+    pending: Deque[Future] = deque()
+    try:
+        for lines, first in blocks():
+            pending.append(executor.submit(_LoadLines, backend.Name, lines, first))
+            if len(pending) >= limit: yield from pending.popleft().result()
+
+        while pending: yield from pending.popleft().result()
+    finally:
+        for future in pending: future.cancel()
+        if pool is None: executor.shutdown()
 
 _T = TypeVar("_T")
 _KT = TypeVar("_KT")
 _VT = TypeVar("_VT")
 
+
+
+def _identity(o): return o
+
+def _FromJsonChunk(cls: Type, backend: str, kwargs: Dict[str, Any], payloads: List[Union[str, bytes]]) -> list:
+    """ process pool entry point for BaseObjectModel.FromJsonMany """
+    return [cls.FromJson(payload, backend=backend, **kwargs) for payload in payloads]
+
+def _Picklable(cls: Type) -> bool:
+    try:
+        pickle.dumps(cls)
+        return True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+_enum_value = attrgetter('value')
+_iso_format = methodcaller('isoformat')
+_total_seconds = methodcaller('total_seconds')
+
+class JsonSerializers(object):
+    """
+        Registry of the converters used by BaseObjectModel._serialize and BaseObjectModel._ToDict.
+
+        The converter for a type is resolved once (registered converters first, then the builtin isinstance / ToList / ToTuple / ToDict rules)
+        and cached by the concrete type, so repeated values of the same type only cost a dict lookup.
+
+        Converters are resolved against the type, not the instance; objects that only gain ToList / ToTuple / ToDict as instance attributes
+        should be registered explicitly.
+    """
+    _registered: Dict[Type, Callable[[Any], Any]] = { }
+    _serializers: Dict[Type, Callable[[Any], Any]] = { }
+    _dict_converters: Dict[Type, Callable[[Any], Any]] = { }
+
+    @classmethod
+    def Register(cls, _type: Type, converter: Callable[[Any], Any]):
+        """
+            Registers a converter for _type and its subclasses. Registered converters take precedence over the builtin rules.
+
+        :param _type: the type to convert
+        :param converter: callable that returns a json serializable value
+        """
+        if not isinstance(_type, type): throw(_type, type)
+        if not callable(converter): raise TypeError(f'converter must be callable   got type {typeof(converter)}')
+
+        cls._registered[_type] = converter
+        cls.Clear()
+        return converter
+    @classmethod
+    def Unregister(cls, _type: Type) -> Optional[Callable[[Any], Any]]:
+        converter = cls._registered.pop(_type, None)
+        cls.Clear()
+        return converter
+    @classmethod
+    def IsRegistered(cls, _type: Type) -> bool: return _type in cls._registered
+    @classmethod
+    def Clear(cls):
+        """ Drops the cached resolutions. Registered converters are kept. """
+        cls._serializers.clear()
+        cls._dict_converters.clear()
+
+
+    @classmethod
+    def Serializer(cls, _type: Type) -> Callable[[Any], Any]:
+        """ The converter BaseObjectModel._serialize uses for instances of _type. """
+        converter = cls._serializers.get(_type)
+        if converter is None: converter = cls._serializers[_type] = cls._ResolveSerializer(_type)
+        return converter
+    @classmethod
+    def DictConverter(cls, _type: Type) -> Callable[[Any], Any]:
+        """ The converter BaseObjectModel._ToDict uses for values of _type. """
+        converter = cls._dict_converters.get(_type)
+        if converter is None: converter = cls._dict_converters[_type] = cls._ResolveDictConverter(_type)
+        return converter
+
+
+    @classmethod
+    def _FindRegistered(cls, _type: Type) -> Optional[Callable[[Any], Any]]:
+        if not cls._registered: return None
+
+        for base in _type.__mro__:
+            converter = cls._registered.get(base)
+            if converter is not None: return converter
+
+        return None
+
+    @staticmethod
+    def _FindMethod(_type: Type, *names: str) -> Optional[Callable[[Any], Any]]:
+        for name in names:
+            if callable(getattr(_type, name, None)): return methodcaller(name)
+
+        return None
+
+    @classmethod
+    def _ResolveSerializer(cls, _type: Type) -> Callable[[Any], Any]:
+        converter = cls._FindRegistered(_type)
+        if converter is not None: return converter
+
+        if issubclass(_type, Enum): return _enum_value
+
+        if issubclass(_type, (time, datetime)): return _iso_format
+
+        if issubclass(_type, timedelta): return _total_seconds
+
+        if issubclass(_type, BaseSetModel): return methodcaller('ToList')
+
+        if issubclass(_type, BaseListModel): return _identity
+
+        if issubclass(_type, BaseDictModel): return methodcaller('ToDict')
+
+        # models that build their own json ready dict (BaseSchemaModel)
+        if issubclass(_type, BaseObjectModel) and callable(getattr(_type, '_ToJsonDict', None)): return methodcaller('_ToJsonDict')
+
+        return cls._FindMethod(_type, 'ToList', 'ToTuple', 'ToDict') or _identity
+
+    @classmethod
+    def _ResolveDictConverter(cls, _type: Type) -> Callable[[Any], Any]:
+        converter = cls._FindRegistered(_type)
+        if converter is not None: return converter
+
+        if issubclass(_type, Enum): return _enum_value
+
+        if issubclass(_type, BaseListModel): return _identity
+
+        if issubclass(_type, BaseSetModel): return methodcaller('ToList')
+
+        if issubclass(_type, BaseDictModel): return methodcaller('ToDict')
+
+        return cls._FindMethod(_type, 'ToList', 'ToTuple', 'ToDict', 'ToString') or _identity
+
+
+
+_atomic_types: Set[Type] = { str, int, float, bool, complex, bytes, type(None), date, datetime, time, timedelta }
+_copiers: Dict[Type, Callable[[Any, Dict], Any]] = { }
+
+def FastCopy(obj: _T) -> _T:
+    """
+        Deep copy specialised for json shaped data: dict / list / tuple / set trees of immutable leaves and Base*Model instances.
+        Immutable leaves (str, numbers, Enum members, datetime, ...) are shared instead of copied, dict keys are kept as is,
+        and anything else falls back to copy.deepcopy.
+
+        Unlike copy.deepcopy, a container referenced twice in the tree is copied twice. Self referencing trees fall back to copy.deepcopy.
+    """
+    try:
+        return _fast_copy(obj, { })
+    except RecursionError:
+        return _copy.deepcopy(obj)
+
+def _fast_copy(obj, memo: Dict):
+    copier = _copiers.get(type(obj))
+    if copier is None: copier = _copiers[type(obj)] = _ResolveCopier(type(obj))
+    return copier(obj, memo)
+
+def _copy_atomic(obj, memo: Dict): return obj
+def _copy_deep(obj, memo: Dict): return _copy.deepcopy(obj, memo)
+def _copy_list(obj: Iterable, memo: Dict) -> List:
+    # shallow copy in C, then only replace the values that are not immutable leaves.
+    result = list(obj)
+    atomic = _atomic_types
+    for index, item in enumerate(result):
+        if type(item) not in atomic: result[index] = _fast_copy(item, memo)
+
+    return result
+def _copy_tuple(obj: Tuple, memo: Dict) -> Tuple: return tuple(_copy_list(obj, memo))
+def _copy_set(obj: Set, memo: Dict) -> Set: return set(_copy_list(obj, memo))
+def _copy_frozenset(obj: FrozenSet, memo: Dict) -> FrozenSet: return frozenset(_copy_list(obj, memo))
+def _copy_dict(obj: Dict, memo: Dict) -> Dict:
+    result = dict(obj) if type(obj) is dict else dict(dict.items(obj))
+    atomic = _atomic_types
+    for key, value in result.items():
+        if type(value) not in atomic: result[key] = _fast_copy(value, memo)
+
+    return result
+
+def _copy_model(cls: Type, obj, memo: Dict, state: Dict = None):
+    """ Copies a Base*Model the way copy.deepcopy would (cls.__new__, then state, then items) without going through __reduce_ex__. """
+    result = cls.__new__(cls)
+    if state is None: state = getattr(obj, '__dict__', None)
+    if state: result.__dict__.update(_copy_dict(state, memo))
+
+    if isinstance(obj, dict): dict.update(result, _copy_dict(obj, memo))
+    elif isinstance(obj, list): list.extend(result, _copy_list(list.__iter__(obj), memo))
+    else: set.update(result, _copy_list(obj, memo))
+
+    return result
+
+def _HasCustomCopy(cls: Type) -> bool:
+    if getattr(cls, '__deepcopy__', None) is not None: return True
+    if cls.__reduce_ex__ is not object.__reduce_ex__ or cls.__reduce__ is not object.__reduce__: return True
+    if getattr(cls, '__getstate__', None) is not getattr(object, '__getstate__', None): return True
+    if hasattr(cls, '__setstate__'): return True
+
+    for base in cls.__mro__:
+        if set(base.__dict__.get('__slots__', ())).difference(('__dict__', '__weakref__')): return True
+
+    return False
+
+def _ResolveCopier(cls: Type) -> Callable[[Any, Dict], Any]:
+    if cls in _atomic_types or issubclass(cls, Enum):
+        _atomic_types.add(cls)
+        return _copy_atomic
+
+    if cls is list: return _copy_list
+    if cls is dict: return _copy_dict
+    if cls is tuple: return _copy_tuple
+    if cls is set: return _copy_set
+    if cls is frozenset: return _copy_frozenset
+
+    if issubclass(cls, (BaseListModel, BaseDictModel, BaseSetModel)) and not _HasCustomCopy(cls):
+        def copier(obj, memo: Dict): return _copy_model(cls, obj, memo)
+        return copier
+
+    return _copy_deep
+
+
+
+class InternPool(object):
+    """
+        Bounded pool of shared immutable leaves, used by FromJson(..., intern=True / pool).
+
+        Intern walks a decoded json tree (dicts and lists) and returns it with the dict keys interned (sys.intern) and every short string,
+        int and float replaced by the first equal object the pool has seen, so values repeated across documents are stored once.
+        Values are pooled per type, so 1, 1.0 and True stay distinct. Once max_size values are pooled new values are no longer admitted;
+        the pooled ones keep being shared. Enum members need no pooling: Parse already maps values to the member singletons.
+
+        Statistics reports the pooled values, the hits, the interned keys and the bytes saved by the hits (sys.getsizeof of every replaced value);
+        Misc.get_size of the resulting trees measures the actual saving.
+    """
+    __slots__ = ['max_size', 'max_length', '_strings', '_ints', '_floats', '_shapes', '_size', 'hits', 'keys', 'saved']
+    Default: ClassVar['InternPool']
+
+    def __init__(self, max_size: int = 100_000, max_length: int = 64):
+        """
+        :param max_size: maximum number of pooled values and key tuples
+        :param max_length: longest string that is pooled
+        """
+        self.max_size = max_size
+        self.max_length = max_length
+        self.Clear()
+
+    def Clear(self):
+        self._strings: Dict[str, str] = { }
+        self._ints: Dict[int, int] = { }
+        self._floats: Dict[float, float] = { }
+        self._shapes: Dict[Tuple, Tuple] = { }
+        self._size = 0
+        self.hits = 0
+        self.keys = 0
+        self.saved = 0
+
+    @property
+    def Statistics(self) -> Dict[str, int]: return dict(pooled=self._size, hits=self.hits, keys=self.keys, saved_bytes=self.saved)
+    def __len__(self) -> int: return self._size
+    def __repr__(self): return f'<{self.__class__.__name__} {self.Statistics}>'
+
+
+    def Leaf(self, value: Any) -> Any:
+        """ the pooled object equal to value (str, int or float), admitting value if there is room """
+        cls = value.__class__
+        if cls is str:
+            if len(value) > self.max_length: return value
+            pool = self._strings
+        elif cls is int: pool = self._ints
+        elif cls is float: pool = self._floats
+        else: return value
+
+        pooled = pool.get(value)
+        if pooled is None:
+            if self._size < self.max_size:
+                pool[value] = value
+                self._size += 1
+            return value
+
+        if pooled is not value:
+            self.hits += 1
+            self.saved += sys.getsizeof(value)
+        return pooled
+
+    def Intern(self, value: Any) -> Any:
+        """ value (a decoded json tree) with its keys interned and its leaves pooled. Lists are updated in place, dicts are rebuilt. """
+        cls = value.__class__
+        if cls is dict: return self._Dict(value)
+        if cls is list:
+            value[:] = self._Values(value)
+            return value
+        return self.Leaf(value)
+
+    def _Dict(self, d: Dict) -> Dict:
+        # dicts decoded from similar documents have the same keys: the interned keys are pooled per key tuple, so each dict costs one lookup.
+        keys = tuple(d)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            shape = tuple(sys.intern(key) if key.__class__ is str else key for key in keys)
+            if self._size < self.max_size:
+                self._shapes[shape] = shape
+                self._size += 1
+
+        # the decoders already share the keys within a document, so the saving of interning them (across documents) is not counted in saved.
+        self.keys += sum(map(is_not, keys, shape))
+        return dict(zip(shape, self._Values(d.values())))
+
+    def _Values(self, values: Iterable[Any]) -> List[Any]:
+        """ Leaf / Intern of every value, inlined: this loop is the cost of interning. """
+        strings, ints, floats, max_length, getsizeof = self._strings, self._ints, self._floats, self.max_length, sys.getsizeof
+        result = []
+        append = result.append
+        hits = saved = 0
+        for value in values:
+            cls = value.__class__
+            if cls is str:
+                if len(value) > max_length:
+                    append(value)
+                    continue
+                pool = strings
+            elif cls is int: pool = ints
+            elif cls is float: pool = floats
+            elif cls is dict:
+                append(self._Dict(value))
+                continue
+            elif cls is list:
+                value[:] = self._Values(value)
+                append(value)
+                continue
+            else:
+                append(value)
+                continue
+
+            pooled = pool.get(value)
+            if pooled is None:
+                if self._size < self.max_size:
+                    pool[value] = value
+                    self._size += 1
+                append(value)
+            else:
+                if pooled is not value:
+                    hits += 1
+                    saved += getsizeof(value)
+                append(pooled)
+
+        self.hits += hits
+        self.saved += saved
+        return result
+
+InternPool.Default = InternPool()
+
+
+
 class BaseObjectModel(object):
-    def Clone(self):
-        return _copy.deepcopy(self)
+    __slots__ = ()  # keeps slotted subclasses (BaseSchemaModel) free of a __dict__; dict / list / set models still have one.
+    def Clone(self, *, copy_on_write: bool = False):
+        """
+        :param copy_on_write:
+            False: returns a deep copy (see FastCopy).
+
+            True: returns a snapshot that shares its nested values with this model. A nested value is copied into the snapshot
+            the first time it is read through the snapshot (nested Base*Model values become snapshots themselves),
+            so the snapshot can be freely mutated and untouched subtrees cost no memory.
+            Replacing or removing values of this model does not affect the snapshot; nested values must not be mutated in place
+            while the snapshot is in use. Only dict and list models support it; other models return a deep copy.
+        """
+        if copy_on_write and isinstance(self, (BaseDictModel, BaseListModel)): return _CopyOnWrite.Create(self)
+
+        return FastCopy(self)
 
     @property
     def __class_name__(self) -> str:
@@ -85,44 +598,111 @@ class BaseObjectModel(object):
 
     def ToString(self) -> str:
         return f'<{self.__class_name__} Object() {self.ToJsonString()}>'
-    def ToJsonString(self, indent: int = 4) -> str:
-        return _dumps(self, indent=indent, default=self._serialize)
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str:
+        """
+        :param indent: indentation of the document. None produces a compact document.
+        :param backend: name or instance of the json backend to use instead of the process wide default. See JsonBackends.
+        """
+        return JsonBackends.Get(backend).dumps(self, indent=indent, default=self._serialize)
+
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]:
+        """
+            Lazily encodes the model with the stdlib encoder. Joining the chunks produces the same document as ToJsonString(backend='stdlib').
+
+        :param indent: same as ToJsonString
+        :return: iterator of encoded str chunks
+        """
+        return JSONEncoder(indent=indent, default=self._serialize).iterencode(self)
+    def ToJsonStream(self, fp: Union[IO, PathLike], indent: int = 4, *, buffer_size: int = 65536) -> int:
+        """
+            Writes the model to fp without building the whole document in memory.
+            The chunks are batched into writes of roughly buffer_size characters.
+
+        :param fp: a text or binary file object, or a path (str, FilePath, FileIO) to open for writing.
+        :param indent: same as ToJsonString
+        :param buffer_size: number of characters to collect before each write.
+        :return: number of characters written
+        """
+        if isinstance(fp, (str, PathLike)):
+            with open(fp, 'w') as f:
+                return self.ToJsonStream(f, indent, buffer_size=buffer_size)
+
+        write = fp.write
+        if isinstance(fp, (io.RawIOBase, io.BufferedIOBase)):
+            def write(chunk: str): return fp.write(chunk.encode())
+
+        total = 0
+        pending: List[str] = []
+        size = 0
+        for chunk in self.IterJsonChunks(indent):
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= buffer_size:
+                write(''.join(pending))
+                total += size
+                pending.clear()
+                size = 0
+
+        if pending:
+            write(''.join(pending))
+            total += size
+
+        return total
 
     def __str__(self):
         return self.ToJsonString()
 
 
-    @staticmethod
-    def _ToDict(o: Dict) -> Dict[_KT, Union[_VT, Dict, str]]:
-        d = { }
-        for key, value in o.items():
-            if isinstance(value, Enum):
-                d[key] = value.value
+    # binary encoding (see BinaryFormat); imported lazily because BinaryFormat depends on this module.
 
-            elif isinstance(value, BaseListModel):
-                d[key] = value
+    def ToBytes(self) -> bytes:
+        """
+            Encodes the model as one BinaryFormat frame. Unlike ToJsonString every value keeps its type (Enums, datetimes, nested models, ...).
+            Frames can be concatenated into a file or pipe and read back with FromBytesStream.
+        """
+        from .BinaryFormat import BinaryFormat
+        return BinaryFormat.Dumps(self)
 
-            elif isinstance(value, BaseSetModel):
-                d[key] = value.ToList()
+    @classmethod
+    def FromBytes(cls, data: Union[bytes, bytearray, memoryview]):
+        """ Decodes a frame produced by ToBytes. Raises BinaryFormatError for invalid data and TypeError if it does not hold an instance of cls. """
+        from .BinaryFormat import BinaryFormat
+        result = BinaryFormat.Loads(data)
+        if not isinstance(result, cls): throw(result, cls)
+        return result
 
-            elif isinstance(value, BaseDictModel):
-                d[key] = value.ToDict()
+    @classmethod
+    def FromBytesStream(cls, fp: Union[IO[bytes], PathLike]) -> Iterator:
+        """ Yields the instances of cls stored as consecutive ToBytes frames in fp (a binary file object or a path), one frame at a time. """
+        from .BinaryFormat import BinaryFormat
+        for result in BinaryFormat.Iter(fp):
+            if not isinstance(result, cls): throw(result, cls)
+            yield result
 
-            elif hasattr(value, 'ToList') and callable(value.ToList):
-                d[key] = value.ToList()
 
-            elif hasattr(value, 'ToTuple') and callable(value.ToTuple):
-                d[key] = value.ToTuple()
+    # json patch (see JsonPatch); imported lazily for the same reason.
 
-            elif hasattr(value, 'ToDict') and callable(value.ToDict):
-                d[key] = value.ToDict()
+    def Diff(self, other: Any) -> List[Dict[str, Any]]:
+        """
+            The RFC 6902 operations that turn this model into other, e.g. a snapshot taken with Clone(copy_on_write=True) into the current model.
+            Subtrees shared by both (the same objects) are skipped. Serialize the result with JsonPatch.ToJsonString.
+        """
+        from .JsonPatch import JsonPatch
+        return JsonPatch.Diff(self, other)
 
-            elif hasattr(value, 'ToString') and callable(value.ToString):
-                d[key] = value.ToString()
+    def ApplyPatch(self, patch: Union[str, bytes, Iterable[Dict[str, Any]]], *, backend: Union[str, JsonBackend] = None):
+        """ Applies an RFC 6902 patch (a list of operations or its json) to this model in place. Raises JsonPatchError if an operation fails. """
+        from .JsonPatch import JsonPatch
+        result = JsonPatch.Apply(self, patch, backend=backend)
+        if result is not self: raise JsonPatchError(f'{self.__class__.__name__} can not be replaced by a value of type {typeof(result)} in place')
+        return self
 
-            else:
-                d[key] = value
-        return d
+
+    @staticmethod
+    def _ToDict(o: Dict) -> Dict[_KT, Union[_VT, Dict, str]]:
+        cache = JsonSerializers._dict_converters
+        resolve = JsonSerializers.DictConverter
+        return { key: (cache.get(type(value)) or resolve(type(value)))(value) for key, value in o.items() }
 
 
     def Filter(self, func: callable):
@@ -150,39 +730,59 @@ class BaseObjectModel(object):
         raise NotImplementedError()
 
     @classmethod
-    def FromJson(cls, string: Union[str, bytes, bytearray], **kwargs):
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, **kwargs):
         raise NotImplementedError()
 
-
-
     @staticmethod
-    def _serialize(obj):
-        if isinstance(obj, Enum): return obj.value
+    def _loads(string: Union[str, bytes, bytearray], backend: Union[str, JsonBackend, None], intern: Union[bool, InternPool], kwargs: Dict[str, Any]) -> Any:
+        """ backend.loads, then InternPool.Intern when intern is True (InternPool.Default) or an InternPool """
+        result = JsonBackends.Get(backend).loads(string, **kwargs)
+        if intern is False or intern is None: return result
+        return (InternPool.Default if intern is True else intern).Intern(result)
 
-        if isinstance(obj, time): return obj.isoformat()
-
-        if isinstance(obj, datetime): return obj.isoformat()
+    @classmethod
+    def FromJsonMany(cls, payloads: Iterable[Union[str, bytes, bytearray]], *, workers: Optional[int] = None, chunk_size: int = 1000,
+                     pool: ProcessPoolExecutor = None, backend: Union[str, JsonBackend] = None, **kwargs) -> List:
+        """
+            Decodes independent json documents with cls.FromJson, in order, across a process pool.
 
-        if isinstance(obj, timedelta): return obj.total_seconds()
+            Payloads are sent to the workers in chunks of up to chunk_size, so pickling the payloads and the decoded models is paid per chunk,
+            not per message. Batches that fit in one chunk, workers=1, single cpu machines and classes that can not be pickled (defined in a function)
+            are decoded in this process. Results come back pickled, so the pool only pays off when FromJson (Parse) costs more than unpickling its result.
 
-        if isinstance(obj, BaseSetModel): return obj.ToList()
+        :param workers: number of worker processes (with pool: the number of its workers, used to split the batch); None uses Constants.CPU_COUNT.
+        :param chunk_size: maximum number of payloads per task. Smaller batches are split evenly over the workers.
+        :param pool: an existing ProcessPoolExecutor to use instead of starting one per call, for repeated batches.
+        :param backend: json backend (name or instance) used by the workers.
+        :param kwargs: passed to FromJson
+        """
+        if not isinstance(payloads, list): payloads = list(payloads)
+        backend = JsonBackends.Get(backend)
+        workers = workers or CPU_COUNT or 1
 
-        if isinstance(obj, BaseListModel): return obj
+        if workers <= 1 or len(payloads) <= chunk_size or not _Picklable(cls):
+            return [cls.FromJson(payload, backend=backend, **kwargs) for payload in payloads]
 
-        if isinstance(obj, BaseDictModel): return obj.ToDict()
+        size = min(chunk_size, -(-len(payloads) // workers))
+        chunks = [payloads[i:i + size] for i in range(0, len(payloads), size)]
+        task = partial(_FromJsonChunk, cls, backend.Name, kwargs)
+        if pool is not None: return list(chain.from_iterable(pool.map(task, chunks)))
 
-        if hasattr(obj, 'ToList') and callable(obj.ToList): return obj.ToList()
+        with ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+            return list(chain.from_iterable(pool.map(task, chunks)))
 
-        if hasattr(obj, 'ToTuple') and callable(obj.ToTuple): return obj.ToTuple()
 
-        if hasattr(obj, 'ToDict') and callable(obj.ToDict): return obj.ToDict()
 
-        return obj
+    @staticmethod
+    def _serialize(obj):
+        converter = JsonSerializers._serializers.get(type(obj))
+        if converter is None: converter = JsonSerializers.Serializer(type(obj))
+        return converter(obj)
 
 
     @staticmethod
-    def convert_time(value: Union[int, float, timedelta, str], default: Union[time, Type[Exception]] = None) -> Optional[time]:
-        if isinstance(value, str): return BaseObjectModel.parse_time(value)
+    def convert_time(value: Union[int, float, timedelta, str], default: Union[time, Type[Exception]] = None, *, parser: DateTimeParser = None) -> Optional[time]:
+        if isinstance(value, str): return BaseObjectModel.parse_time(value, parser)
 
         if isinstance(value, time): return value
 
@@ -201,8 +801,8 @@ class BaseObjectModel(object):
         return default
 
     @staticmethod
-    def convert_date_time(value: Union[datetime, str], default: Union[datetime, Type[Exception]] = None) -> Optional[datetime]:
-        if isinstance(value, str): return BaseObjectModel.parse_date_time(value)
+    def convert_date_time(value: Union[datetime, str], default: Union[datetime, Type[Exception]] = None, *, parser: DateTimeParser = None) -> Optional[datetime]:
+        if isinstance(value, str): return BaseObjectModel.parse_date_time(value, parser)
 
         if isinstance(value, datetime): return value
 
@@ -216,16 +816,14 @@ class BaseObjectModel(object):
 
 
     @staticmethod
-    def convert_time_delta(value: Union[int, float, timedelta, str], default: Union[timedelta, Type[Exception]] = None) -> Optional[timedelta]:
-        if isinstance(value, str): return BaseObjectModel.parse_time_delta(value)
+    def convert_time_delta(value: Union[int, float, timedelta, str], default: Union[timedelta, Type[Exception]] = None, *, parser: DateTimeParser = None) -> Optional[timedelta]:
+        if isinstance(value, str): return BaseObjectModel.parse_time_delta(value, parser)
 
         if isinstance(value, timedelta): return value
 
         if isinstance(value, int): return timedelta(seconds=value)
 
-        if isinstance(value, float):
-            seconds = int(value)
-            return timedelta(seconds=seconds, microseconds=value - seconds)
+        if isinstance(value, float): return timedelta(seconds=value)
 
         if issubclass(default, TypeError):
             raise default(typeof(value), (int, float, timedelta, str))
@@ -236,45 +834,44 @@ class BaseObjectModel(object):
         return default
 
 
+    # the parser argument selects the cache / learned formats to use (one per call site); defaults to DateTimeParser.Default
+
     @staticmethod
-    def parse_time_delta(value: str) -> Optional[timedelta]:
-        if value == str(None):
-            return None
+    def parse_time_delta(value: str, parser: DateTimeParser = None) -> Optional[timedelta]: return (parser or DateTimeParser.Default).ParseTimeDelta(value)
 
-        try:
-            seconds = int(value)
-            return timedelta(seconds=seconds)
-        except ValueError:
-            parts = _regex.match(value)
-            if not parts:
-                return None
-
-            parts = parts.groupdict()
-            time_params = { }
-            for name, param in parts.items():
-                if param:
-                    time_params[name] = int(param)
-            return timedelta(**time_params)
+    @staticmethod
+    def parse_time(value: str, parser: DateTimeParser = None) -> Optional[time]: return (parser or DateTimeParser.Default).ParseTime(value)
 
     @staticmethod
-    def parse_time(value: str) -> Optional[time]:
-        if value == str(None):
-            return None
+    def parse_date_time(value: str, parser: DateTimeParser = None) -> Optional[datetime]: return (parser or DateTimeParser.Default).ParseDateTime(value)
 
-        try:
-            return time.fromisoformat(value)
-        except ValueError:
-            return parser.parse(value).time()
+
+    # column versions of the convert_* helpers: strings are parsed in bulk by DateTimeParser.ParseDateTimes / ParseTimes / ParseTimeDeltas
+    # (one inferred format per column, optionally in a process pool); any other value goes through the scalar helper.
 
     @staticmethod
-    def parse_date_time(value: str) -> Optional[datetime]:
-        if value == str(None):
-            return None
+    def convert_times(values: Iterable[Union[int, float, time, str]], default: Union[time, Type[Exception]] = None, *, parser: DateTimeParser = None, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[time]]:
+        return BaseObjectModel._convert_many(values, BaseObjectModel.convert_time, (parser or DateTimeParser.Default).ParseTimes, default, parser, processes, chunk_size)
 
-        try:
-            return datetime.fromisoformat(value)
-        except ValueError:
-            return parser.parse(value)
+    @staticmethod
+    def convert_date_times(values: Iterable[Union[datetime, str]], default: Union[datetime, Type[Exception]] = None, *, parser: DateTimeParser = None, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[datetime]]:
+        return BaseObjectModel._convert_many(values, BaseObjectModel.convert_date_time, (parser or DateTimeParser.Default).ParseDateTimes, default, parser, processes, chunk_size)
+
+    @staticmethod
+    def convert_time_deltas(values: Iterable[Union[int, float, timedelta, str]], default: Union[timedelta, Type[Exception]] = None, *, parser: DateTimeParser = None, processes: Optional[int] = 1, chunk_size: int = 100_000) -> List[Optional[timedelta]]:
+        return BaseObjectModel._convert_many(values, BaseObjectModel.convert_time_delta, (parser or DateTimeParser.Default).ParseTimeDeltas, default, parser, processes, chunk_size)
+
+    @staticmethod
+    def _convert_many(values: Iterable, convert: Callable, bulk: Callable[..., list], default, parser: Optional[DateTimeParser], processes: Optional[int], chunk_size: int) -> list:
+        if not isinstance(values, list): values = list(values)
+
+        strings = [i for i, value in enumerate(values) if isinstance(value, str)]
+        if len(strings) == len(values): return bulk(values, processes=processes, chunk_size=chunk_size)
+
+        results = [value if isinstance(value, str) else convert(value, default, parser=parser) for value in values]
+        for i, result in zip(strings, bulk([values[i] for i in strings], processes=processes, chunk_size=chunk_size)): results[i] = result
+
+        return results
 
 
 
@@ -303,6 +900,39 @@ class BaseListModel(list, BaseObjectModel, List[_T]):
         return dict(self.enumerate())
 
 
+    def CreateIndex(self, key: Union[str, Callable[[_T], Hashable]], *, unique: bool = False, name: str = None) -> 'ListIndex[_T]':
+        """
+            Creates (or replaces) a hash index of the items, maintained by append / extend / insert / remove / pop / clear / item assignment and deletion.
+
+        :param key: function returning the key of an item, or the name of the key to read from dict items.
+        :param unique: if True, an item per key; adding a duplicate key raises ValueError and leaves the list unchanged.
+        :param name: name of the index, used by Find / FindAll / DropIndex. Defaults to key (str) or key.__name__.
+        """
+        return _IndexedList.Create(self, key, unique, name)
+    def DropIndex(self, name: str):
+        self._Index(name)
+        self._Drop(name)
+    def Reindex(self):
+        """ Rebuilds every index; needed after items were mutated in place. """
+        for index in self.Indexes.values(): index._Rebuild(list.__getitem__(self, slice(None)))
+    @property
+    def Indexes(self) -> Dict[str, 'ListIndex[_T]']: return dict(self.__dict__.get('_indexes', { }))
+
+    def _Index(self, name: Optional[str]) -> 'ListIndex[_T]':
+        indexes = self.__dict__.get('_indexes')
+        if not indexes: raise KeyError(f'{self.__class__.__name__} has no index; see {self.CreateIndex.__name__}')
+        if name is not None: return indexes[name]
+        if len(indexes) != 1: raise KeyError(f'{self.__class__.__name__} has {len(indexes)} indexes; pass the name of the one to use')
+        return next(iter(indexes.values()))
+
+    def Find(self, key: Hashable, *, index: str = None, default: Any = None) -> Optional[_T]:
+        """ The item with key in the index (the only one if it is omitted), or default. O(1), unlike Filter. """
+        return self._Index(index).Find(key, default)
+    def FindAll(self, key: Hashable, *, index: str = None) -> List[_T]:
+        """ The items with key in the index (the only one if it is omitted), in the order they were indexed. """
+        return self._Index(index).FindAll(key)
+
+
     @classmethod
     def Parse(cls, d):
         if isinstance(d, list):
@@ -315,8 +945,60 @@ class BaseListModel(list, BaseObjectModel, List[_T]):
         return cls(args)
 
     @classmethod
-    def FromJson(cls, string: Union[str, bytes, bytearray], **kwargs):
-        return cls.Parse(_loads(string, **kwargs))
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, intern: Union[bool, InternPool] = False, **kwargs):
+        """
+        :param intern: True (InternPool.Default) or an InternPool: share the keys and repeated short values of the decoded tree. See InternPool.
+        """
+        return cls.Parse(cls._loads(string, backend, intern, kwargs))
+
+    @classmethod
+    def FromJsonStream(cls, fp: Union[IO, PathLike], *, batch_size: int = None, chunk_size: int = 65536, **kwargs) -> Iterator[Union[_T, 'BaseListModel[_T]']]:
+        """
+            Incrementally decodes a top-level json array from fp. See IterJsonArray.
+
+        :param fp: a text or binary (utf-8) file object, or a path (str, FilePath, FileIO) to open for reading.
+        :param batch_size: if given, yields instances of cls holding up to batch_size items instead of the individual items.
+        :param chunk_size: number of characters / bytes read at a time.
+        :param kwargs: passed to json.JSONDecoder
+        """
+        return cls._Batches(IterJsonArray(fp, chunk_size=chunk_size, **kwargs), batch_size)
+
+    @classmethod
+    def _Batches(cls, items: Iterator[_T], batch_size: Optional[int]) -> Iterator[Union[_T, 'BaseListModel[_T]']]:
+        if not batch_size:
+            yield from items
+            return
+
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield cls.Parse(batch)
+                batch = []
+
+        if batch: yield cls.Parse(batch)
+
+
+    def ToJsonLines(self, *, backend: Union[str, JsonBackend] = None) -> str:
+        """ The items as json lines: one compact json document per item, each followed by a newline. See FileIO.AppendJsonLine to append to a file. """
+        if not self: return ''
+        dumps = partial(JsonBackends.Get(backend).dumps, default=self._serialize)
+        return '\n'.join(map(dumps, self)) + '\n'
+
+    @classmethod
+    def FromJsonLines(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None):
+        """ Decodes json lines (one json document per line, blank lines are skipped) into an instance of cls. See FromJsonLinesStream for files. """
+        return cls.Parse(_LoadLines(backend, string.split('\n' if isinstance(string, str) else b'\n')))
+
+    @classmethod
+    def FromJsonLinesStream(cls, fp: Union[IO, PathLike], *, batch_size: int = None, chunk_size: int = 1 << 20, workers: int = 1, pool: ProcessPoolExecutor = None,
+                            backend: Union[str, JsonBackend] = None) -> Iterator[Union[_T, 'BaseListModel[_T]']]:
+        """
+            Incrementally decodes a json lines file. See IterJsonLines.
+
+        :param batch_size: if given, yields instances of cls holding up to batch_size items instead of the individual items.
+        """
+        return cls._Batches(IterJsonLines(fp, chunk_size=chunk_size, workers=workers, pool=pool, backend=backend), batch_size)
 
 
 
@@ -351,7 +1033,9 @@ class BaseSetModel(set, BaseObjectModel, Set[_T]):
     def Create(cls, *args: _T): return cls(args)
 
     @classmethod
-    def FromJson(cls, string: Union[str, bytes, bytearray], **kwargs): return cls.Parse(_loads(string, **kwargs))
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, intern: Union[bool, InternPool] = False, **kwargs):
+        """ See BaseDictModel.FromJson """
+        return cls.Parse(cls._loads(string, backend, intern, kwargs))
 
 
 
@@ -398,5 +1082,312 @@ class BaseDictModel(dict, BaseObjectModel, Dict[_KT, _VT]):
         return cls(kwargs)
 
     @classmethod
-    def FromJson(cls, string: Union[str, bytes, bytearray], **kwargs):
-        return cls.Parse(_loads(string, **kwargs))
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, intern: Union[bool, InternPool] = False, **kwargs):
+        """
+        :param intern: True (InternPool.Default) or an InternPool: share the keys and repeated short values of the decoded tree. See InternPool.
+        """
+        return cls.Parse(cls._loads(string, backend, intern, kwargs))
+
+
+
+class _CopyOnWrite(object):
+    """ Shared logic of the snapshots returned by BaseObjectModel.Clone(copy_on_write=True) """
+    _base: Type[BaseObjectModel]
+    _shared: Dict[int, Any]
+    _types: Dict[Type, Type] = { }
+
+    @classmethod
+    def Create(cls, source: Union[BaseDictModel, BaseListModel]):
+        base = source._base if isinstance(source, _CopyOnWrite) else type(source)
+        snapshot_type = cls._types.get(base)
+        if snapshot_type is None:
+            mixin = _CopyOnWriteDict if isinstance(source, dict) else _CopyOnWriteList
+            snapshot_type = cls._types[base] = type(base.__name__, (mixin, base), dict(__module__=base.__module__, __qualname__=base.__qualname__, _base=base))
+
+        snapshot = snapshot_type.__new__(snapshot_type)
+        state = source._State() if isinstance(source, _CopyOnWrite) else source.__dict__
+        if state: snapshot.__dict__.update(FastCopy(state))
+
+        if isinstance(source, dict):
+            dict.update(snapshot, source)
+            values = dict.values(snapshot)
+        else:
+            list.extend(snapshot, list.__iter__(source))
+            values = list.__iter__(snapshot)
+
+        snapshot._shared = { id(value): value for value in values if type(value) not in _atomic_types }
+        return snapshot
+
+
+    def _Unshare(self, value):
+        """ returns a private copy of value if it is still shared with the source, otherwise value itself. """
+        if id(value) not in self._shared: return value
+        if isinstance(value, (BaseDictModel, BaseListModel)): return _CopyOnWrite.Create(value)
+        return FastCopy(value)
+
+    def _View(self): raise NotImplementedError()
+
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str:
+        return JsonBackends.Get(backend).dumps(self._View(), indent=indent, default=self._serialize)
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]:
+        return JSONEncoder(indent=indent, default=self._serialize).iterencode(self._View())
+
+
+    def _State(self) -> Dict: return { key: value for key, value in self.__dict__.items() if key != '_shared' }
+
+    def __deepcopy__(self, memo: Dict): return _copy_model(self._base, self, memo, self._State())
+    def __copy__(self): return _copy.deepcopy(self)
+    def __reduce_ex__(self, protocol: int): return _identity, (_copy.deepcopy(self),)  # pickled as a plain instance of the base model
+
+
+
+class _CopyOnWriteDict(_CopyOnWrite):
+    def _View(self) -> Dict: return dict(self)
+    def _UnshareAll(self):
+        for key in dict.keys(self): self[key]
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if id(value) in self._shared:
+            value = self._Unshare(value)
+            dict.__setitem__(self, key, value)
+
+        return value
+
+    def get(self, key, default=None): return self[key] if key in self else default
+    def setdefault(self, key, default=None):
+        if key in self: return self[key]
+        return super().setdefault(key, default)
+    def pop(self, key, *default): return self._Unshare(super().pop(key, *default))
+    def popitem(self):
+        key, value = super().popitem()
+        return key, self._Unshare(value)
+
+    def values(self):
+        self._UnshareAll()
+        return super().values()
+    def items(self):
+        self._UnshareAll()
+        return super().items()
+    def copy(self):
+        self._UnshareAll()
+        return super().copy()
+
+
+
+class _CopyOnWriteList(_CopyOnWrite):
+    def _View(self) -> List: return list.__getitem__(self, slice(None))
+    def _UnshareAll(self):
+        for index in range(len(self)): self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            for i in range(*index.indices(len(self))): self[i]
+            return super().__getitem__(index)
+
+        value = super().__getitem__(index)
+        if id(value) in self._shared:
+            value = self._Unshare(value)
+            list.__setitem__(self, index, value)
+
+        return value
+
+    def __iter__(self):
+        for index in range(len(self)): yield self[index]
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1): yield self[index]
+    def pop(self, index: int = -1): return self._Unshare(super().pop(index))
+    def copy(self):
+        self._UnshareAll()
+        return super().copy()
+
+
+
+_missing = object()
+
+class ListIndex(Generic[_T]):
+    """
+        Hash index of the items of a BaseListModel, created by BaseListModel.CreateIndex and kept up to date by the list's mutating methods.
+
+        unique indexes map a key to a single item and reject duplicates with ValueError; other indexes map a key to the items that have it,
+        in the order they were added to the index. Items mutated in place are not tracked; call BaseListModel.Reindex afterwards.
+    """
+    __slots__ = ['name', 'key', 'unique', '_map']
+    def __init__(self, name: str, key: Callable[[_T], Hashable], unique: bool):
+        self.name: Final[str] = name
+        self.key: Final[Callable[[_T], Hashable]] = key
+        self.unique: Final[bool] = unique
+        self._map: Dict[Hashable, Union[_T, List[_T]]] = { }
+
+    def _Keys(self, items: Sequence[_T], replaced: Sequence[_T] = ()) -> List[Hashable]:
+        """ keys of items. Raises ValueError, before anything is changed, if a unique index would hold a key twice; items in replaced are about to be removed. """
+        keys = list(map(self.key, items))
+        if not self.unique: return keys
+
+        if len(set(keys)) != len(keys): raise ValueError(f'duplicate key in unique index {self.name!r}')
+
+        replaced = set(map(id, replaced))
+        for key in keys:
+            item = self._map.get(key, _missing)
+            if item is not _missing and id(item) not in replaced: raise ValueError(f'duplicate key {key!r} in unique index {self.name!r}')
+
+        return keys
+    def _Key(self, item: _T, replaced: Any = _missing) -> Hashable:
+        """ _Keys for a single item """
+        key = self.key(item)
+        if self.unique:
+            value = self._map.get(key, _missing)
+            if value is not _missing and value is not replaced: raise ValueError(f'duplicate key {key!r} in unique index {self.name!r}')
+
+        return key
+    def _AddOne(self, item: _T, key: Hashable):
+        if self.unique: self._map[key] = item
+        else:
+            bucket = self._map.get(key)
+            if bucket is None: self._map[key] = [item]
+            else: bucket.append(item)
+    def _Add(self, items: Sequence[_T], keys: List[Hashable]):
+        if self.unique:
+            self._map.update(zip(keys, items))
+            return
+
+        _map = self._map
+        for key, item in zip(keys, items):
+            bucket = _map.get(key)
+            if bucket is None: _map[key] = [item]
+            else: bucket.append(item)
+    def _Remove(self, items: Iterable[_T]):
+        _map = self._map
+        for item in items:
+            key = self.key(item)
+            if self.unique:
+                if _map.get(key, _missing) is item: del _map[key]
+                continue
+
+            bucket = _map.get(key, ())
+            for i, value in enumerate(bucket):
+                if value is item:
+                    del bucket[i]
+                    if not bucket: del _map[key]
+                    break
+    def _Rebuild(self, items: Sequence[_T]):
+        self._map.clear()
+        self._Add(items, self._Keys(items))
+
+
+    def Find(self, key: Hashable, default: Any = None) -> Optional[_T]:
+        """ the item with key (the first one added, for non unique indexes), or default """
+        value = self._map.get(key, _missing)
+        if value is _missing: return default
+        return value if self.unique else value[0]
+    def FindAll(self, key: Hashable) -> List[_T]:
+        value = self._map.get(key, _missing)
+        if value is _missing: return []
+        return [value] if self.unique else list(value)
+
+    def Keys(self) -> KeysView[Hashable]: return self._map.keys()
+    def __contains__(self, key: Hashable) -> bool: return key in self._map
+    def __len__(self) -> int: return len(self._map)
+    def __repr__(self): return f'<{self.__class__.__name__} {self.name!r} unique={self.unique} keys={len(self._map)}>'
+
+
+
+class _IndexedList(object):
+    """
+        Mixin of the BaseListModel subclasses used once CreateIndex is called: the mutating list methods update the indexes.
+        Lists without indexes keep the plain (C) list methods.
+    """
+    _base: Type[BaseListModel]
+    _indexes: Dict[str, ListIndex]
+    _types: Dict[Type, Type] = { }
+
+    @classmethod
+    def Create(cls, source: BaseListModel, key: Union[str, Callable[[Any], Hashable]], unique: bool, name: Optional[str]) -> ListIndex:
+        if isinstance(key, str): key, name = itemgetter(key), name or key
+        elif not callable(key): throw(key, str, Callable)
+
+        index = ListIndex(name or getattr(key, '__name__', repr(key)), key, unique)
+        index._Rebuild(list.__getitem__(source, slice(None)))
+
+        if not isinstance(source, _IndexedList):
+            base = type(source)
+            indexed_type = cls._types.get(base)
+            if indexed_type is None: indexed_type = cls._types[base] = type(base.__name__, (cls, base), dict(__module__=base.__module__, __qualname__=base.__qualname__, _base=base))
+
+            source.__class__ = indexed_type
+            source._indexes = { }
+
+        source._indexes[index.name] = index
+        return index
+
+    def _Drop(self, name: str):
+        del self._indexes[name]
+        if self._indexes: return
+
+        del self.__dict__['_indexes']
+        self.__class__ = self._base
+
+
+    def _Keys(self, items: Sequence, replaced: Sequence = ()) -> List[Tuple[ListIndex, List[Hashable]]]: return [(index, index._Keys(items, replaced)) for index in self._indexes.values()]
+    @staticmethod
+    def _Add(items: Sequence, keys: List[Tuple[ListIndex, List[Hashable]]]):
+        for index, values in keys: index._Add(items, values)
+    def _Remove(self, items: Sequence):
+        for index in self._indexes.values(): index._Remove(items)
+
+
+    def append(self, item):
+        indexes = self._indexes.values()
+        keys = [index._Key(item) for index in indexes]
+        super().append(item)
+        for index, key in zip(indexes, keys): index._AddOne(item, key)
+    def extend(self, items: Iterable):
+        items = list(items)
+        keys = self._Keys(items)
+        super().extend(items)
+        self._Add(items, keys)
+    def __iadd__(self, items: Iterable):
+        self.extend(items)
+        return self
+    def __imul__(self, count: int):
+        if count <= 0: self.clear()
+        else: self.extend(list.__getitem__(self, slice(None)) * (count - 1))
+        return self
+    def insert(self, position: int, item):
+        indexes = self._indexes.values()
+        keys = [index._Key(item) for index in indexes]
+        super().insert(position, item)
+        for index, key in zip(indexes, keys): index._AddOne(item, key)
+    def remove(self, item):
+        position = self.index(item)
+        self.__delitem__(position)
+    def pop(self, position: int = -1):
+        item = super().pop(position)
+        self._Remove((item,))
+        return item
+    def clear(self):
+        super().clear()
+        for index in self._indexes.values(): index._map.clear()
+    def __setitem__(self, position: Union[int, slice], value):
+        old = list.__getitem__(self, position)
+        if isinstance(position, slice): old, new = old, list(value)
+        else: old, new = (old,), (value,)
+
+        keys = self._Keys(new, old)
+        super().__setitem__(position, new if isinstance(position, slice) else value)
+        self._Remove(old)
+        self._Add(new, keys)
+    def __delitem__(self, position: Union[int, slice]):
+        old = list.__getitem__(self, position)
+        super().__delitem__(position)
+        self._Remove(old if isinstance(position, slice) else (old,))
+
+
+    def _State(self) -> Dict: return { key: value for key, value in self.__dict__.items() if key != '_indexes' }
+
+    def __deepcopy__(self, memo: Dict):
+        result = _copy_model(self._base, self, memo, self._State())
+        for index in self._indexes.values(): _IndexedList.Create(result, index.key, index.unique, index.name)
+        return result
+    def __copy__(self): return _copy.deepcopy(self)
+    def __reduce_ex__(self, protocol: int): return _identity, (_copy_model(self._base, self, { }, self._State()),)  # pickled as a plain instance of the base model, without its indexes
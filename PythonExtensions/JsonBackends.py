@@ -0,0 +1,195 @@
+import json
+from typing import *
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+
+
+__all__ = [
+    'JsonBackend',
+    'StdLibJsonBackend',
+    'OrJsonBackend',
+    'JsonBackends',
+    ]
+
+class JsonBackend(object):
+    """
+        Encoder / decoder used by the models, FileIO and Encryptor.
+
+        Every backend must round trip its own output: loads(dumps(obj)) == obj, and dumps(loads(s)) == s for any s produced by dumps.
+        Backends may differ in insignificant whitespace and escaping, never in the decoded values.
+    """
+    __slots__ = []
+    Name: str = ''
+
+    @property
+    def Available(self) -> bool: return True
+
+    def dumps(self, obj: Any, *, indent: Optional[int] = None, default: Callable[[Any], Any] = None, sort_keys: bool = False, **kwargs) -> str: raise NotImplementedError()
+    def loads(self, s: Union[str, bytes, bytearray], **kwargs) -> Any: raise NotImplementedError()
+
+    def dump(self, obj: Any, fp: IO[str], **kwargs) -> int: return fp.write(self.dumps(obj, **kwargs))
+    def load(self, fp: IO, **kwargs) -> Any: return self.loads(fp.read(), **kwargs)
+
+    def __repr__(self): return f'<{self.__class__.__name__} "{self.Name}">'
+
+
+
+class StdLibJsonBackend(JsonBackend):
+    __slots__ = []
+    Name = 'stdlib'
+
+    def dumps(self, obj: Any, *, indent: Optional[int] = None, default: Callable[[Any], Any] = None, sort_keys: bool = False, **kwargs) -> str:
+        return json.dumps(obj, indent=indent, default=default, sort_keys=sort_keys, **kwargs)
+    def loads(self, s: Union[str, bytes, bytearray], **kwargs) -> Any: return json.loads(s, **kwargs)
+
+    def dump(self, obj: Any, fp: IO[str], *, indent: Optional[int] = None, default: Callable[[Any], Any] = None, sort_keys: bool = False, **kwargs) -> None:
+        return json.dump(obj, fp, indent=indent, default=default, sort_keys=sort_keys, **kwargs)
+    def load(self, fp: IO, **kwargs) -> Any: return json.load(fp, **kwargs)
+
+
+
+class OrJsonBackend(JsonBackend):
+    """
+        orjson based backend, the default when orjson is importable. Produces utf-8 output without ascii escaping.
+        Indents other than 2 (the only one orjson writes) are made from its 2 space output with a few replace passes,
+        which keeps ToJsonString(indent=4) several times faster than the pure python indented encoder of the stdlib.
+
+        Differences with the stdlib, none of which costs a second pass over the data:
+            - NaN and Infinity are written as null, as orjson does. Use the stdlib backend for documents that must keep them.
+            - loads of input orjson rejects (NaN / Infinity tokens, numbers that overflow a double) falls back to the stdlib, so the stdlib decides what is valid.
+
+        Calls orjson cannot honour fall back to the stdlib backend:
+            - dumps with any stdlib only keyword (ensure_ascii, separators, cls, ...), loads with any keyword (object_hook, parse_float, ...)
+            - integers outside of the 64 bit range, which orjson rejects when encoding and silently turns into floats when decoding.
+              The input of loads is scanned for them by slices (see _HasLongInteger), so it is never copied whole.
+    """
+    __slots__ = []
+    Name = 'orjson'
+    _fallback: Final[StdLibJsonBackend] = StdLibJsonBackend()
+    # digits are mapped to b'0' so a run of 20 digits (possibly more than 64 bits) becomes a plain substring search, which is much faster than a regex.
+    _digits: Final[bytes] = bytes.maketrans(b'123456789', b'000000000')
+    _long_integer: Final[bytes] = b'0' * 20
+    _slice: Final[int] = 1 << 16
+
+    @property
+    def Available(self) -> bool: return orjson is not None
+
+    def dumps(self, obj: Any, *, indent: Union[int, str, None] = None, default: Callable[[Any], Any] = None, sort_keys: bool = False, **kwargs) -> str:
+        if kwargs: return self._fallback.dumps(obj, indent=indent, default=default, sort_keys=sort_keys, **kwargs)
+
+        # datetime and dataclass instances are passed to default like the stdlib does, so both backends agree on their representation.
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if indent is not None: option |= orjson.OPT_INDENT_2
+        if sort_keys: option |= orjson.OPT_SORT_KEYS
+
+        try:
+            result = orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # integers outside of the 64 bit range; raises the stdlib error if the object really is not serializable
+            return self._fallback.dumps(obj, indent=indent, default=default, sort_keys=sort_keys)
+
+        if indent is not None and indent != 2: result = _Reindent(result, indent)
+        return result.decode()
+
+    def loads(self, s: Union[str, bytes, bytearray], **kwargs) -> Any:
+        if kwargs or self._HasLongInteger(s): return self._fallback.loads(s, **kwargs)
+
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return self._fallback.loads(s)
+
+    @classmethod
+    def _HasLongInteger(cls, s: Union[str, bytes, bytearray]) -> bool:
+        """ whether s holds a run of 20 digits; the slices translated are small, and overlap so a run across two of them is found """
+        overlap = len(cls._long_integer) - 1
+        for start in range(0, len(s), cls._slice):
+            part = s[start:start + cls._slice + overlap]
+            if isinstance(part, str): part = part.encode()
+            if cls._long_integer in part.translate(cls._digits): return True
+
+        return False
+
+def _Reindent(data: bytes, indent: Union[int, str]) -> bytes:
+    """
+        changes the 2 space indentation of orjson to indent (the stdlib semantics: a number of spaces or a string).
+        Raw tabs never appear in json (strings escape them), so the levels are first marked with tabs, deepest first, then replaced in one pass.
+    """
+    depth = 0
+    while b'\n' + b'  ' * (depth + 1) in data: depth += 1  # every level up to the deepest has lines
+
+    for level in range(depth, 0, -1): data = data.replace(b'\n' + b'  ' * level, b'\n' + b'\t' * level)
+    return data.replace(b'\t', (' ' * indent if isinstance(indent, int) else indent).encode())
+
+
+
+class JsonBackends(object):
+    """
+        Registry of the available json backends and the process wide default.
+
+        The default is the first available of orjson and stdlib; it can be changed with JsonBackends.Set.
+        Every api that accepts a `backend` argument resolves it through JsonBackends.Get, so a name, a JsonBackend instance or None (the default) can be passed.
+    """
+    _backends: Dict[str, JsonBackend] = { }
+    _current: Optional[JsonBackend] = None
+
+    @classmethod
+    def Register(cls, backend: JsonBackend) -> JsonBackend:
+        if not isinstance(backend, JsonBackend): raise TypeError(f'Expecting {JsonBackend}   got type {type(backend)}')
+
+        cls._backends[backend.Name] = backend
+        return backend
+
+    @classmethod
+    def Names(cls) -> List[str]:
+        """ names of the registered backends that can be used in this process """
+        return [name for name, backend in cls._backends.items() if backend.Available]
+
+    @classmethod
+    def Get(cls, backend: Union[str, JsonBackend, None] = None) -> JsonBackend:
+        if backend is None:
+            if cls._current is None: cls._current = cls._Default()
+            return cls._current
+
+        if isinstance(backend, JsonBackend): return backend
+
+        try:
+            result = cls._backends[backend]
+        except KeyError:
+            raise KeyError(f'{backend} not in {list(cls._backends.keys())}')
+
+        if not result.Available: raise ValueError(f'json backend "{backend}" is not available in this environment')
+
+        return result
+
+    @classmethod
+    def Set(cls, backend: Union[str, JsonBackend, None]) -> JsonBackend:
+        """
+            Changes the process wide default backend.
+
+        :param backend: name or instance of the backend. None restores the automatic selection.
+        :return: the new default
+        """
+        cls._current = None if backend is None else cls.Get(backend)
+        return cls.Get()
+
+    @classmethod
+    def Current(cls) -> JsonBackend: return cls.Get()
+
+    @classmethod
+    def _Default(cls) -> JsonBackend:
+        for name in (OrJsonBackend.Name, StdLibJsonBackend.Name):
+            backend = cls._backends.get(name)
+            if backend is not None and backend.Available: return backend
+
+        raise RuntimeError('no json backend is available')
+
+
+
+JsonBackends.Register(StdLibJsonBackend())
+JsonBackends.Register(OrJsonBackend())
@@ -0,0 +1,295 @@
+import json
+from collections.abc import Mapping, MutableMapping
+from functools import partial
+from itertools import compress
+from operator import is_not, ne, or_
+from typing import *
+
+from .Exceptions import JsonPatchError
+from .Json import BaseObjectModel, FastCopy
+from .JsonBackends import JsonBackend, JsonBackends
+
+
+
+
+__all__ = ['JsonPatch']
+
+Operation = Dict[str, Any]
+
+_leaf_types = (str, int, float, bool, type(None), bytes)
+
+
+class JsonPatch(object):
+    """
+        RFC 6902 (json patch) diffs of model trees, used by BaseObjectModel.Diff / ApplyPatch.
+
+        Diff compares two trees (dicts, lists, BaseSchemaModels and their Base*Model subclasses) and returns the add / remove / replace operations
+        that turn the first into the second. Subtrees that are the same object in both trees are skipped without being visited,
+        so diffing a model against a copy on write snapshot (BaseObjectModel.Clone(copy_on_write=True)) only costs the changed parts;
+        other subtrees are compared by class and == (in C), and only the containers that differ are visited. Values of different classes are different,
+        so 1, 1.0 and True are, as in json; containers that == finds equal are not visited though, so [1] -> [True] is not reported.
+        Lists are compared position by position after removing their common prefix and suffix; moves are not detected.
+
+        Values in the operations are the objects of the new tree. ToJsonString serializes a patch the way the models serialize,
+        and Apply copies the values it inserts, so a patch can be applied to several models.
+
+        Diff reads the values stored in dicts and lists directly (so copy on write snapshots are not unshared by the diff); containers that store
+        placeholders instead of values (LazyDictModel) register the placeholder type with RegisterPlaceholder and are read through __getitem__ instead.
+    """
+    _placeholders: Set[Type] = set()
+
+    @classmethod
+    def RegisterPlaceholder(cls, _type: Type) -> Type:
+        cls._placeholders.add(_type)
+        return _type
+
+    @classmethod
+    def Diff(cls, old: Any, new: Any) -> List[Operation]:
+        operations = []
+        cls._Diff(old, new, '', operations)
+        return operations
+
+    @classmethod
+    def Apply(cls, document: Any, patch: Union[str, bytes, Iterable[Operation]], *, backend: Union[str, JsonBackend] = None) -> Any:
+        """
+            Applies every operation of patch (add, remove, replace, move, copy, test) to document in place.
+            Operations are applied in order; if one fails, JsonPatchError is raised and the earlier ones stay applied.
+
+        :return: the document, or the new value when an operation replaces the whole document and it can not be updated in place.
+        """
+        if isinstance(patch, (str, bytes, bytearray)): patch = JsonBackends.Get(backend).loads(patch)
+
+        for operation in patch:
+            try:
+                document = cls._Apply(document, operation)
+            except JsonPatchError:
+                raise
+            except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+                raise JsonPatchError(f'can not apply {operation!r}: {e!r}') from e
+
+        return document
+
+    @staticmethod
+    def ToJsonString(patch: List[Operation], indent: int = None, *, backend: Union[str, JsonBackend] = None) -> str:
+        return JsonBackends.Get(backend).dumps(patch, indent=indent, default=BaseObjectModel._serialize)
+
+
+    @staticmethod
+    def Escape(key: Any) -> str: return str(key).replace('~', '~0').replace('/', '~1')
+    @staticmethod
+    def Unescape(token: str) -> str: return token.replace('~1', '/').replace('~0', '~')
+
+    @classmethod
+    def Split(cls, path: str) -> List[str]:
+        """ the reference tokens of a json pointer """
+        if not path: return []
+        if path[0] != '/': raise JsonPatchError(f'invalid json pointer {path!r}')
+        return list(map(cls.Unescape, path[1:].split('/')))
+
+
+    @staticmethod
+    def _Kind(value: Any) -> Optional[str]:
+        if isinstance(value, Mapping): return 'object'
+        if isinstance(value, list): return 'array'
+        if hasattr(value.__class__, '__schema__'): return 'schema'
+        return None
+
+    @staticmethod
+    def _Changed(old: Any, new: Any) -> bool:
+        """ whether old and new have to be visited: not the same object, and of different classes or not == """
+        return old is not new and (old.__class__ is not new.__class__ or old != new)
+
+    @staticmethod
+    def _Changes(old_values: List, new_values: List, candidates: List[int]) -> List[int]:
+        """ the candidates (indices) whose values differ by class or by ==, see _Changed; compared in C """
+        olds, news = list(map(old_values.__getitem__, candidates)), list(map(new_values.__getitem__, candidates))
+        return list(compress(candidates, map(or_, map(is_not, map(type, olds), map(type, news)), map(ne, olds, news))))
+
+    @classmethod
+    def _Diff(cls, old: Any, new: Any, path: str, operations: List[Operation]):
+        if old is new: return
+
+        if old.__class__ in _leaf_types or new.__class__ in _leaf_types:
+            if old.__class__ is not new.__class__ or old != new: operations.append(dict(op='replace', path=path, value=new))
+            return
+
+        kind = cls._Kind(old)
+        if kind is None or kind != cls._Kind(new) or (kind == 'schema' and old.__class__ is not new.__class__):
+            if old.__class__ is not new.__class__ or old != new: operations.append(dict(op='replace', path=path, value=new))
+            return
+
+        if kind == 'object': cls._DiffMapping(old, new, path, operations)
+        elif kind == 'array': cls._DiffList(old, new, path, operations)
+        else:
+            for name in old: cls._Diff(getattr(old, name), getattr(new, name), f'{path}/{name}', operations)
+
+    @classmethod
+    def _DiffMapping(cls, old: Mapping, new: Mapping, path: str, operations: List[Operation]):
+        # the stored values are read (dict.get / dict.values), so subtrees shared with a copy on write snapshot are compared by identity instead of being unshared.
+        if isinstance(old, dict) and isinstance(new, dict):
+            keys = list(dict.keys(old))
+            if keys == list(dict.keys(new)):  # usually the same keys in the same order: the unequal values are found by C comparisons, and only they are visited
+                old_values, new_values = list(dict.values(old)), list(dict.values(new))
+                placeholders = cls._placeholders
+                candidates = list(compress(range(len(keys)), map(is_not, old_values, new_values)))
+                for i in cls._Changes(old_values, new_values, candidates):
+                    key, a, b = keys[i], old_values[i], new_values[i]
+                    cls._Diff(old[key] if a.__class__ in placeholders else a, new[key] if b.__class__ in placeholders else b, f'{path}/{cls.Escape(key)}', operations)
+
+                return
+
+        old_get = partial(dict.get, old) if isinstance(old, dict) else old.get
+        new_get = partial(dict.get, new) if isinstance(new, dict) else new.get
+        placeholders = cls._placeholders
+        for key in old:
+            if key not in new:
+                operations.append(dict(op='remove', path=f'{path}/{cls.Escape(key)}'))
+                continue
+
+            a, b = old_get(key), new_get(key)
+            if a is b or (a.__class__ not in placeholders and b.__class__ not in placeholders and not cls._Changed(a, b)): continue
+
+            cls._Diff(old[key] if a.__class__ in placeholders else a, new[key] if b.__class__ in placeholders else b, f'{path}/{cls.Escape(key)}', operations)
+
+        for key in new:
+            if key not in old:
+                value = new_get(key)
+                operations.append(dict(op='add', path=f'{path}/{cls.Escape(key)}', value=new[key] if value.__class__ in placeholders else value))
+
+    @classmethod
+    def _DiffList(cls, old: List, new: List, path: str, operations: List[Operation]):
+        old_items, new_items = list.__getitem__(old, slice(None)), list.__getitem__(new, slice(None))
+        start, old_end, new_end = 0, len(old_items), len(new_items)
+        while start < old_end and start < new_end and _Same(old_items[start], new_items[start]): start += 1
+        while old_end > start and new_end > start and _Same(old_items[old_end - 1], new_items[new_end - 1]):
+            old_end -= 1
+            new_end -= 1
+
+        common = min(old_end, new_end) - start
+        candidates = [i for i in range(start, start + common) if old_items[i] is not new_items[i]]
+        for i in cls._Changes(old_items, new_items, candidates): cls._Diff(old_items[i], new_items[i], f'{path}/{i}', operations)
+
+        for i in range(old_end - 1, start + common - 1, -1): operations.append(dict(op='remove', path=f'{path}/{i}'))
+        for i in range(start + common, new_end): operations.append(dict(op='add', path=f'{path}/{i}', value=new_items[i]))
+
+
+    @classmethod
+    def _Apply(cls, document: Any, operation: Operation) -> Any:
+        op = operation.get('op')
+        tokens = cls.Split(operation['path'] if 'path' in operation else cls._Missing(operation, 'path'))
+
+        if op == 'test':
+            if not _Equal(cls._Get(document, tokens), cls._Value(operation)): raise JsonPatchError(f'test failed: {operation!r}')
+            return document
+
+        if op == 'add': return cls._Add(document, tokens, FastCopy(cls._Value(operation)))
+        if op == 'remove':
+            cls._Remove(document, tokens)
+            return document
+        if op == 'replace':
+            cls._Get(document, tokens)
+            return cls._Set(document, tokens, FastCopy(cls._Value(operation)))
+
+        if op in ('move', 'copy'):
+            source = cls.Split(operation['from'] if 'from' in operation else cls._Missing(operation, 'from'))
+            if op == 'move':
+                if tokens[:len(source)] == source and len(tokens) > len(source): raise JsonPatchError(f'can not move a value into itself: {operation!r}')
+                value = cls._Remove(document, source)
+            else: value = FastCopy(cls._Get(document, source))
+
+            return cls._Add(document, tokens, value)
+
+        raise JsonPatchError(f'unknown operation {op!r}')
+
+    @staticmethod
+    def _Missing(operation: Operation, member: str): raise JsonPatchError(f'{operation!r} has no {member!r} member')
+    @classmethod
+    def _Value(cls, operation: Operation) -> Any: return operation['value'] if 'value' in operation else cls._Missing(operation, 'value')
+
+    @staticmethod
+    def _Key(container: Any, token: str, *, append: bool = False) -> Any:
+        """ the key / index / field of container that token refers to """
+        if isinstance(container, list):
+            if token == '-' and append: return len(container)
+            if not token.isdigit() or (token != '0' and token[0] == '0'): raise JsonPatchError(f'invalid array index {token!r}')
+            return int(token)
+
+        if isinstance(container, Mapping):
+            if token in container: return token
+            # models with non str keys: the diff wrote str(key)
+            return next((key for key in container if not isinstance(key, str) and str(key) == token), token)
+
+        if hasattr(container.__class__, '__schema__'):
+            if token not in container.__schema__: raise JsonPatchError(f'{container.__class__.__name__} has no field {token!r}')
+            return token
+
+        raise JsonPatchError(f'can not index {container.__class__.__name__} with {token!r}')
+
+    @classmethod
+    def _Get(cls, document: Any, tokens: List[str]) -> Any:
+        for token in tokens:
+            key = cls._Key(document, token)
+            if isinstance(document, (list, Mapping)):
+                if isinstance(document, list) and key >= len(document): raise JsonPatchError(f'index {key} out of range')
+                document = document[key]
+            else: document = getattr(document, key)
+
+        return document
+
+    @classmethod
+    def _Set(cls, document: Any, tokens: List[str], value: Any) -> Any:
+        if not tokens:
+            # the whole document: updated in place when both are dicts / lists, otherwise replaced
+            if isinstance(document, MutableMapping) and isinstance(value, Mapping):
+                document.clear()
+                document.update(value)
+                return document
+            if isinstance(document, list) and isinstance(value, list):
+                document[:] = value
+                return document
+            return value
+
+        parent = cls._Get(document, tokens[:-1])
+        key = cls._Key(parent, tokens[-1])
+        if isinstance(parent, (list, MutableMapping)): parent[key] = value
+        else: setattr(parent, key, value)
+        return document
+
+    @classmethod
+    def _Add(cls, document: Any, tokens: List[str], value: Any) -> Any:
+        if not tokens: return cls._Set(document, tokens, value)
+
+        parent = cls._Get(document, tokens[:-1])
+        if isinstance(parent, list):
+            index = cls._Key(parent, tokens[-1], append=True)
+            if index > len(parent): raise JsonPatchError(f'index {index} out of range')
+            parent.insert(index, value)
+            return document
+
+        return cls._Set(document, tokens, value)
+
+    @classmethod
+    def _Remove(cls, document: Any, tokens: List[str]) -> Any:
+        if not tokens: raise JsonPatchError('can not remove the whole document')
+
+        parent = cls._Get(document, tokens[:-1])
+        key = cls._Key(parent, tokens[-1])
+        if isinstance(parent, list):
+            if key >= len(parent): raise JsonPatchError(f'index {key} out of range')
+            return parent.pop(key)
+        if isinstance(parent, MutableMapping):
+            if key not in parent: raise JsonPatchError(f'{tokens[-1]!r} not found')
+            return parent.pop(key)
+
+        raise JsonPatchError(f'can not remove field {key!r} of {parent.__class__.__name__}')
+
+
+
+def _Same(a: Any, b: Any) -> bool:
+    """ cheap equality used to strip the common ends of lists: identity, or equal leaves """
+    return a is b or (a.__class__ is b.__class__ and a.__class__ in _leaf_types and a == b)
+
+def _Equal(a: Any, b: Any) -> bool:
+    """ json equality, for the test operation: numbers by value, anything else by its serialized form """
+    if a.__class__ in (int, float) and b.__class__ in (int, float): return a == b
+    return json.dumps(a, sort_keys=True, default=BaseObjectModel._serialize) == json.dumps(b, sort_keys=True, default=BaseObjectModel._serialize)
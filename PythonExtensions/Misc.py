@@ -70,8 +70,12 @@ def IsAttributePrivate(attr_name: str) -> bool: return _private_or_special_funct
 
 
 
-def get_size(obj, seen: set = set()):
-    """ Recursively finds size of objects """
+def get_size(obj, seen: set = None):
+    """
+        Recursively finds size of objects. Objects referenced several times (shared keys and values) are counted once.
+        Only concrete containers (dict, list, tuple, set, frozenset and their subclasses, such as the Base*Model collections) and __dict__ are walked:
+        other iterables (generators, files) are never iterated. The stored values of dicts are read, so a LazyDictModel is not decoded.
+    """
     size = sys.getsizeof(obj)
     if seen is None: seen = set()
 
@@ -81,15 +85,15 @@ def get_size(obj, seen: set = set()):
     # Important mark as seen *before* entering recursion to gracefully handle self-referential objects
     seen.add(obj_id)
     if isinstance(obj, dict):
-        size += sum([get_size(v, seen) for v in obj.values()])
-        size += sum([get_size(k, seen) for k in obj.keys()])
-
-    elif hasattr(obj, '__dict__'):
-        size += get_size(obj.__dict__, seen)
+        size += sum([get_size(v, seen) for v in dict.values(obj)])
+        size += sum([get_size(k, seen) for k in dict.keys(obj)])
 
-    elif hasattr(obj, '__iter__') and not isinstance(obj, (str, bytes, bytearray)):
+    elif isinstance(obj, (list, tuple, set, frozenset)):
         size += sum([get_size(i, seen) for i in obj])
 
+    if hasattr(obj, '__dict__'):
+        size += get_size(obj.__dict__, seen)
+
     return size
 
 
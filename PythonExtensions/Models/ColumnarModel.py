@@ -0,0 +1,222 @@
+from array import array
+from itertools import repeat
+from json import JSONEncoder
+from operator import itemgetter
+from sys import intern
+from typing import *
+
+from ..Json import *
+from ..JsonBackends import JsonBackend, JsonBackends
+
+
+
+
+__all__ = ['ColumnarListModel', 'ColumnarRow']
+
+_Column = Union[array, List[Any]]
+
+def _ToColumn(values: List[Any]) -> _Column:
+    """ ints -> array('q'), floats -> array('d'), str -> interned list, anything else (mixed types, bool, None, nested values) -> list """
+    types = set(map(type, values))
+    if len(types) != 1: return values
+
+    _type = types.pop()
+    if _type is int:
+        try:
+            return array('q', values)
+        except OverflowError:
+            return values
+
+    if _type is float: return array('d', values)
+
+    if _type is str: return list(map(intern, values))
+
+    return values
+
+
+
+class ColumnarRow(MutableMapping[str, Any]):
+    """
+        View of one row of a ColumnarListModel, by position. Reads and writes go straight to the columns.
+    """
+    __slots__ = ['_model', '_index']
+    def __init__(self, model: 'ColumnarListModel', index: int):
+        self._model = model
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any: return self._model._columns[key][self._index]
+    def __setitem__(self, key: str, value: Any): self._model._Set(key, self._index, value)
+    def __delitem__(self, key: str): raise TypeError(f'{ColumnarListModel.__name__} rows all have the same keys; columns can not be removed from a single row')
+    def __iter__(self) -> Iterator[str]: return iter(self._model._columns)
+    def __len__(self) -> int: return len(self._model._columns)
+
+    def ToDict(self) -> Dict[str, Any]:
+        index = self._index
+        return { key: column[index] for key, column in self._model._columns.items() }
+
+    def __repr__(self): return f'<{self.__class__.__name__} [{self._index}] {self.ToDict()}>'
+
+
+
+class ColumnarListModel(BaseObjectModel):
+    """
+        List of rows (dicts) that all have the same keys, stored as one column per key instead of one dict per row.
+
+        Integer and float columns are kept in `array` ('q' / 'd'), text columns hold interned strings, and any other column is a plain list.
+        A column is widened to a list when a value that does not fit its array is stored.
+
+        Iterating and indexing yield ColumnarRow views; ToList / ToListModel rebuild plain dicts, and Parse / FromListModel build the columns,
+        so converting from and to BaseListModel is a handful of C level passes per column.
+        ToJsonString produces the same document as the equivalent BaseListModel of dicts.
+    """
+    __slots__ = ['_columns', '_length']
+    def __init__(self, rows: Iterable[Mapping[str, Any]] = None):
+        self._columns: Dict[str, _Column] = { }
+        if isinstance(rows, ColumnarListModel):
+            self._columns.update((key, column[:]) for key, column in rows._columns.items())
+            self._length = rows._length
+            return
+
+        rows = rows if isinstance(rows, list) else list(rows or ())
+        self._length = len(rows)
+        if not rows: return
+
+        keys = list(rows[0])
+        if set(map(len, rows)) != { len(keys) }: raise ValueError(f'{self.__class__.__name__} rows must all have the same keys')
+
+        try:
+            for key in keys: self._columns[intern(key) if isinstance(key, str) else key] = _ToColumn(list(map(itemgetter(key), rows)))
+        except KeyError as e:
+            raise ValueError(f'{self.__class__.__name__} rows must all have the same keys; missing {e}') from e
+
+
+    @property
+    def Keys(self) -> Tuple[str, ...]: return tuple(self._columns)
+    def Column(self, key: str) -> _Column:
+        """ The storage of a column (array or list). It can be read and assigned in place, but must not be resized. """
+        return self._columns[key]
+
+
+    def _CheckKeys(self, row: Mapping[str, Any]):
+        if len(row) != len(self._columns) or any(key not in row for key in self._columns): raise ValueError(f'{self.__class__.__name__} rows must all have the same keys')
+
+    def _Set(self, key: str, index: int, value: Any):
+        column = self._columns[key]
+        if column.__class__ is array:
+            if value.__class__ is (int if column.typecode == 'q' else float):
+                try:
+                    column[index] = value
+                    return
+                except OverflowError:
+                    pass
+
+            column = self._columns[key] = column.tolist()
+
+        elif value.__class__ is str: value = intern(value)
+
+        column[index] = value
+
+    def _Append(self, key: str, value: Any):
+        column = self._columns[key]
+        if column.__class__ is array:
+            if value.__class__ is (int if column.typecode == 'q' else float):
+                try:
+                    column.append(value)
+                    return
+                except OverflowError:
+                    pass
+
+            column = self._columns[key] = column.tolist()
+
+        elif value.__class__ is str: value = intern(value)
+
+        column.append(value)
+
+    def append(self, row: Mapping[str, Any]):
+        if not self._columns and not self._length:
+            self.__init__([row])
+            return
+
+        self._CheckKeys(row)
+        for key in self._columns: self._Append(key, row[key])
+        self._length += 1
+    def extend(self, rows: Iterable[Mapping[str, Any]]):
+        if not self._length:
+            self.__init__(rows)
+            return
+
+        other = rows if isinstance(rows, ColumnarListModel) else ColumnarListModel(rows)
+        if not other._length: return
+        if set(other._columns) != set(self._columns): raise ValueError(f'{self.__class__.__name__} rows must all have the same keys')
+
+        for key, column in other._columns.items():
+            mine = self._columns[key]
+            if mine.__class__ is array and column.__class__ is array and mine.typecode == column.typecode: mine.extend(column)
+            else:
+                if mine.__class__ is array: mine = self._columns[key] = mine.tolist()
+                mine.extend(column)
+
+        self._length += other._length
+
+
+    def __len__(self) -> int: return self._length
+    def __iter__(self) -> Iterator[ColumnarRow]: return map(ColumnarRow, repeat(self, self._length), range(self._length))
+    def __getitem__(self, index: Union[int, slice]) -> Union[ColumnarRow, 'ColumnarListModel']:
+        if isinstance(index, slice):
+            result = self.__class__()
+            result._columns = { key: column[index] for key, column in self._columns.items() }
+            result._length = len(range(*index.indices(self._length)))
+            return result
+
+        if index < 0: index += self._length
+        if not 0 <= index < self._length: raise IndexError(f'{self.__class__.__name__} index out of range')
+
+        return ColumnarRow(self, index)
+    def __setitem__(self, index: int, row: Mapping[str, Any]):
+        self._CheckKeys(row)
+        position = self[index]._index
+        for key in self._columns: self._Set(key, position, row[key])
+    def __eq__(self, other):
+        if isinstance(other, ColumnarListModel): return self.ToList() == other.ToList()
+        if isinstance(other, list): return self.ToList() == other
+        return NotImplemented
+    def __repr__(self): return f'<{self.__class__.__name__} {self._length} rows {list(self._columns)}>'
+
+
+    def enumerate(self) -> Iterable[Tuple[int, ColumnarRow]]:
+        return enumerate(self)
+    def Iter(self) -> Iterable[int]:
+        return range(self._length)
+
+
+    def Filter(self, func: callable) -> List[ColumnarRow]:
+        return list(filter(func, self))
+    def ToDict(self) -> Dict[int, ColumnarRow]:
+        return dict(self.enumerate())
+    def ToList(self) -> List[Dict[str, Any]]:
+        """ the rows as plain dicts """
+        keys = tuple(self._columns)
+        return list(map(dict, map(zip, repeat(keys, self._length), zip(*self._columns.values())))) if keys else [{ } for _ in range(self._length)]
+    def ToListModel(self, cls: Type[BaseListModel] = BaseListModel) -> BaseListModel:
+        return cls(self.ToList())
+
+
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str:
+        return JsonBackends.Get(backend).dumps(self.ToList(), indent=indent, default=self._serialize)
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]:
+        return JSONEncoder(indent=indent, default=self._serialize).iterencode(self.ToList())
+
+
+    @classmethod
+    def Parse(cls, d):
+        if isinstance(d, (list, ColumnarListModel)):
+            return cls(d)
+
+        throw(d, list)
+
+    @classmethod
+    def FromListModel(cls, items: List[Mapping[str, Any]]): return cls.Parse(items)
+
+    @classmethod
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, **kwargs):
+        return cls.Parse(JsonBackends.Get(backend).loads(string, **kwargs))
@@ -0,0 +1,304 @@
+import copy as _copy
+import mmap
+import re
+from json import JSONDecodeError
+from os import PathLike
+from typing import *
+
+from ..Json import *
+from ..Json import _identity
+from ..JsonBackends import JsonBackend, JsonBackends
+from ..JsonPatch import JsonPatch
+
+
+
+
+__all__ = ['LazyDictModel']
+
+_Buffer = Union[str, bytes, bytearray, memoryview, mmap.mmap]
+
+
+class _Patterns(object):
+    """ the scanner regexes, compiled for str and for bytes-like documents """
+    DEPTH: Final[int] = 16
+    __slots__ = ['whitespace', 'string', 'scalar', 'container', 'filler', 'member', 'opening', 'closing', 'quote', 'colon', 'comma']
+    def __init__(self, convert: Callable[[str], AnyStr]):
+        string = r'"[^"\\]*+(?:\\.[^"\\]*+)*+"'  # unrolled, so sre loops over runs of characters instead of alternating per character
+        scalar = r'[^,\]}\s]++'
+
+        # re has no recursion, so balanced brackets are matched up to DEPTH levels by nesting the pattern; deeper values fall back to counting brackets.
+        # Brackets are not matched by kind ( [} passes ); the value is validated when it is decoded.
+        filler = rf'(?:[^"\[\]{{}}]++|{string})*+'
+        for _ in range(self.DEPTH): filler = rf'(?:[^"\[\]{{}}]++|{string}|[\[{{]{filler}[\]}}])*+'
+        container = rf'[\[{{]{filler}[\]}}]'
+
+        self.whitespace = re.compile(convert(r'[ \t\n\r]*'))
+        self.string = re.compile(convert(string), re.DOTALL)
+        self.scalar = re.compile(convert(scalar))
+        self.container = re.compile(convert(container), re.DOTALL)
+        self.filler = re.compile(convert(filler), re.DOTALL)
+        self.member = re.compile(convert(rf'({string})[ \t\n\r]*+:[ \t\n\r]*+({string}|{container}|{scalar})[ \t\n\r]*+([,}}])[ \t\n\r]*+'), re.DOTALL)
+        self.opening, self.closing, self.quote, self.colon, self.comma = map(convert, ('{[', '}]', '"', ':', ','))
+
+_str_patterns = _Patterns(str)
+_bytes_patterns = _Patterns(str.encode)
+
+
+
+class _Source(object):
+    """ the document shared by the _Raw values of a LazyDictModel tree, with the backend used to decode them """
+    __slots__ = ['data', 'patterns', 'backend', 'kwargs']
+    def __init__(self, data: _Buffer, backend: JsonBackend, kwargs: Dict[str, Any]):
+        self.data = data
+        self.patterns = _str_patterns if isinstance(data, str) else _bytes_patterns
+        self.backend = backend
+        self.kwargs = kwargs
+
+    def Text(self, start: int, end: int) -> str:
+        value = self.data[start:end]
+        return value if isinstance(value, str) else bytes(value).decode()
+
+    def Error(self, message: str, position: int) -> JSONDecodeError: return JSONDecodeError(message, self.data if isinstance(self.data, str) else '', position)
+
+
+    def SkipValue(self, position: int) -> int:
+        """ end of the json value starting at position. The value itself is only validated when it is decoded. """
+        data, patterns = self.data, self.patterns
+        first = data[position:position + 1]
+        if not first: raise self.Error('Expecting value', position)
+
+        if first == patterns.quote:
+            match = patterns.string.match(data, position)
+            if match is None: raise self.Error('Unterminated string', position)
+            return match.end()
+
+        if first not in patterns.opening:
+            match = patterns.scalar.match(data, position)
+            if match is None: raise self.Error('Expecting value', position)
+            return match.end()
+
+        match = patterns.container.match(data, position)
+        if match is not None: return match.end()
+
+        depth = 0
+        while True:
+            char = data[position:position + 1]
+            if not char: raise self.Error('Unterminated value', position)
+
+            if char in patterns.opening: depth += 1
+            elif char in patterns.closing:
+                depth -= 1
+                if depth == 0: return position + 1
+            else: raise self.Error('Unterminated string', position)
+
+            position = patterns.filler.match(data, position + 1).end()
+
+    def Index(self, start: int) -> Tuple[List[Tuple[str, '_Raw']], int]:
+        """ keys and value spans of the object starting at start (after whitespace), and the position after it and the whitespace that follows """
+        data, patterns = self.data, self.patterns
+        position = patterns.whitespace.match(data, start).end()
+        if data[position:position + 1] != patterns.opening[:1]: raise self.Error('Expecting object', position)
+
+        items = []
+        position = patterns.whitespace.match(data, position + 1).end()
+        if data[position:position + 1] == patterns.closing[:1]: return items, position + 1
+
+        decode = self.backend.loads
+        while True:
+            # members that match the member pattern (delimiter included) are taken in one tight loop; the rest goes through the step by step scan below.
+            for match in patterns.member.finditer(data, position):
+                if match.start() != position: break
+
+                key, char = match.group(1, 3)
+                key = key[1:-1] if key.__class__ is str else key[1:-1].decode()
+                items.append((decode(f'"{key}"') if '\\' in key else key, _Raw(self, *match.span(2))))
+                position = match.end()
+                if char != patterns.comma: return items, position
+
+            match = patterns.string.match(data, position)
+            if match is None: raise self.Error('Expecting property name enclosed in double quotes', position)
+
+            key = self.Text(match.start() + 1, match.end() - 1)
+            position = patterns.whitespace.match(data, match.end()).end()
+            if data[position:position + 1] != patterns.colon: raise self.Error("Expecting ':' delimiter", position)
+
+            start = patterns.whitespace.match(data, position + 1).end()
+            end = self.SkipValue(start)
+            items.append((decode(f'"{key}"') if '\\' in key else key, _Raw(self, start, end)))
+
+            position = patterns.whitespace.match(data, end).end()
+            char = data[position:position + 1]
+            if char == patterns.closing[:1]: return items, position + 1
+            if char != patterns.comma: raise self.Error("Expecting ',' delimiter", position)
+            position = patterns.whitespace.match(data, position + 1).end()
+
+
+
+class _Raw(object):
+    """ a value of a LazyDictModel that has not been decoded yet: a span of the source document. Immutable, so copies share it. """
+    __slots__ = ['source', 'start', 'end']
+    def __init__(self, source: _Source, start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+
+    def Text(self) -> str: return self.source.Text(self.start, self.end)
+
+    def Decode(self) -> Any:
+        source = self.source
+        if source.data[self.start:self.start + 1] == source.patterns.opening[:1]: return LazyDictModel._FromSpan(source, self.start)
+
+        data = source.data[self.start:self.end]
+        return source.backend.loads(bytes(data) if isinstance(data, memoryview) else data, **source.kwargs)
+
+    def __copy__(self): return self
+    def __deepcopy__(self, memo: Dict): return self
+    def __reduce_ex__(self, protocol: int): return _identity, (self.Decode(),)
+    def __repr__(self): return f'<{self.__class__.__name__} {self.Text()[:40]!r}>'
+
+JsonSerializers.Register(_Raw, _Raw.Decode)
+JsonPatch.RegisterPlaceholder(_Raw)
+
+
+
+class LazyDictModel(BaseDictModel[str, Any]):
+    """
+        BaseDictModel created from a json object whose values are only decoded when they are read.
+
+        FromJson / FromJsonFile index the top level keys and the span of each value without decoding them; the document (str, bytes,
+        memoryview or mmap) is kept. A value is decoded the first time it is read, and nested objects become LazyDictModels themselves,
+        so only the touched parts of the tree are ever materialized. Errors inside a value surface when that value is decoded.
+
+        ToJsonString and IterJsonChunks copy untouched values verbatim from the document (keeping their original whitespace) and only encode the values that were read or set.
+        Methods that expose every value at once (items, values, ==, ToDict, pickling, ...) decode the remaining values first.
+
+        Skipping values runs in re at roughly the speed of the C decoder, so the gain is mostly memory; indexing an object with many small
+        values costs more than decoding it, so prefer BaseDictModel when most of the document is read anyway. Lists are decoded whole.
+    """
+    @classmethod
+    def _FromSpan(cls, source: _Source, start: int, end: Optional[int] = None) -> 'LazyDictModel':
+        items, position = source.Index(start)
+        if end is not None and source.patterns.whitespace.match(source.data, position).end() != end: raise source.Error('Extra data', position)
+
+        result = cls()
+        dict.update(result, items)
+        return result
+
+    @classmethod
+    def FromJson(cls, string: _Buffer, *, backend: Union[str, JsonBackend] = None, **kwargs):
+        """
+        :param string: the document (str, bytes, bytearray, memoryview or mmap). It must not be modified while the model is in use.
+        :param backend: json backend used to decode the values
+        :param kwargs: passed to the backend's loads for every decoded value
+        """
+        return cls._FromSpan(_Source(string, JsonBackends.Get(backend), kwargs), 0, len(string))
+
+    @classmethod
+    def FromJsonFile(cls, path: Union[str, PathLike], *, backend: Union[str, JsonBackend] = None, **kwargs):
+        """ Memory maps the file at path (read only) and indexes it with FromJson. The map stays open while any part of the model references it. """
+        with open(path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                data = b''
+
+        return cls.FromJson(data, backend=backend, **kwargs)
+
+
+    @property
+    def Pending(self) -> List[str]:
+        """ keys whose values have not been decoded yet """
+        return [key for key, value in dict.items(self) if value.__class__ is _Raw]
+
+    def _Decode(self, key: str, value: _Raw) -> Any:
+        value = value.Decode()
+        dict.__setitem__(self, key, value)
+        return value
+    def _DecodeAll(self):
+        for key, value in dict.items(self):
+            if value.__class__ is _Raw: dict.__setitem__(self, key, value.Decode())
+
+
+    def __getitem__(self, key: str) -> Any:
+        value = dict.__getitem__(self, key)
+        if value.__class__ is _Raw: value = self._Decode(key, value)
+        return value
+    def get(self, key: str, default: Any = None) -> Any: return self[key] if key in self else default
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key in self: return self[key]
+        self[key] = default
+        return default
+    def pop(self, key: str, *default) -> Any:
+        value = dict.pop(self, key, *default)
+        return value.Decode() if value.__class__ is _Raw else value
+    def popitem(self) -> Tuple[str, Any]:
+        key, value = dict.popitem(self)
+        return key, value.Decode() if value.__class__ is _Raw else value
+    def values(self):
+        self._DecodeAll()
+        return dict.values(self)
+    def items(self):
+        self._DecodeAll()
+        return dict.items(self)
+    def copy(self) -> 'LazyDictModel':
+        result = self.__class__()
+        dict.update(result, dict.items(self))
+        return result
+    def __eq__(self, other):
+        self._DecodeAll()
+        if isinstance(other, LazyDictModel): other._DecodeAll()
+        return dict.__eq__(self, other)
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+    __hash__ = None
+    def __repr__(self):
+        self._DecodeAll()
+        return dict.__repr__(self)
+    def __deepcopy__(self, memo: Dict) -> 'LazyDictModel':
+        result = memo[id(self)] = self.__class__()
+        dict.update(result, ((key, value if value.__class__ is _Raw else _copy.deepcopy(value, memo)) for key, value in dict.items(self)))
+        return result
+    def __reduce_ex__(self, protocol: int):
+        self._DecodeAll()
+        return self.__class__, (dict(dict.items(self)),)
+
+    def Clone(self, *, copy_on_write: bool = False) -> 'LazyDictModel':
+        """ deep copy that shares the undecoded values (they are immutable), so cloning a mostly untouched document is cheap in either mode """
+        return _copy.deepcopy(self)
+
+    def ToDict(self) -> Dict[str, Any]:
+        self._DecodeAll()
+        return self._ToDict(self)
+
+
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str: return ''.join(self._IterEncode(JsonBackends.Get(backend), indent, 0))
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]: return self._IterEncode(JsonBackends.Get('stdlib'), indent, 0)
+
+    def _IterEncode(self, backend: JsonBackend, indent: Optional[int], level: int) -> Iterator[str]:
+        """ the document in chunks of one member each: the untouched values are copied from the source, the others are encoded by backend """
+        if not dict.__len__(self):
+            yield '{}'
+            return
+
+        if indent is None:
+            start, separator, end = '{', ', ', '}'
+            pad = None
+        else:
+            pad = '\n' + ' ' * (indent * (level + 1))
+            start, separator, end = '{' + pad, ',' + pad, '\n' + ' ' * (indent * level) + '}'
+
+        for key, value in dict.items(self):
+            # non str keys are written the way the encoders write them: 1 -> "1", True -> "true"
+            head = f'{start}{backend.dumps(key if isinstance(key, str) else backend.dumps(key))}: '
+            start = separator
+
+            if value.__class__ is _Raw: yield head + value.Text()
+            elif isinstance(value, LazyDictModel):
+                yield head
+                yield from value._IterEncode(backend, indent, level + 1)
+            else:
+                text = backend.dumps(value, indent=indent, default=self._serialize)
+                yield head + (text if pad is None else text.replace('\n', pad))  # newlines only occur between tokens, strings are escaped
+
+        yield end
@@ -1,12 +1,13 @@
-from json import loads as _loads
+from json import JSONEncoder
 from typing import *
 
-from Json import *
+from ..Json import *
+from ..JsonBackends import JsonBackend, JsonBackends
 
 
 
 
-__all__ = ['BaseMultiDictModel', 'KeyCollection']
+__all__ = ['BaseMultiDictModel', 'KeyCollection', 'FrozenKeyCollection']
 
 _Default = TypeVar("_Default")
 _KT = TypeVar("_KT")
@@ -17,6 +18,8 @@ class KeyCollection(BaseListModel[Hashable]):
     def __hash__(self): return hash(tuple(self))
     def __contains__(self, item: Hashable): return super().__contains__(item)
 
+    def Freeze(self) -> 'FrozenKeyCollection': return FrozenKeyCollection(self)
+
     @classmethod
     def FromString(cls, s: str):
         if isinstance(s, str):
@@ -26,37 +29,165 @@ class KeyCollection(BaseListModel[Hashable]):
 
 
 
-class BaseMultiDictModel(dict, BaseObjectModel, Dict[KeyCollection, _VT]):
-    def __init__(self, source: Dict[KeyCollection, _VT] = None, **kwargs: _VT):
-        if source is not None: super().__init__(source, **kwargs)
-        else: super().__init__(**kwargs)
+class FrozenKeyCollection(tuple):
+    """
+        Immutable group of aliases, used as the keys of BaseMultiDictModel. Duplicate aliases are dropped (keeping the first).
+        It is hashed by tuple, in C, instead of copying itself into a tuple on each dict lookup (see KeyCollection.__hash__); the aliases cache their own hashes.
+        Instances have no __dict__ (a tuple subclass cannot have slots, so the hash itself is not stored).
+    """
+    __slots__ = ()
+    def __new__(cls, aliases: Iterable[Hashable] = ()):
+        if type(aliases) is cls: return aliases
+        return super().__new__(cls, dict.fromkeys(aliases))
+
+    def __reduce__(self): return self.__class__, (tuple(self),)
+    def __copy__(self): return self
+    def __deepcopy__(self, memo: Dict): return self
+    def __repr__(self): return f'{self.__class__.__name__}({tuple.__repr__(self)})'
+
+    def ToList(self) -> List[Hashable]: return list(self)
+    def Thaw(self) -> KeyCollection: return KeyCollection(self)
+
+
+
+class BaseMultiDictModel(dict, BaseObjectModel, Dict[FrozenKeyCollection, _VT]):
+    """
+        Dictionary whose entries are reachable by any of several aliases.
+
+        Entries are stored under a FrozenKeyCollection (the group of aliases), and an inverted index maps every alias to its group,
+        so get / set / delete / contains by an alias or by a group are O(1) on average.
+        A key that is a KeyCollection / FrozenKeyCollection addresses a group; any other hashable key is a single alias.
+
+        Setting a group creates it (or replaces the value of the identical group); it raises ValueError if one of its aliases already belongs to another group.
+        Setting an unknown alias creates a group holding only that alias. Iteration, keys() and items() yield the groups.
+    """
+    _aliases: Dict[Hashable, FrozenKeyCollection]
+
+    def __init__(self, source: Union[Mapping, Iterable[Tuple[Any, _VT]]] = None, **kwargs: _VT):
+        super().__init__()
+        self._aliases = { }
+        self.update(source or (), **kwargs)
+
+
+    def _Find(self, key: Any) -> Optional[FrozenKeyCollection]:
+        """ the stored group key refers to, or None """
+        if isinstance(key, (FrozenKeyCollection, KeyCollection)):
+            key = FrozenKeyCollection(key)
+            return key if dict.__contains__(self, key) else None
+
+        return self._aliases.get(key)
+
+    def Group(self, key: Any) -> FrozenKeyCollection:
+        """ the group (every alias) of the entry key refers to """
+        group = self._Find(key)
+        if group is None: raise KeyError(key)
+        return group
+
+    @property
+    def Aliases(self) -> KeysView: return self._aliases.keys()
+
+
+    def __getitem__(self, key: Any) -> _VT:
+        group = self._Find(key)
+        if group is None: raise KeyError(key)
+        return dict.__getitem__(self, group)
+
+    def __setitem__(self, key: Any, value: _VT):
+        group = self._Find(key)
+        if group is None:
+            group = FrozenKeyCollection(key if isinstance(key, (FrozenKeyCollection, KeyCollection)) else (key,))
+            if not group: raise ValueError('a key collection needs at least one alias')
 
-    # def __deepcopy__(self): return super().__deepcopy__()
-    def __delitem__(self, item: Union[Hashable, KeyCollection]):
-        if isinstance(item, KeyCollection): return super().__delitem__(item)
+            aliases = self._aliases
+            for alias in group:
+                if alias in aliases: raise ValueError(f'alias {alias!r} already belongs to {aliases[alias]!r}')
 
-        for x in self.keys():
-            if item in x: return True
+            aliases.update(dict.fromkeys(group, group))
 
-        return False
-    def __contains__(self, item: Union[Hashable, KeyCollection]) -> bool:
-        if isinstance(item, KeyCollection): return super().__contains__(item)
+        dict.__setitem__(self, group, value)
 
-        return any(item in x for x in self.keys())
+    def __delitem__(self, key: Any):
+        group = self._Find(key)
+        if group is None: raise KeyError(key)
+        self._Remove(group)
 
-    def __setitem__(self, key: Union[Hashable, KeyCollection], value: _VT):
-        if key in self:
-            if isinstance(key, KeyCollection): return super().__setitem__(key, value)
+    def _Remove(self, group: FrozenKeyCollection) -> _VT:
+        aliases = self._aliases
+        for alias in group: del aliases[alias]
+        return dict.pop(self, group)
 
-        for k, v in self.items():
-            if value == v:
+    def __contains__(self, key: Any) -> bool: return self._Find(key) is not None
 
-                return
+    def get(self, key: Any, default: _Default = None) -> Union[_VT, _Default]:
+        group = self._Find(key)
+        return default if group is None else dict.__getitem__(self, group)
 
-    def __getitem__(self, item: Hashable):
-        pass
+    def pop(self, key: Any, *default: _Default) -> Union[_VT, _Default]:
+        group = self._Find(key)
+        if group is not None: return self._Remove(group)
+        if default: return default[0]
+        raise KeyError(key)
 
-    def enumerate(self) -> Iterable[Tuple[int, KeyCollection]]: return enumerate(self)
+    def popitem(self) -> Tuple[FrozenKeyCollection, _VT]:
+        group, value = dict.popitem(self)
+        aliases = self._aliases
+        for alias in group: del aliases[alias]
+        return group, value
+
+    def setdefault(self, key: Any, default: _VT = None) -> _VT:
+        group = self._Find(key)
+        if group is not None: return dict.__getitem__(self, group)
+
+        self[key] = default
+        return default
+
+    def update(self, source: Union[Mapping, Iterable[Tuple[Any, _VT]]] = (), **kwargs: _VT):
+        for key, value in (source.items() if isinstance(source, Mapping) else source): self[key] = value
+        for key, value in kwargs.items(): self[key] = value
+
+    def __ior__(self, other: Mapping):
+        self.update(other)
+        return self
+    def __or__(self, other: Mapping):
+        result = self.copy()
+        result.update(other)
+        return result
+
+    def clear(self):
+        dict.clear(self)
+        self._aliases.clear()
+
+    def copy(self): return self.__class__(dict.items(self))
+
+    def __reduce_ex__(self, protocol: int):
+        # the index is rebuilt from the entries, so copies and unpickled instances never share it
+        state = { key: value for key, value in self.__dict__.items() if key != '_aliases' }
+        return self.__class__, (dict(dict.items(self)),), state or None
+
+
+    def AddAlias(self, key: Any, *aliases: Hashable) -> FrozenKeyCollection:
+        """ Adds aliases to the group of the entry key refers to. Raises ValueError if one of them belongs to another group. """
+        group = self.Group(key)
+        for alias in aliases:
+            if self._aliases.get(alias, group) is not group: raise ValueError(f'alias {alias!r} already belongs to {self._aliases[alias]!r}')
+
+        return self._Regroup(group, group + aliases)
+
+    def RemoveAlias(self, alias: Hashable) -> FrozenKeyCollection:
+        """ Removes one alias from its group; removing the last alias of a group removes the entry. """
+        group = self.Group(alias)
+        if isinstance(alias, (FrozenKeyCollection, KeyCollection)): raise TypeError('expecting a single alias, not a key collection')
+
+        return self._Regroup(group, tuple(item for item in group if item != alias))
+
+    def _Regroup(self, group: FrozenKeyCollection, aliases: Iterable[Hashable]) -> FrozenKeyCollection:
+        value = self._Remove(group)
+        new = FrozenKeyCollection(aliases)
+        if new: self[new] = value
+        return new
+
+
+    def enumerate(self) -> Iterable[Tuple[int, FrozenKeyCollection]]: return enumerate(self)
 
 
     @property
@@ -66,15 +197,29 @@ class BaseMultiDictModel(dict, BaseObjectModel, Dict[KeyCollection, _VT]):
     def __bool__(self): return not self.Empty
 
 
-    def Filter(self, func: callable) -> List[KeyCollection]: return list(filter(func, self.values()))
+    def Filter(self, func: callable) -> List[_VT]: return list(filter(func, self.values()))
+
+
+    def ToDict(self, *, backend: Union[str, JsonBackend] = None) -> Dict[str, Any]:
+        """ json compatible form: every group becomes the json string of its aliases, encoded by backend (see Parse) """
+        return self._ToDict(self._View(backend))
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str:
+        return JsonBackends.Get(backend).dumps(self.ToDict(backend=backend), indent=indent, default=self._serialize)
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]:
+        return JSONEncoder(indent=indent, default=self._serialize).iterencode(self._View('stdlib'))
+
+    def _View(self, backend: Union[str, JsonBackend, None]) -> Dict[str, _VT]:
+        """ the entries under the json strings of their groups; the values are not converted """
+        dumps = JsonBackends.Get(backend).dumps
+        return { dumps(group, default=self._serialize): value for group, value in dict.items(self) }
 
 
     @classmethod
     def Parse(cls, d):
         if isinstance(d, dict):
-            return cls({ KeyCollection.FromString(k): v for k, v in d.items() })
+            return cls({ KeyCollection.FromString(k) if k.startswith('[') else k: v for k, v in d.items() })
 
         throw(d, dict)
 
     @classmethod
-    def FromJson(cls, string: Union[str, bytes, bytearray], **kwargs): return cls.Parse(_loads(string, **kwargs))
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, **kwargs): return cls.Parse(JsonBackends.Get(backend).loads(string, **kwargs))
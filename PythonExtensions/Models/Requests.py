@@ -0,0 +1,545 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from enum import Enum
+from itertools import chain
+from typing import *
+
+from ..Constants import CPU_COUNT
+from ..Exceptions import RequestRejectedError
+from ..Threads import AutoStartTargetedThread
+
+
+
+__all__ = ['InternalRequest', 'RequestDispatcher', 'AsyncRequestDispatcher', 'RequestBus', 'Backpressure', 'ActionMetrics']
+
+_TAction = TypeVar('_TAction', Enum, str, int)
+
+def _Freeze(value: Any) -> Hashable:
+    """
+        hashable, order independent (for mappings and sets) form of value: dicts -> frozenset of items, lists -> tuples, sets -> frozensets.
+        Every value is tagged with its class, so values that are equal in python but different arguments ([1] and (1,), 1, 1.0 and True) stay distinct.
+    """
+    if isinstance(value, Mapping): return value.__class__, frozenset((_Freeze(key), _Freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)): return value.__class__, tuple(map(_Freeze, value))
+    if isinstance(value, (set, frozenset)): return value.__class__, frozenset(map(_Freeze, value))
+    return value.__class__, value
+
+
+
+class InternalRequest(Generic[_TAction]):
+    """
+        An action and its arguments. Requests with the same action, args and kwargs are equal and hash alike (see Key),
+        so they can be used as dict keys, e.g. to coalesce duplicates (see RequestDispatcher).
+    """
+    __slots__ = ['Action', 'args', 'kwargs', '_key']
+    def __init__(self, action: _TAction, *args, **kwargs):
+        self.Action: Final[_TAction] = action
+        self.args: Final[Tuple] = args
+        self.kwargs: Final[Dict[str, Any]] = kwargs
+        self._key: Optional[Tuple] = None
+
+    @property
+    def Key(self) -> Tuple:
+        """ (action, args, kwargs) with nested dicts / lists / sets frozen; computed on first use. Raises TypeError if an argument is not hashable. """
+        if self._key is None: self._key = (_Freeze(self.Action), _Freeze(self.args), _Freeze(self.kwargs))
+        return self._key
+
+    def __hash__(self): return hash(self.Key)
+    def __eq__(self, other):
+        if not isinstance(other, InternalRequest): return NotImplemented
+        return self is other or self.Key == other.Key
+    def __ne__(self, other):
+        if not isinstance(other, InternalRequest): return NotImplemented
+        return not self == other
+
+    def __repr__(self):
+        arguments = ', '.join(chain(map(repr, self.args), (f'{key}={value!r}' for key, value in self.kwargs.items())))
+        return f'{self.__class__.__name__}({self.Action!r}{", " if arguments else ""}{arguments})'
+
+
+
+class _Dispatcher(object):
+    """ request normalization, counters and batch collection shared by RequestDispatcher and AsyncRequestDispatcher """
+    def __init__(self, handler: Optional[Callable], batch_handler: Optional[Callable], window: float, max_batch: Optional[int]):
+        if handler is None and batch_handler is None: raise ValueError('a handler or a batch_handler is required')
+        if window < 0: raise ValueError(f'window must be >= 0   got {window}')
+
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[InternalRequest, Any] = { }  # in flight: submitted and not completed
+        self._batch: List[InternalRequest] = []
+        self.requests = 0
+        self.coalesced = 0
+        self.executed = 0
+        self.batches = 0
+
+    @property
+    def Statistics(self) -> Dict[str, int]:
+        """
+            requests: submitted requests; coalesced: requests that joined an identical in flight request instead of running;
+            executed: requests passed to the handler / batch_handler; batches: handler / batch_handler calls.
+        """
+        return dict(requests=self.requests, coalesced=self.coalesced, executed=self.executed, batches=self.batches)
+    @property
+    def InFlight(self) -> int: return len(self._pending)
+    def __repr__(self): return f'<{self.__class__.__name__} {self.Statistics}>'
+
+    @staticmethod
+    def _Request(action: Union[InternalRequest, Any], args: Tuple, kwargs: Dict[str, Any]) -> InternalRequest:
+        if isinstance(action, InternalRequest):
+            if args or kwargs: raise TypeError('arguments can not be combined with an InternalRequest')
+            return action
+
+        return InternalRequest(action, *args, **kwargs)
+
+    def _Join(self, request: InternalRequest, create: Callable[[], Any]) -> Tuple[Any, Optional[List[InternalRequest]], bool]:
+        """
+            Returns the future of request, the requests to dispatch now (or None) and whether a window timer must be started.
+            The thread dispatcher calls it under its lock.
+        """
+        self.requests += 1
+        future = self._pending.get(request)
+        if future is not None:
+            self.coalesced += 1
+            return future, None, False
+
+        future = self._pending[request] = create()
+        if not self.window:
+            self.executed += 1
+            self.batches += 1
+            return future, [request], False
+
+        batch = self._batch
+        batch.append(request)
+        if self.max_batch and len(batch) >= self.max_batch: return future, self._Take(), False
+        return future, None, len(batch) == 1
+
+    def _Take(self) -> List[InternalRequest]:
+        batch, self._batch = self._batch, []
+        if batch:
+            self.batches += 1 if self.batch_handler is not None else len(batch)
+            self.executed += len(batch)
+        return batch
+
+
+
+class RequestDispatcher(_Dispatcher):
+    """
+        Runs InternalRequests on a thread pool, coalescing duplicates: while a request is in flight (submitted and not completed),
+        identical requests (see InternalRequest.Key) get the same Future instead of running again, so N callers share one execution and one result.
+        A request submitted after the previous identical one completed runs again.
+
+        With window > 0, requests are collected for window seconds (or until max_batch are pending) and dispatched together:
+        to batch_handler (one call with the list of requests, returning their results in order) when given, otherwise to handler one by one.
+
+        The returned Futures are shared by every caller of the same request: cancel them only before they run, and it cancels them for every caller.
+    """
+    def __init__(self, handler: Callable[[InternalRequest], Any] = None, *, batch_handler: Callable[[List[InternalRequest]], Sequence[Any]] = None,
+                 window: float = 0, max_batch: int = None, executor: Executor = None, workers: int = None):
+        """
+        :param handler: called with each request, in a worker thread.
+        :param batch_handler: called with each batch of requests; takes precedence over handler.
+        :param window: seconds to collect requests before dispatching them; 0 dispatches each request immediately.
+        :param max_batch: dispatch as soon as this many requests are collected.
+        :param executor: executor to run the handlers in; by default a ThreadPoolExecutor of workers threads owned by the dispatcher.
+        """
+        super().__init__(handler, batch_handler, window, max_batch)
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(workers, thread_name_prefix=self.__class__.__name__)
+
+    def Submit(self, action: Union[InternalRequest, _TAction], *args, **kwargs) -> Future:
+        """ Dispatches InternalRequest(action, *args, **kwargs) (or action itself when it is an InternalRequest) and returns the Future of its result. """
+        request = self._Request(action, args, kwargs)
+        with self._lock:
+            future, batch, start = self._Join(request, Future)
+            if start:
+                self._timer = threading.Timer(self.window, self.Flush)
+                self._timer.daemon = True
+                self._timer.start()
+            elif batch is not None and self.window: self._CancelTimer()
+
+        if batch: self._Dispatch(batch)
+        return future
+
+    def Call(self, action: Union[InternalRequest, _TAction], *args, timeout: float = None, **kwargs) -> Any:
+        """ Submit, then wait for the result """
+        return self.Submit(action, *args, **kwargs).result(timeout)
+
+    def Flush(self):
+        """ Dispatches the requests collected in the current window now """
+        with self._lock:
+            self._CancelTimer()
+            batch = self._Take()
+
+        if batch: self._Dispatch(batch)
+
+    def Close(self, wait: bool = True):
+        """ Flushes the current window, then shuts the executor down if the dispatcher owns it """
+        self.Flush()
+        if self._owns_executor: self._executor.shutdown(wait)
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_val, exc_tb): self.Close()
+
+
+    def _CancelTimer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _Dispatch(self, requests: List[InternalRequest]):
+        if self.batch_handler is not None: self._executor.submit(self._RunBatch, requests)
+        else:
+            for request in requests: self._executor.submit(self._Run, request)
+
+    def _Run(self, request: InternalRequest):
+        if not self._pending[request].set_running_or_notify_cancel():
+            self._Complete(request, None, None)
+            return
+
+        try:
+            result = self.handler(request)
+        except BaseException as e:
+            self._Complete(request, None, e)
+        else:
+            self._Complete(request, result, None)
+
+    def _RunBatch(self, requests: List[InternalRequest]):
+        running = []
+        for request in requests:
+            if self._pending[request].set_running_or_notify_cancel(): running.append(request)
+            else: self._Complete(request, None, None)
+
+        requests = running
+        if not requests: return
+
+        try:
+            results = list(self.batch_handler(requests))
+            if len(results) != len(requests): raise ValueError(f'batch_handler returned {len(results)} results for {len(requests)} requests')
+        except BaseException as e:
+            for request in requests: self._Complete(request, None, e)
+        else:
+            for request, result in zip(requests, results): self._Complete(request, result, None)
+
+    def _Complete(self, request: InternalRequest, result: Any, exception: Optional[BaseException]):
+        # removed before the result is set: a request submitted once the result is visible runs again instead of joining a completed future.
+        with self._lock:
+            future: Future = self._pending.pop(request)
+
+        if future.cancelled(): return
+        if exception is not None: future.set_exception(exception)
+        else: future.set_result(result)
+
+
+
+class AsyncRequestDispatcher(_Dispatcher):
+    """
+        asyncio version of RequestDispatcher: Submit returns an asyncio.Future shared by every identical in flight request.
+        handler / batch_handler may be coroutine functions (awaited in the loop) or plain functions (run in executor, the loop's default executor when None).
+        Must be used from a single event loop.
+    """
+    def __init__(self, handler: Callable[[InternalRequest], Any] = None, *, batch_handler: Callable[[List[InternalRequest]], Sequence[Any]] = None,
+                 window: float = 0, max_batch: int = None, executor: Executor = None):
+        super().__init__(handler, batch_handler, window, max_batch)
+        self._executor = executor
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def Submit(self, action: Union[InternalRequest, _TAction], *args, **kwargs) -> asyncio.Future:
+        """ Dispatches the request and returns the Future of its result. Await it through asyncio.shield (or use Call) so one cancelled caller does not cancel the others. """
+        loop = asyncio.get_running_loop()
+        request = self._Request(action, args, kwargs)
+        future, batch, start = self._Join(request, loop.create_future)
+        if start: self._timer = loop.call_later(self.window, self.Flush)
+        elif batch is not None and self.window: self._CancelTimer()
+
+        if batch: self._Dispatch(batch)
+        return future
+
+    async def Call(self, action: Union[InternalRequest, _TAction], *args, **kwargs) -> Any:
+        """ Submit, then wait for the result. Cancelling the caller does not cancel the shared request. """
+        return await asyncio.shield(self.Submit(action, *args, **kwargs))
+
+    def Flush(self):
+        """ Dispatches the requests collected in the current window now """
+        self._CancelTimer()
+        batch = self._Take()
+        if batch: self._Dispatch(batch)
+
+    async def Close(self):
+        """ Flushes the current window and waits for the dispatched requests """
+        self.Flush()
+        if self._tasks: await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def __aenter__(self): return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb): await self.Close()
+
+
+    def _CancelTimer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _Dispatch(self, requests: List[InternalRequest]):
+        if self.batch_handler is not None: self._Spawn(self._RunBatch(requests))
+        else:
+            for request in requests: self._Spawn(self._Run(request))
+
+    def _Spawn(self, coroutine: Coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _Invoke(self, func: Callable, argument: Any) -> Any:
+        if asyncio.iscoroutinefunction(func): return await func(argument)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, argument)
+
+    async def _Run(self, request: InternalRequest):
+        try:
+            result = await self._Invoke(self.handler, request)
+        except BaseException as e:
+            self._Complete(request, None, e)
+            if not isinstance(e, Exception): raise
+        else:
+            self._Complete(request, result, None)
+
+    async def _RunBatch(self, requests: List[InternalRequest]):
+        try:
+            results = list(await self._Invoke(self.batch_handler, requests))
+            if len(results) != len(requests): raise ValueError(f'batch_handler returned {len(results)} results for {len(requests)} requests')
+        except BaseException as e:
+            for request in requests: self._Complete(request, None, e)
+            if not isinstance(e, Exception): raise
+        else:
+            for request, result in zip(requests, results): self._Complete(request, result, None)
+
+    def _Complete(self, request: InternalRequest, result: Any, exception: Optional[BaseException]):
+        future: asyncio.Future = self._pending.pop(request)
+        if future.done(): return
+        if isinstance(exception, asyncio.CancelledError): future.cancel()
+        elif exception is not None: future.set_exception(exception)
+        else: future.set_result(result)
+
+
+
+class Backpressure(Enum):
+    """ what RequestBus.Submit does when the lane of a request is full """
+    Block = 'block'  # wait until a worker takes a request from the lane (or timeout, then RequestRejectedError)
+    DropOldest = 'drop oldest'  # cancel the Future of the oldest queued request of the lane and queue the new one
+    Reject = 'reject'  # raise RequestRejectedError
+
+
+
+class ActionMetrics(object):
+    """ latency counters of one action: queue wait (submit -> start) and run time, in seconds; percentiles cover the last `samples` requests """
+    __slots__ = ['completed', 'failed', 'dropped', 'rejected', 'wait', 'run', 'max_wait', 'max_run', '_latencies']
+    def __init__(self, samples: int = 1024):
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.wait = 0.0
+        self.run = 0.0
+        self.max_wait = 0.0
+        self.max_run = 0.0
+        self._latencies: Deque[float] = deque(maxlen=samples)
+
+    def _Add(self, wait: float, run: float, failed: bool):
+        if failed: self.failed += 1
+        else: self.completed += 1
+
+        self.wait += wait
+        self.run += run
+        if wait > self.max_wait: self.max_wait = wait
+        if run > self.max_run: self.max_run = run
+        self._latencies.append(wait + run)
+
+    def Percentile(self, percent: float) -> float:
+        """ latency (wait + run) below which percent of the sampled requests completed """
+        if not self._latencies: return 0.0
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def ToDict(self) -> Dict[str, Union[int, float]]:
+        count = self.completed + self.failed
+        return dict(completed=self.completed, failed=self.failed, dropped=self.dropped, rejected=self.rejected,
+                    mean_wait=self.wait / count if count else 0.0, max_wait=self.max_wait,
+                    mean_run=self.run / count if count else 0.0, max_run=self.max_run,
+                    p50=self.Percentile(50), p95=self.Percentile(95), p99=self.Percentile(99))
+    def __repr__(self): return f'<{self.__class__.__name__} {self.ToDict()}>'
+
+
+
+class RequestBus(object):
+    """
+        Routes InternalRequests to the handler registered for their Action, on a fixed pool of worker threads (Constants.CPU_COUNT by default)
+        instead of a thread per request.
+
+        Each request is queued in a priority lane (0 is the most urgent; by default the lane its action was registered with).
+        Workers always take the oldest request of the most urgent non empty lane, so a busy urgent lane delays the others.
+        Lanes hold at most `capacity` requests; when one is full, Submit applies the backpressure policy (see Backpressure).
+
+        Metrics reports per action latencies (see ActionMetrics).
+    """
+    def __init__(self, *, lanes: int = 3, capacity: int = 1000, backpressure: Backpressure = Backpressure.Block, workers: int = None, name: str = None):
+        if lanes < 1: raise ValueError(f'lanes must be >= 1   got {lanes}')
+        if capacity < 1: raise ValueError(f'capacity must be >= 1   got {capacity}')
+
+        self.capacity = capacity
+        self.backpressure = Backpressure(backpressure)
+        self._handlers: Dict[Any, Tuple[Callable[[InternalRequest], Any], int]] = { }
+        self._metrics: Dict[Any, ActionMetrics] = { }
+        self._lanes: List[Deque[Tuple[InternalRequest, Future, float]]] = [deque() for _ in range(lanes)]
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        name = name or self.__class__.__name__
+        self._workers = [AutoStartTargetedThread(self._Work, Name=f'{name} worker {i}') for i in range(workers or CPU_COUNT or 1)]
+
+    @property
+    def Lanes(self) -> int: return len(self._lanes)
+    @property
+    def Workers(self) -> int: return len(self._workers)
+    @property
+    def Queued(self) -> List[int]:
+        """ number of queued requests per lane """
+        with self._lock:
+            return list(map(len, self._lanes))
+
+
+    def Register(self, action: Any, handler: Callable[[InternalRequest], Any] = None, *, priority: int = None):
+        """
+            Routes the requests of action to handler, queued in lane priority (default: the least urgent lane).
+            Without handler, returns a decorator registering the decorated function.
+        """
+        if handler is None: return lambda func: self.Register(action, func, priority=priority) or func
+
+        priority = self.Lanes - 1 if priority is None else priority
+        self._Lane(priority)
+        self._handlers[action] = handler, priority
+        self._metrics.setdefault(action, ActionMetrics())
+    def Unregister(self, action: Any): self._handlers.pop(action, None)
+
+    def Submit(self, request: InternalRequest, *, priority: int = None, timeout: float = None) -> Future:
+        """
+            Queues request and returns the Future of its result.
+
+        :param priority: lane to use instead of the one the action was registered with.
+        :param timeout: with Backpressure.Block, maximum seconds to wait for room in the lane before raising RequestRejectedError.
+        """
+        try:
+            handler, lane = self._handlers[request.Action]
+        except KeyError:
+            raise KeyError(f'no handler registered for {request.Action!r}') from None
+
+        lane = self._Lane(lane if priority is None else priority)
+        metrics = self._metrics[request.Action]
+        future = Future()
+        with self._lock:
+            if self._closed: raise RuntimeError(f'{self.__class__.__name__} is shut down')
+
+            queue = self._lanes[lane]
+            if len(queue) >= self.capacity:
+                if self.backpressure is Backpressure.Reject or (self.backpressure is Backpressure.Block and not self._WaitForRoom(queue, timeout)):
+                    metrics.rejected += 1
+                    raise RequestRejectedError(f'lane {lane} is full ({self.capacity} requests): {request!r}')
+
+                if self.backpressure is Backpressure.DropOldest:
+                    dropped, dropped_future, _ = queue.popleft()
+                    self._queued -= 1
+                    self._metrics[dropped.Action].dropped += 1
+                    dropped_future.cancel()
+
+            queue.append((request, future, time.perf_counter()))
+            self._queued += 1
+            self._not_empty.notify()
+
+        return future
+
+    def Post(self, action: Any, *args, **kwargs) -> Future:
+        """ Submit(InternalRequest(action, *args, **kwargs)) """
+        return self.Submit(InternalRequest(action, *args, **kwargs))
+
+    def Metrics(self, action: Any = None) -> Union[ActionMetrics, Dict[Any, ActionMetrics]]:
+        """ the metrics of action, or of every registered action """
+        return self._metrics[action] if action is not None else dict(self._metrics)
+
+    def Shutdown(self, wait: bool = True, *, cancel_pending: bool = False):
+        """ Stops accepting requests; workers exit once the lanes are empty (or right away with cancel_pending, which cancels the queued requests). """
+        with self._lock:
+            self._closed = True
+            if cancel_pending:
+                for queue in self._lanes:
+                    for _, future, _ in queue: future.cancel()
+                    queue.clear()
+                self._queued = 0
+
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+        if wait:
+            for worker in self._workers: worker.join()
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_val, exc_tb): self.Shutdown()
+
+
+    def _Lane(self, priority: int) -> int:
+        if not 0 <= priority < self.Lanes: raise ValueError(f'priority must be in [0, {self.Lanes})   got {priority}')
+        return priority
+
+    def _WaitForRoom(self, queue: Deque, timeout: Optional[float]) -> bool:
+        """ called with the lock held """
+        if not self._not_full.wait_for(lambda: len(queue) < self.capacity or self._closed, timeout): return False
+        if self._closed: raise RuntimeError(f'{self.__class__.__name__} is shut down')
+        return True
+
+    def _Next(self) -> Optional[Tuple[InternalRequest, Future, float]]:
+        with self._lock:
+            while not self._queued:
+                if self._closed: return None
+                self._not_empty.wait()
+
+            for queue in self._lanes:
+                if queue:
+                    self._queued -= 1
+                    job = queue.popleft()
+                    self._not_full.notify_all()  # submitters may wait on different lanes
+                    return job
+
+    def _Work(self):
+        perf_counter = time.perf_counter
+        while True:
+            job = self._Next()
+            if job is None: return
+
+            request, future, queued = job
+            if not future.set_running_or_notify_cancel(): continue
+
+            handler, _ = self._handlers.get(request.Action, (None, None))
+            start = perf_counter()
+            try:
+                if handler is None: raise KeyError(f'no handler registered for {request.Action!r}')
+                result = handler(request)
+            except BaseException as e:
+                self._Record(request, start - queued, perf_counter() - start, True)
+                future.set_exception(e)
+            else:
+                self._Record(request, start - queued, perf_counter() - start, False)
+                future.set_result(result)
+
+    def _Record(self, request: InternalRequest, wait: float, run: float, failed: bool):
+        with self._lock:
+            self._metrics[request.Action]._Add(wait, run, failed)
+
@@ -0,0 +1,308 @@
+from datetime import datetime, time, timedelta
+from enum import Enum
+from json import JSONEncoder
+from typing import *
+
+from ..Json import *
+from ..Json import _fast_copy
+from ..JsonBackends import JsonBackend, JsonBackends
+
+
+
+
+__all__ = ['BaseSchemaModel', 'SchemaField']
+
+_NoneType = type(None)
+_MISSING = object()
+_PLAIN: Final[Tuple[Type, ...]] = (str, int, float, bool)
+
+
+
+# Parse helpers: the common json representations are converted directly, everything else goes through the BaseObjectModel.convert_* helpers.
+def _date_time(value) -> Optional[datetime]:
+    if value.__class__ is str:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return BaseObjectModel.parse_date_time(value)
+
+    return BaseObjectModel.convert_date_time(value, TypeError)
+def _time(value) -> Optional[time]:
+    if value.__class__ is str:
+        try:
+            return time.fromisoformat(value)
+        except ValueError:
+            return BaseObjectModel.parse_time(value)
+
+    return BaseObjectModel.convert_time(value, TypeError)
+def _time_delta(value) -> Optional[timedelta]:
+    if value.__class__ is float or value.__class__ is int: return timedelta(seconds=value)
+    return BaseObjectModel.convert_time_delta(value, TypeError)
+
+_CONVERTERS: Final[Dict[Type, Callable[[Any], Any]]] = { datetime: _date_time, time: _time, timedelta: _time_delta }
+
+
+class SchemaField(object):
+    """ A field declared on a BaseSchemaModel: `name: Type` or `name: Type = default`. """
+    __slots__ = ['Name', 'Type', 'Default']
+    def __init__(self, name: str, _type: Any, default: Any = _MISSING):
+        self.Name: Final[str] = name
+        self.Type: Final[Any] = _type
+        self.Default: Final[Any] = default
+
+    @property
+    def Required(self) -> bool: return self.Default is _MISSING
+
+    def __repr__(self): return f'<{self.__class__.__name__} {self.Name}: {self.Type}{"" if self.Required else f" = {self.Default!r}"}>'
+
+
+
+def _Unwrap(_type: Any) -> Any:
+    """ Optional[T] -> T; anything that is not a class (Any, Union, TypeVar, ...) -> None, meaning "convert at runtime". """
+    if get_origin(_type) is Union:
+        args = [arg for arg in get_args(_type) if arg is not _NoneType]
+        if len(args) == 1: return _Unwrap(args[0])
+        return None
+
+    if get_origin(_type) in (list, List): return _type
+    if isinstance(_type, type): return _type
+
+    return None
+
+def _ItemType(_type: Any) -> Optional[Any]:
+    """ T for List[T], otherwise None """
+    if get_origin(_type) in (list, List):
+        args = get_args(_type)
+        if args: return _Unwrap(args[0])
+
+    return None
+
+class _Generator(object):
+    """
+        Builds the source of the methods a BaseSchemaModel subclass gets at class creation.
+
+        Every field expression is specialised for the declared type and guarded by an exact class check,
+        so values of an unexpected type still go through the generic BaseObjectModel rules.
+    """
+    __slots__ = ['cls', 'fields', 'namespace']
+    def __init__(self, cls: Type['BaseSchemaModel'], fields: Dict[str, SchemaField]):
+        self.cls = cls
+        self.fields = fields
+        self.namespace: Dict[str, Any] = dict(_new=object.__new__,
+                                              _fast_copy=_fast_copy,
+                                              _serializers=JsonSerializers._dict_converters,
+                                              _resolve=JsonSerializers.DictConverter,
+                                              throw=throw)
+
+    def Name(self, value: Any, prefix: str) -> str:
+        name = f'_{prefix}{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+
+    def ParseExpression(self, _type: Any, v: str, depth: int = 0) -> str:
+        _type = _Unwrap(_type)
+        if _type is None or _type in _PLAIN or _type is object: return v
+
+        item = _ItemType(_type)
+        if item is not None:
+            x = f'x{depth}'
+            expression = self.ParseExpression(item, x, depth + 1)
+            if expression == x: return v
+            return f'(None if {v} is None else [{expression} for {x} in {v}])'
+
+        if not isinstance(_type, type): return v
+
+        T = self.Name(_type, 'T')
+        if issubclass(_type, Enum):
+            try:
+                members = self.Name({ member.value: member for member in _type }, 'members')
+            except TypeError:  # unhashable values
+                return f'({v} if {v} is None or {v}.__class__ is {T} else {T}({v}))'
+
+            return f'({v} if {v} is None or {v}.__class__ is {T} else {members}[{v}] if {v} in {members} else {T}({v}))'
+
+        if _type in _CONVERTERS:
+            convert = self.Name(_CONVERTERS[_type], 'convert')
+            return f'({v} if {v} is None or {v}.__class__ is {T} else {convert}({v}))'
+
+        if issubclass(_type, BaseObjectModel): return f'({v} if {v} is None or isinstance({v}, {T}) else {T}.Parse({v}))'
+
+        return v
+
+    def DictExpression(self, _type: Any, v: str) -> str:
+        """ same result as BaseObjectModel._ToDict for the value """
+        generic = f'(_serializers.get({v}.__class__) or _resolve({v}.__class__))({v})'
+        _type = _Unwrap(_type)
+        if _type is None or not isinstance(_type, type): return generic
+
+        T = self.Name(_type, 'T')
+        if _type in _PLAIN or _type in _CONVERTERS: return f'({v} if {v}.__class__ is {T} else {generic})'
+
+        if issubclass(_type, Enum): return f'({v}.value if {v}.__class__ is {T} else {generic})'
+
+        if issubclass(_type, BaseSchemaModel): return f'({v}.ToDict() if {v}.__class__ is {T} else {generic})'
+
+        return generic
+
+    def JsonExpression(self, _type: Any, v: str, depth: int = 0) -> str:
+        """ same document as BaseObjectModel._serialize; values left as is are handled by the encoder's default. """
+        _type = _Unwrap(_type)
+        if _type is None or _type in _PLAIN: return v
+
+        item = _ItemType(_type)
+        if item is not None:
+            x = f'x{depth}'
+            expression = self.JsonExpression(item, x, depth + 1)
+            if expression == x: return v
+            return f'([{expression} for {x} in {v}] if {v}.__class__ is list else {v})'
+
+        if not isinstance(_type, type): return v
+
+        T = self.Name(_type, 'T')
+        if issubclass(_type, Enum): return f'({v}.value if {v}.__class__ is {T} else {v})'
+
+        if _type in (datetime, time): return f'({v}.isoformat() if {v}.__class__ is {T} else {v})'
+
+        if _type is timedelta: return f'({v}.total_seconds() if {v}.__class__ is {T} else {v})'
+
+        if issubclass(_type, BaseSchemaModel): return f'({v}._ToJsonDict() if {v}.__class__ is {T} else {v})'
+
+        return v
+
+
+    def Source(self) -> str:
+        fields = self.fields.values()
+        lines = []
+
+        parameters = ', '.join(field.Name if field.Required else f'{field.Name}={self.Name(field.Default, "default")}' for field in fields)
+        lines.append(f'def __init__(self{", *, " if parameters else ""}{parameters}):')
+        lines.extend(f'    self.{field.Name} = {field.Name}' for field in fields)
+        lines.append('    pass')
+
+        lines.append('def Parse(cls, d):')
+        lines.append('    if not isinstance(d, dict): throw(d, dict)')
+        lines.append('    self = _new(cls)')
+        for field in fields:
+            value = f"d['{field.Name}']" if field.Required else f"d.get('{field.Name}', {self.Name(field.Default, 'default')})"
+            expression = self.ParseExpression(field.Type, 'v')
+            if expression == 'v': lines.append(f'    self.{field.Name} = {value}')
+            else: lines.extend((f'    v = {value}', f'    self.{field.Name} = {expression}'))
+        lines.append('    return self')
+
+        # field values are bound to v0, v1, ... so field names can not shadow the helpers in the namespace.
+        for name, expression in (('ToDict', self.DictExpression), ('_ToJsonDict', self.JsonExpression)):
+            lines.append(f'def {name}(self):')
+            items = []
+            for i, field in enumerate(fields):
+                v = f'v{i}'
+                result = expression(field.Type, v)
+                if result == v: items.append(f"'{field.Name}': self.{field.Name}")
+                else:
+                    lines.append(f'    {v} = self.{field.Name}')
+                    items.append(f"'{field.Name}': {result}")
+            lines.append(f'    return {{{", ".join(items)}}}')
+
+        lines.append('def _Values(self):')
+        lines.append(f'    return ({"".join(f"self.{field.Name}, " for field in fields)})')
+
+        lines.append('def __deepcopy__(self, memo):')
+        lines.append('    result = _new(self.__class__)')
+        lines.extend(f'    result.{field.Name} = _fast_copy(self.{field.Name}, memo)' for field in fields)
+        lines.append('    return result')
+
+        return '\n'.join(lines)
+
+    def Generate(self) -> Dict[str, Callable]:
+        local: Dict[str, Any] = { }
+        exec(self.Source(), self.namespace, local)
+        local['Parse'] = classmethod(local['Parse'])
+        for function in local.values():
+            function = getattr(function, '__func__', function)
+            function.__qualname__ = f'{self.cls.__qualname__}.{function.__name__}'
+            function.__module__ = self.cls.__module__
+
+        return local
+
+
+
+class _SchemaMeta(type):
+    def __new__(mcs, name: str, bases: Tuple[Type, ...], namespace: Dict[str, Any], **kwargs):
+        fields: Dict[str, SchemaField] = { }
+        for base in reversed(bases):
+            fields.update(getattr(base, '__schema__', { }))
+
+        own = [key for key, annotation in namespace.get('__annotations__', { }).items() if not _IsClassVar(annotation)]
+        defaults = { key: namespace.pop(key) for key in own if key in namespace }
+        namespace['__slots__'] = tuple(key for key in own if key not in fields)
+
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+
+        try:
+            hints = get_type_hints(cls, localns={ name: cls })
+        except (NameError, TypeError):
+            # unresolvable forward references: those fields are converted with the generic runtime rules.
+            hints = { key: value for key, value in namespace.get('__annotations__', { }).items() if not isinstance(value, str) }
+
+        for key in own:
+            fields[key] = SchemaField(key, hints.get(key, Any), defaults.get(key, _MISSING))
+
+        cls.__schema__ = fields
+        for key, function in _Generator(cls, fields).Generate().items():
+            if key not in namespace: setattr(cls, key, function)
+
+        return cls
+
+def _IsClassVar(annotation: Any) -> bool:
+    if isinstance(annotation, str): return annotation.startswith(('ClassVar', 'typing.ClassVar'))
+    return annotation is ClassVar or get_origin(annotation) is ClassVar
+
+
+
+class BaseSchemaModel(BaseObjectModel, metaclass=_SchemaMeta):
+    """
+        Declarative, slotted model. Fields are declared once as annotations, optionally with a default:
+
+            class Record(BaseSchemaModel):
+                id: int
+                status: Status
+                created: datetime
+                duration: Optional[timedelta] = None
+                children: List['Record'] = None
+
+        At class creation the fields become __slots__, and __init__ (keyword only), Parse, ToDict and ToJsonString are generated
+        for the declared types, using the same Enum / datetime / time / timedelta / nested model conversions as BaseObjectModel._serialize.
+        Instances carry no per instance dict, and ToDict / ToJsonString produce the same output as a BaseDictModel holding the same items.
+
+        Parse ignores unknown keys and raises KeyError for missing fields without a default. Defaults are shared, so use None for mutable ones.
+    """
+    __slots__ = ()
+    __schema__: ClassVar[Dict[str, SchemaField]]
+
+
+    def ToDict(self) -> Dict[str, Any]: raise NotImplementedError()
+    def _ToJsonDict(self) -> Dict[str, Any]: raise NotImplementedError()
+    def _Values(self) -> Tuple: raise NotImplementedError()
+
+    def ToJsonString(self, indent: int = 4, *, backend: Union[str, JsonBackend] = None) -> str:
+        return JsonBackends.Get(backend).dumps(self._ToJsonDict(), indent=indent, default=self._serialize)
+    def IterJsonChunks(self, indent: int = 4) -> Iterator[str]:
+        return JSONEncoder(indent=indent, default=self._serialize).iterencode(self._ToJsonDict())
+
+
+    def __iter__(self) -> Iterator[str]: return iter(self.__schema__)
+    def __len__(self) -> int: return len(self.__schema__)
+    def __eq__(self, other): return other.__class__ is self.__class__ and other._Values() == self._Values()
+    __hash__ = None
+    def __repr__(self): return f'{self.__class__.__name__}({", ".join(f"{key}={value!r}" for key, value in zip(self.__schema__, self._Values()))})'
+
+    def enumerate(self) -> Iterable[Tuple[int, str]]: return enumerate(self)
+    def Filter(self, func: callable) -> List[Any]: return list(filter(func, self._Values()))
+
+
+    @classmethod
+    def Parse(cls, d: Dict[str, Any]): raise NotImplementedError()
+
+    @classmethod
+    def FromJson(cls, string: Union[str, bytes, bytearray], *, backend: Union[str, JsonBackend] = None, intern: Union[bool, InternPool] = False, **kwargs):
+        return cls.Parse(cls._loads(string, backend, intern, kwargs))
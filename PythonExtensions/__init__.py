@@ -4,6 +4,8 @@
 # ------------------------------------------------------------------------------
 
 
+# noinspection PyUnresolvedReferences
+from .BinaryFormat import *
 # noinspection PyUnresolvedReferences
 from .Constants import *
 # noinspection PyUnresolvedReferences
@@ -17,6 +19,10 @@ from .HID_BUFFER import *
 # noinspection PyUnresolvedReferences
 from .Json import *
 # noinspection PyUnresolvedReferences
+from .JsonBackends import *
+# noinspection PyUnresolvedReferences
+from .JsonPatch import *
+# noinspection PyUnresolvedReferences
 from .Logging import *
 # noinspection PyUnresolvedReferences
 from .Models import *
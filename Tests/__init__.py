@@ -5,6 +5,10 @@
 # ------------------------------------------------------------------------------
 
 from .SwitchCase import *
+from .test_dates import *
+from .test_files import *
+from .test_json import *
+from .test_models import *
 from .test_tk import *
 from .tests import *
 
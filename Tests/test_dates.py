@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime, time, timedelta
+
+from dateutil import parser
+
+from PythonExtensions.Dates import DateTimeParser
+from PythonExtensions.Json import BaseObjectModel
+
+
+
+
+__all__ = [
+    'DateTimeParser_TestCase',
+    'BulkConvert_TestCase',
+    ]
+
+class DateTimeParser_TestCase(unittest.TestCase):
+    values = [
+        '01/02/2021 10:30:00', '13/02/2021 10:30:00', '02/13/2021 10:30:00', '05/06/2021 23:59:59',
+        'Jan 5 2021 10:30 PM', 'Feb 15, 2021', '5 Mar 2021', '2021/03/04', '20210304',
+        'Tue, 02 Mar 2021 10:00:00 +0000', '03/04/21',
+        ]
+
+    def setUp(self):
+        self.parser = DateTimeParser(maxsize=128)
+
+    def test_matches_dateutil(self):
+        for _ in range(2):
+            for value in self.values:
+                with self.subTest(value=value):
+                    self.assertEqual(self.parser.ParseDateTime(value), parser.parse(value))
+                    # fromisoformat still runs first, so basic iso strings such as '20210304' keep the legacy time.fromisoformat meaning
+                    if value != '20210304': self.assertEqual(self.parser.ParseTime(value), parser.parse(value).time())
+
+            self.parser = DateTimeParser(maxsize=0)
+
+    def test_learned_formats(self):
+        self.parser.ParseDateTime('01/02/2021 10:30:00')
+        self.assertEqual(self.parser.Statistics['dateutil'], 1)
+        self.assertEqual(self.parser.Statistics['formats'], 1)
+
+        self.assertEqual(self.parser.ParseDateTime('12/31/1999 08:00:01'), datetime(1999, 12, 31, 8, 0, 1))
+        self.assertEqual(self.parser.Statistics['learned'], 1)
+        self.assertEqual(self.parser.Statistics['dateutil'], 1)
+
+        # day first values of the same shape are learned as a second format; month first values keep their meaning.
+        self.assertEqual(self.parser.ParseDateTime('31/12/1999 08:00:01'), datetime(1999, 12, 31, 8, 0, 1))
+        self.assertEqual(self.parser.ParseDateTime('03/04/1999 08:00:01'), datetime(1999, 3, 4, 8, 0, 1))
+        self.assertEqual(self.parser.Statistics['formats'], 2)
+
+    def test_two_digit_years(self):
+        # dateutil puts two digit years within 50 years of now, strptime puts 69-99 in the 1900s: they disagree on the years just under now + 50.
+        years = [f'{year % 100:02d}' for year in (datetime.now().year + 49, datetime.now().year - 50, 21, 69, 99, 0)]
+        for first in years:
+            self.parser = DateTimeParser(maxsize=0)
+            for year in (first, *years):  # the first value is parsed by dateutil (and learned), the next ones by the learned format
+                with self.subTest(first=first, year=year):
+                    value = f'03/04/{year} 10:30'
+                    self.assertEqual(self.parser.ParseDateTime(value), parser.parse(value))
+                    self.assertEqual(self.parser.ParseDateTimes([value]), [parser.parse(value)])
+
+            self.assertEqual(self.parser.Statistics['dateutil'], 1)
+
+    def test_cache(self):
+        for _ in range(3): self.parser.ParseDateTime('2021-01-02T03:04:05')
+        statistics = self.parser.Statistics
+        self.assertEqual((statistics['hits'], statistics['misses'], statistics['iso']), (2, 1, 1))
+
+        self.parser.Clear()
+        self.assertEqual(self.parser.Statistics['size'], 0)
+
+    def test_convert(self):
+        self.assertIsNone(BaseObjectModel.convert_date_time('None', parser=self.parser))
+        self.assertEqual(BaseObjectModel.convert_time('10:30 PM', parser=self.parser), time(22, 30))
+        self.assertEqual(BaseObjectModel.convert_time_delta('1hr2m3s', parser=self.parser), timedelta(hours=1, minutes=2, seconds=3))
+        self.assertEqual(BaseObjectModel.convert_time_delta('90', parser=self.parser), timedelta(seconds=90))
+        self.assertEqual(self.parser.Statistics['misses'], 4)
+
+
+
+class BulkConvert_TestCase(unittest.TestCase):
+    date_times = ['01/02/2021 10:30:00', '12/31/2021 23:59:59', 'None', '13/02/2021 10:30:00', '2021-01-02T03:04:05', 'Feb 15, 2021', '02/03/2021 01:00:00']
+    times = ['10:30 PM', '11:45 AM', 'None', '23:15', '01:02:03']
+    time_deltas = ['1hr2m3s', '90', 'None', '5m', '', '12s', ' 7 ', '2hr', '3m4sx']
+
+    def setUp(self):
+        self.parser = DateTimeParser()
+
+    def test_date_times(self):
+        for values in (self.date_times, self.date_times[::-1], ['2021-01-02'] * 3, ['None'] * 2, []):
+            with self.subTest(values=values):
+                self.assertEqual(self.parser.ParseDateTimes(values), [DateTimeParser().ParseDateTime(v) for v in values])
+
+    def test_times(self):
+        for values in (self.times, self.times[::-1]):
+            self.assertEqual(self.parser.ParseTimes(values), [DateTimeParser().ParseTime(v) for v in values])
+
+    def test_time_deltas(self):
+        for values in (self.time_deltas, ['1', '2', '30'], ['1hr', '2m', '3s', '1hr2m3s'], ['a\nb', '1hr']):
+            with self.subTest(values=values):
+                self.assertEqual(self.parser.ParseTimeDeltas(values), [DateTimeParser().ParseTimeDelta(v) for v in values])
+
+    def test_convert(self):
+        expected = [timedelta(seconds=5), timedelta(hours=1), None, timedelta(minutes=1)]
+        self.assertEqual(BaseObjectModel.convert_time_deltas([5, '1hr', 'None', timedelta(minutes=1)], parser=self.parser), expected)
+        self.assertEqual(BaseObjectModel.convert_time_deltas([1.5, 0.25, -2.5]), [timedelta(seconds=1, milliseconds=500), timedelta(milliseconds=250), timedelta(seconds=-2.5)])
+        self.assertEqual(BaseObjectModel.convert_date_times(iter(self.date_times)), [BaseObjectModel.convert_date_time(v) for v in self.date_times])
+        self.assertEqual(BaseObjectModel.convert_times([1, '10:30 PM']), [time(hour=1), time(22, 30)])
+
+    def test_processes(self):
+        values = self.date_times * 10
+        self.assertEqual(self.parser.ParseDateTimes(values, processes=2, chunk_size=8), self.parser.ParseDateTimes(values))
+        self.assertEqual(BaseObjectModel.convert_time_deltas(self.time_deltas * 10, processes=2, chunk_size=8), self.parser.ParseTimeDeltas(self.time_deltas * 10))
+
+    def test_process_state(self):
+        # the workers parse with this parser's configuration, and what they learn comes back to it.
+        self.parser = DateTimeParser(maxsize=0)
+        default = DateTimeParser.Default.Statistics
+        self.assertEqual(self.parser.ParseDateTimes(self.date_times * 10, processes=2, chunk_size=8), [DateTimeParser().ParseDateTime(v) for v in self.date_times * 10])
+
+        statistics = self.parser.Statistics
+        self.assertEqual((statistics['hits'], statistics['size']), (0, 0))
+        self.assertGreater(statistics['misses'], 8)  # the first chunk of 8 values is parsed in this process, the rest are counted by the workers
+        self.assertGreater(statistics['formats'], 0)
+        self.assertGreater(statistics['dateutil'], 0)
+        self.assertEqual(DateTimeParser.Default.Statistics, default)
+
+        self.assertEqual(self.parser.ParseDateTime('12/30/1999 08:00:01'), datetime(1999, 12, 30, 8, 0, 1))
+        self.assertEqual(self.parser.Statistics['dateutil'], statistics['dateutil'])
+        self.assertEqual(self.parser.Statistics['learned'], statistics['learned'] + 1)
@@ -0,0 +1,470 @@
+import asyncio
+import base64
+import gc
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import *
+from unittest import mock
+
+from PythonExtensions.Exceptions import CopyError
+from PythonExtensions.Files import FileIO, FilePath
+from PythonExtensions.Files.Hashing import *
+from PythonExtensions.Files.MultiThreadedCopier import *
+from PythonExtensions.Files.Sync import *
+
+
+
+
+__all__ = [
+    'Hashing_TestCase',
+    'HashIndex_TestCase',
+    'Copier_TestCase',
+    'Sync_TestCase',
+    'CopyAsync_TestCase',
+    'StreamingRead_TestCase',
+    ]
+
+def _HashTree(database: str, tree: str) -> Dict[str, str]:
+    with HashIndex(database) as index: return index.HashDirectory(tree)
+
+def _digest(algorithm: str, data: bytes) -> str: return base64.urlsafe_b64encode(hashlib.new(algorithm, data).digest()).decode()
+
+
+
+class Hashing_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.data = os.urandom(300_000)
+        self.path = self.Write('data.bin', self.data)
+
+    def tearDown(self): self._root.cleanup()
+
+    def Write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f: f.write(data)
+        return path
+
+    def test_full(self):
+        for algorithm in ('sha1', 'sha256', 'blake2b'):
+            expected = _digest(algorithm, self.data)
+            self.assertEqual(HashFile(self.path, algorithm), expected)
+            self.assertEqual(HashFile(self.path, algorithm, block_size=4096), expected)
+            self.assertEqual(HashFile(self.path, algorithm, block_size=5000, memory_map=False), expected)
+
+        empty = self.Write('empty.bin', b'')
+        self.assertEqual(HashFile(empty), _digest('sha1', b''))
+        self.assertEqual(HashFile(empty, memory_map=False), _digest('sha1', b''))
+
+    def test_partial(self):
+        quick = HashFile(self.path, partial=1024)
+        self.assertNotEqual(quick, HashFile(self.path))
+
+        middle = bytearray(self.data)
+        middle[150_000] ^= 0xFF
+        self.assertEqual(HashFile(self.Write('middle.bin', middle), partial=1024), quick)  # only the ends and the size are hashed
+
+        end = bytearray(self.data)
+        end[-1] ^= 0xFF
+        self.assertNotEqual(HashFile(self.Write('end.bin', end), partial=1024), quick)
+        self.assertNotEqual(HashFile(self.Write('longer.bin', self.data + b'\0'), partial=1024), quick)
+
+        small = self.Write('small.bin', b'abc')
+        self.assertEqual(HashFile(small, partial=1024), _digest('sha1', (3).to_bytes(8, 'little') + b'abc'))
+
+    def test_algorithms(self):
+        self.assertIn('fast', HashAlgorithms())
+        self.assertEqual(HashFile(self.path, 'fast'), HashFile(self.path, 'fast', memory_map=False))
+        with self.assertRaises(ValueError): NewHasher('unknown')
+        with self.assertRaises(ValueError): NewHasher('xxh_unknown')
+
+    def test_get_hash_id(self):
+        path = FilePath(self.path)
+        self.assertEqual(path.GetHashID(), _digest('sha1', self.data))
+        self.assertEqual(path.Hash, _digest('sha1', self.data))
+        self.assertEqual(path.GetHashID(algorithm='sha256'), _digest('sha256', self.data))
+        self.assertEqual(path.GetHashID(partial=10), HashFile(self.path, partial=10))
+        self.assertEqual(path.Hash, _digest('sha1', self.data))
+        with self.assertRaises(IsADirectoryError): FilePath(self.root).GetHashID()
+
+        # caching the digest does not change the identity of the path
+        path = FilePath(self.path)
+        paths = { path }
+        path.GetHashID()
+        self.assertIn(path, paths)
+        self.assertIn(FilePath(self.path), paths)
+        self.assertEqual(path, FilePath(self.path))
+        self.assertEqual(hash(path), hash(FilePath(self.path)))
+
+
+
+class HashIndex_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.tree = os.path.join(self.root, 'tree')
+        for i, folder in enumerate(('', 'a', os.path.join('a', 'b'))):
+            os.makedirs(os.path.join(self.tree, folder), exist_ok=True)
+            for j in range(3): self.Write(os.path.join(folder, f'{j}.bin'), os.urandom(1000 + i * 10 + j))
+
+        self.index = HashIndex(os.path.join(self.root, 'hashes.db'))
+
+    def tearDown(self):
+        self.index.Close()
+        self._root.cleanup()
+
+    def Write(self, name: str, data: bytes, age: float = 60) -> str:
+        path = os.path.join(self.tree, name)
+        with open(path, 'wb') as f: f.write(data)
+        os.utime(path, (os.path.getatime(path) - age, os.path.getmtime(path) - age))  # older than the racy window
+        return path
+
+    def test_hash(self):
+        path = os.path.join(self.tree, '0.bin')
+        digest = self.index.Hash(path)
+        self.assertEqual(digest, HashFile(path))
+        self.assertEqual(self.index.Lookup(path), digest)
+        self.assertIsNone(self.index.Lookup(path, 'sha256'))
+        self.assertEqual(self.index.Hash(path, partial=100), HashFile(path, partial=100))
+        self.assertEqual(len(self.index), 2)
+
+        self.Write('0.bin', b'changed', age=30)
+        self.assertIsNone(self.index.Lookup(path))
+        self.assertEqual(self.index.Hash(path), HashFile(path))
+
+        self.Write('0.bin', b'recent', age=0)
+        self.assertEqual(self.index.Hash(path), HashFile(path))
+        self.assertIsNone(self.index.Lookup(path))  # racily recent: not stored
+
+    def test_directory(self):
+        expected = { os.path.join(folder, name): HashFile(os.path.join(folder, name)) for folder, _, names in os.walk(self.tree) for name in names }
+        self.assertEqual(self.index.HashDirectory(self.tree, workers=2), expected)
+        self.assertEqual(len(self.index), 9)
+
+        changed = self.Write(os.path.join('a', '0.bin'), b'changed', age=30)
+        expected[changed] = HashFile(changed)
+        self.assertEqual(self.index.HashDirectory(self.tree), expected)
+        self.assertEqual(len(self.index.HashDirectory(self.tree, recursive=False)), 3)
+
+        os.remove(changed)
+        self.assertEqual(self.index.Prune(), 1)
+        self.assertEqual(len(self.index), 8)
+
+    def test_shared(self):
+        path = os.path.join(self.tree, '1.bin')
+        digest = self.index.Hash(path)
+        with HashIndex(self.index.path) as other:
+            self.assertEqual(other.Lookup(path), digest)
+
+        previous = HashIndex.Default
+        try:
+            HashIndex.SetDefault(self.index.path)
+            self.assertEqual(FilePath(path).GetHashID(algorithm='sha256'), HashFile(path, 'sha256'))
+            self.assertEqual(HashIndex.Default.Lookup(path, 'sha256'), HashFile(path, 'sha256'))
+            HashIndex.Default.Close()
+        finally:
+            HashIndex.SetDefault(previous)
+
+    def test_threads(self):
+        path = os.path.join(self.tree, '2.bin')
+        digest = self.index.Hash(path)
+        with ThreadPoolExecutor(4) as pool: self.assertEqual(list(pool.map(self.index.Lookup, [path] * 100)), [digest] * 100)
+
+        gc.collect()
+        self.assertEqual(len(self.index._connections), 1)  # the connections of the pool threads are closed with them
+        self.assertEqual(self.index.Lookup(path), digest)
+
+    def test_processes(self):
+        expected = self.index.HashDirectory(self.tree)
+        self.index.Close()
+        os.remove(self.index.path)
+        self.index = HashIndex(self.index.path)
+
+        with ProcessPoolExecutor(3) as pool:
+            for result in pool.map(_HashTree, [self.index.path] * 6, [self.tree] * 6): self.assertEqual(result, expected)
+
+        self.assertEqual(len(self.index), 9)
+
+
+
+
+class Copier_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.source = os.path.join(self.root, 'source')
+        self.files = { }
+        for i, folder in enumerate(('', 'a', os.path.join('a', 'b'), 'c')):
+            os.makedirs(os.path.join(self.source, folder), exist_ok=True)
+            for j in range(4): self.files[os.path.join(folder, f'{j}.bin')] = os.urandom(i * 1000 + j * 70_000)
+
+        for name, data in self.files.items():
+            with open(os.path.join(self.source, name), 'wb') as f: f.write(data)
+
+    def tearDown(self): self._root.cleanup()
+
+    def AssertCopied(self, destination: str):
+        copied = { os.path.relpath(os.path.join(folder, name), destination) for folder, _, names in os.walk(destination) for name in names }
+        self.assertEqual(copied, set(self.files))
+        for name, data in self.files.items():
+            with open(os.path.join(destination, name), 'rb') as f: self.assertEqual(f.read(), data, name)
+
+    def test_copy_file(self):
+        source = os.path.join(self.source, 'a', '3.bin')
+        destination = os.path.join(self.root, 'copy.bin')
+        os.utime(source, (1_600_000_000, 1_600_000_000))
+        self.assertEqual(CopyFile(source, destination), os.path.getsize(source))
+        self.assertEqual(os.path.getmtime(destination), 1_600_000_000)
+
+        with mock.patch.object(sys.modules[CopyFile.__module__], '_kernel_copies', ()):  # the buffered fallback
+            self.assertEqual(CopyFile(source, destination, buffer_size=4096, metadata=False), os.path.getsize(source))
+        self.assertNotEqual(os.path.getmtime(destination), 1_600_000_000)
+
+        with open(source, 'rb') as a, open(destination, 'rb') as b: self.assertEqual(a.read(), b.read())
+
+    def test_tree(self):
+        reports = []
+        with MultiThreadedCopier(3, queue_size=2, progress=lambda progress: reports.append(progress.ToDict()), interval=0) as copier:
+            copier.CopyTree(self.source, os.path.join(self.root, 'tree'))
+
+        self.AssertCopied(os.path.join(self.root, 'tree'))
+        progress = copier.Progress
+        self.assertEqual((progress.submitted, progress.files, progress.failed, progress.Pending), (16, 16, 0, 0))
+        self.assertEqual(progress.bytes, sum(map(len, self.files.values())))
+        self.assertEqual(reports[-1]['files'], 16)
+        self.assertFalse(copier.Running)
+
+        with MultiThreadedCopier(2) as copier: shutil.copytree(self.source, os.path.join(self.root, 'copytree'), copy_function=copier.copy)
+        self.AssertCopied(os.path.join(self.root, 'copytree'))
+
+        with self.assertRaises(FileExistsError): copier.CopyTree(self.source, os.path.join(self.root, 'tree'))
+        copier.CopyTree(self.source, os.path.join(self.root, 'tree'), dirs_exist_ok=True, ignore=shutil.ignore_patterns('b'))
+        self.assertEqual(copier.Join().files, 12)
+
+    def test_errors(self):
+        copier = MultiThreadedCopier(2)
+        missing = os.path.join(self.source, 'missing.bin')
+        copier.Copy(missing, os.path.join(self.root, 'missing.bin'))
+        copier.Copy(os.path.join(self.source, '1.bin'), os.path.join(self.root, 'no such folder', '1.bin'))
+        copier.CopyTree(self.source, os.path.join(self.root, 'tree'))
+        with self.assertRaises(CopyError) as context: copier.Join()
+
+        self.assertEqual(set(context.exception.errors), { missing, os.path.join(self.source, '1.bin') })
+        self.assertIsInstance(context.exception.errors[missing], FileNotFoundError)
+        self.assertEqual((copier.Progress.files, copier.Progress.failed), (16, 2))
+        self.AssertCopied(os.path.join(self.root, 'tree'))
+
+
+
+class Sync_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.source = os.path.join(self.root, 'source')
+        self.destination = os.path.join(self.root, 'destination')
+        for folder in ('', 'a', os.path.join('a', 'b'), 'c'):
+            os.makedirs(os.path.join(self.source, folder), exist_ok=True)
+            for j in range(3): self.Write(os.path.join(folder, f'{j}.bin'), os.urandom(100 + j))
+
+    def tearDown(self): self._root.cleanup()
+
+    def Write(self, name: str, data: bytes, root: str = None) -> str:
+        path = os.path.join(root or self.source, name)
+        with open(path, 'wb') as f: f.write(data)
+        return path
+
+    def Tree(self, root: str) -> Dict[str, bytes]:
+        result = { }
+        for folder, _, names in os.walk(root):
+            for name in names:
+                with open(os.path.join(folder, name), 'rb') as f: result[os.path.relpath(os.path.join(folder, name), root)] = f.read()
+        return result
+
+    def test_sync(self):
+        report = FilePath(self.source).SyncTo(self.destination, workers=2)
+        self.assertEqual((len(report.created), len(report.directories), report.unchanged, report.errors), (12, 4, 0, { }))
+        self.assertEqual(self.Tree(self.destination), self.Tree(self.source))
+
+        report = SyncDirectory(self.source, self.destination)
+        self.assertFalse(report.Changed)
+        self.assertEqual(report.unchanged, 12)
+
+        self.Write(os.path.join('a', '0.bin'), b'changed')
+        self.Write(os.path.join('c', 'new.bin'), b'new')
+        self.Write('extra.bin', b'extra', self.destination)
+        os.makedirs(os.path.join(self.destination, 'extra', 'folder'))
+        report = SyncDirectory(self.source, self.destination)
+        self.assertEqual((report.created, report.updated, report.deleted), ([os.path.join('c', 'new.bin')], [os.path.join('a', '0.bin')], []))
+        self.assertTrue(os.path.exists(os.path.join(self.destination, 'extra.bin')))
+
+        report = SyncDirectory(self.source, self.destination, delete=True)
+        self.assertEqual(sorted(report.deleted), ['extra', 'extra.bin'])
+        self.assertEqual(self.Tree(self.destination), self.Tree(self.source))
+        self.assertEqual(set(os.listdir(self.destination)), set(os.listdir(self.source)))
+
+    def test_dry_run(self):
+        report = SyncDirectory(self.source, self.destination, dry_run=True)
+        self.assertEqual((len(report.created), len(report.directories), report.bytes), (12, 4, 4 * (100 + 101 + 102)))
+        self.assertFalse(os.path.exists(self.destination))
+
+        SyncDirectory(self.source, self.destination)
+        os.remove(os.path.join(self.source, 'c', '1.bin'))
+        shutil.rmtree(os.path.join(self.destination, 'a', 'b'))
+        self.Write(os.path.join('a', 'b'), b'a file where the source has a folder', self.destination)
+        before = self.Tree(self.destination)
+
+        report = SyncDirectory(self.source, self.destination, delete=True, dry_run=True)
+        self.assertTrue(report.dry_run)
+        self.assertEqual(sorted(report.deleted), [os.path.join('a', 'b'), os.path.join('c', '1.bin')])
+        self.assertEqual(sorted(report.created), [os.path.join('a', 'b', f'{j}.bin') for j in range(3)])
+        self.assertEqual(report.directories, [os.path.join('a', 'b')])
+        self.assertEqual(self.Tree(self.destination), before)
+
+        self.assertEqual(SyncDirectory(self.source, self.destination).errors, { })  # the conflicting file is replaced even without delete
+        self.assertEqual({ name: data for name, data in self.Tree(self.destination).items() if name != os.path.join('c', '1.bin') }, self.Tree(self.source))
+
+    def test_checksum(self):
+        SyncDirectory(self.source, self.destination)
+        path = os.path.join(self.source, '1.bin')
+        os.utime(path, (1_600_000_000, 1_600_000_000))
+
+        report = SyncDirectory(self.source, self.destination, checksum=True, index=False, dry_run=True)
+        self.assertEqual((report.confirmed, report.updated), (['1.bin'], []))
+
+        report = SyncDirectory(self.source, self.destination, checksum=True, index=False)
+        self.assertEqual((report.confirmed, report.updated), (['1.bin'], []))
+        self.assertEqual(os.path.getmtime(os.path.join(self.destination, '1.bin')), 1_600_000_000)
+        self.assertFalse(SyncDirectory(self.source, self.destination).Changed)
+
+        os.utime(path, (1_500_000_000, 1_500_000_000))
+        self.assertEqual(SyncDirectory(self.source, self.destination).updated, ['1.bin'])
+
+
+
+class CopyAsync_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.data = [os.urandom(size) for size in (0, 1000, 300_000, 2_000_000)]
+        self.sources = []
+        for i, data in enumerate(self.data):
+            path = os.path.join(self.root, f'{i}.bin')
+            with open(path, 'wb') as f: f.write(data)
+            self.sources.append(path)
+
+    def tearDown(self): self._root.cleanup()
+
+    def Read(self, path: str) -> bytes:
+        with open(path, 'rb') as f: return f.read()
+
+    def Partial(self) -> List[str]: return [name for name in os.listdir(self.root) if name.endswith('.partial')]
+
+    def test_copy(self):
+        reports = []
+        destination = os.path.join(self.root, 'copy.bin')
+        os.chmod(self.sources[3], 0o640)
+        size = asyncio.run(FileIO(FilePath(self.sources[3])).CopyToAsync(destination, buffer_size=65536, progress=lambda copied, total: reports.append((copied, total))))
+        self.assertEqual(size, len(self.data[3]))
+        self.assertEqual(self.Read(destination), self.data[3])
+        self.assertEqual(os.stat(destination).st_mode & 0o777, 0o640)
+        self.assertEqual(len(reports), -(-len(self.data[3]) // 65536))
+        self.assertEqual(reports[-1], (len(self.data[3]), len(self.data[3])))
+
+        asyncio.run(FileIO(FilePath(self.sources[0])).CopyToAsync(destination))
+        self.assertEqual(self.Read(destination), b'')
+        self.assertEqual(self.Partial(), [])
+
+    def test_many(self):
+        reports = []
+        pairs = [(source, os.path.join(self.root, f'copy {i}.bin')) for i, source in enumerate(self.sources)]
+        sizes = asyncio.run(FileIO.CopyManyAsync(pairs, concurrency=2, buffer_size=65536, metadata=True, progress=lambda progress: reports.append(progress.ToDict())))
+        self.assertEqual(sizes, list(map(len, self.data)))
+        for (source, destination), data in zip(pairs, self.data):
+            self.assertEqual(self.Read(destination), data)
+            self.assertEqual(os.stat(destination).st_mtime_ns, os.stat(source).st_mtime_ns)
+
+        self.assertEqual((reports[-1]['bytes'], reports[-1]['submitted']), (sum(map(len, self.data)), 4))
+
+        pairs.append((os.path.join(self.root, 'missing.bin'), os.path.join(self.root, 'copy missing.bin')))
+        results = asyncio.run(FileIO.CopyManyAsync(pairs, return_exceptions=True))
+        self.assertIsInstance(results[-1], FileNotFoundError)
+        with self.assertRaises(FileNotFoundError): asyncio.run(FileIO.CopyManyAsync(pairs))
+        self.assertEqual(self.Partial(), [])
+
+    def test_cancel(self):
+        destination = os.path.join(self.root, 'copy.bin')
+        with open(destination, 'wb') as f: f.write(b'previous')
+
+        async def run():
+            started = asyncio.Event()
+            task = asyncio.ensure_future(FileIO.CopyManyAsync([(self.sources[3], destination), (self.sources[2], os.path.join(self.root, 'other.bin'))],
+                                                              buffer_size=4096, progress=lambda progress: started.set()))
+            await started.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError): await task
+
+        asyncio.run(run())
+        self.assertEqual(self.Read(destination), b'previous')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'other.bin')))
+        self.assertEqual(self.Partial(), [])
+
+
+
+class StreamingRead_TestCase(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.TemporaryDirectory()
+        self.root = self._root.name
+        self.text = ''.join(f'line {i} é {"x" * (i % 50)}' + ('\r\n' if i % 3 else '\n') for i in range(2000)) + 'last line, no newline'
+        self.file = self.Create('text.txt', self.text.encode())
+
+    def tearDown(self): self._root.cleanup()
+
+    def Create(self, name: str, data: bytes) -> FileIO:
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f: f.write(data)
+        return FileIO(FilePath(path))
+
+    def Collect(self, iterator: AsyncIterator) -> List:
+        async def run(): return [bytes(item) if isinstance(item, memoryview) else item async for item in iterator]
+        return asyncio.run(run())
+
+    def test_chunks(self):
+        data = self.text.encode()
+        chunks = [bytes(chunk) for chunk in self.file.IterChunks(1000)]
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(set(map(len, chunks[:-1])), { 1000 })
+        self.assertEqual(self.Collect(self.file.IterChunksAsync(1000)), chunks)
+        self.assertEqual(list(self.Create('empty.bin', b'').IterChunks()), [])
+
+    def test_lines(self):
+        with open(self.file, 'r', encoding='utf-8', newline=None) as f: expected = f.read().split('\n')
+        for size in (1, 7, 4096, 1 << 20):  # chunks that split the '\r\n' pairs and the two bytes of 'é'
+            self.assertEqual(list(self.file.IterLines(buffer_size=size)), expected)
+
+        with open(self.file, 'r', encoding='utf-8', newline=None) as f: self.assertEqual(list(self.file.IterLines(keepends=True, buffer_size=100)), list(f))
+        self.assertEqual(self.Collect(self.file.IterLinesAsync(buffer_size=100)), expected)
+
+        utf16 = self.Create('utf16.txt', 'a\nbé\r\n\nc\n'.encode('utf-16'))
+        self.assertEqual(list(utf16.IterLines(encoding='utf-16', buffer_size=3)), ['a', 'bé', '', 'c'])
+
+    def test_records(self):
+        records = [os.urandom(i % 300).replace(b'\x1e\x00', b'') for i in range(1000)]
+        data = b'\x1e\x00'.join(records)
+        file = self.Create('records.bin', data)
+        for size in (1, 5, 4096):
+            self.assertEqual(list(file.IterRecords(b'\x1e\x00', buffer_size=size)), data.split(b'\x1e\x00') if records[-1] else data.split(b'\x1e\x00')[:-1])
+
+        self.assertEqual(list(file.IterRecords(b'\x1e\x00', keep_delimiter=True, buffer_size=64))[:2], [records[0] + b'\x1e\x00', records[1] + b'\x1e\x00'])
+
+        # a delimiter split over more chunks than two
+        spread = self.Create('spread.bin', b'xabcyabcabcz' + b'ab' * 10 + b'abcd')
+        for size in (1, 2, 3):
+            self.assertEqual(list(spread.IterRecords(b'abc', buffer_size=size)), [b'x', b'y', b'', b'z' + b'ab' * 10, b'd'])
+        self.assertEqual(self.Collect(self.file.IterRecordsAsync(b'\r\n', buffer_size=10)), list(self.file.IterRecords(b'\r\n')))
+        self.assertEqual(list(self.Create('single.bin', b'no delimiter' * 100).IterRecords(buffer_size=7)), [b'no delimiter' * 100])
+        with self.assertRaises(ValueError): list(self.file.IterRecords(b''))
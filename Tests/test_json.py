@@ -0,0 +1,699 @@
+import copy as _copy
+import asyncio
+import io
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta, timezone
+from enum import Enum
+from zoneinfo import ZoneInfo
+
+from dateutil import tz
+
+from PythonExtensions.BinaryFormat import *
+from PythonExtensions.Dates import DateTimeParser
+from PythonExtensions.Files import FilePath
+from PythonExtensions.Exceptions import BinaryFormatError, JsonPatchError
+from PythonExtensions.Json import *
+from PythonExtensions.JsonBackends import *
+from PythonExtensions.JsonPatch import *
+from PythonExtensions.Misc import get_size
+
+
+
+
+__all__ = [
+    'JsonSerializers_TestCase',
+    'JsonStream_TestCase',
+    'JsonArrayStream_TestCase',
+    'JsonBackends_TestCase',
+    'Clone_TestCase',
+    'BinaryFormat_TestCase',
+    'ListIndex_TestCase',
+    'JsonPatch_TestCase',
+    'FromJsonMany_TestCase',
+    'InternPool_TestCase',
+    'JsonLines_TestCase',
+    ]
+
+class Color(Enum):
+    Red = 'red'
+    Blue = 'blue'
+
+
+
+class Point(object):
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+    def ToTuple(self): return self.x, self.y
+
+
+
+class Record(BaseDictModel[str, object]): pass
+
+
+
+class Tags(BaseSetModel[str]): pass
+
+
+
+class JsonSerializers_TestCase(unittest.TestCase):
+    def tearDown(self):
+        JsonSerializers.Unregister(Point)
+
+    def test_builtin_rules(self):
+        self.assertEqual(BaseObjectModel._serialize(Color.Red), 'red')
+        self.assertEqual(BaseObjectModel._serialize(time(hour=1)), '01:00:00')
+        self.assertEqual(BaseObjectModel._serialize(datetime(2021, 1, 1)), '2021-01-01T00:00:00')
+        self.assertEqual(BaseObjectModel._serialize(timedelta(seconds=90)), 90.0)
+        self.assertEqual(BaseObjectModel._serialize(Tags({ 'a' })), ['a'])
+        self.assertEqual(BaseObjectModel._serialize(Point(1, 2)), (1, 2))
+
+    def test_to_dict(self):
+        record = Record(color=Color.Blue, point=Point(1, 2), tags=Tags({ 'a' }), when=time(hour=1))
+        self.assertEqual(record.ToDict(), dict(color='blue', point=(1, 2), tags=['a'], when=time(hour=1)))
+
+    def test_register(self):
+        record = Record(point=Point(1, 2))
+        self.assertEqual(Record.FromJson(record.ToJsonString()), dict(point=[1, 2]))
+
+        JsonSerializers.Register(Point, lambda p: dict(x=p.x, y=p.y))
+        self.assertTrue(JsonSerializers.IsRegistered(Point))
+        self.assertEqual(Record.FromJson(record.ToJsonString()), dict(point=dict(x=1, y=2)))
+        self.assertEqual(record.ToDict(), dict(point=dict(x=1, y=2)))
+
+        JsonSerializers.Unregister(Point)
+        self.assertEqual(record.ToDict(), dict(point=(1, 2)))
+
+
+
+class JsonStream_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.records = BaseListModel(Record(id=i, color=Color.Red, tags=Tags({ 'a' }), name='é') for i in range(1000))
+
+    def test_chunks(self):
+        for indent in (None, 4):
+            self.assertEqual(''.join(self.records.IterJsonChunks(indent)), self.records.ToJsonString(indent, backend='stdlib'))
+
+    def test_stream(self):
+        for indent in (None, 4):
+            expected = self.records.ToJsonString(indent, backend='stdlib')
+
+            text = io.StringIO()
+            self.assertEqual(self.records.ToJsonStream(text, indent, buffer_size=128), len(expected))
+            self.assertEqual(text.getvalue(), expected)
+
+            binary = io.BytesIO()
+            self.records.ToJsonStream(binary, indent)
+            self.assertEqual(binary.getvalue().decode(), expected)
+
+    def test_path(self):
+        record = Record(id=1, when=datetime(2021, 1, 1), items=self.records[:3])
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'record.json')
+            record.ToJsonStream(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), record.ToJsonString(backend='stdlib'))
+
+
+
+class JsonArrayStream_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.items = [1, 2.5, 12345678901234567890, 'text ] , "quoted" é', None, True, False, [], { }, [1, [2, [3]]], { 'a': { 'b': [1, 2, 3] } }]
+        self.text = json.dumps(self.items, indent=4)
+
+    def test_items(self):
+        for chunk_size in (1, 2, 7, 65536):
+            self.assertEqual(list(IterJsonArray(io.StringIO(self.text), chunk_size=chunk_size)), self.items)
+            self.assertEqual(list(IterJsonArray(io.BytesIO(self.text.encode()), chunk_size=chunk_size)), self.items)
+
+    def test_empty(self):
+        self.assertEqual(list(IterJsonArray(io.StringIO(' [ ] '))), [])
+
+    def test_invalid(self):
+        with self.assertRaises(json.JSONDecodeError): list(IterJsonArray(io.StringIO('{ }')))
+        with self.assertRaises(json.JSONDecodeError): list(IterJsonArray(io.StringIO('[1, 2')))
+        with self.assertRaises(json.JSONDecodeError): list(IterJsonArray(io.StringIO('[1 2]')))
+
+    def test_batches(self):
+        batches = list(BaseListModel.FromJsonStream(io.StringIO(self.text), batch_size=4, chunk_size=3))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 3])
+        self.assertTrue(all(isinstance(batch, BaseListModel) for batch in batches))
+        self.assertEqual([item for batch in batches for item in batch], self.items)
+
+    def test_path(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'items.json')
+            with open(path, 'w', encoding='utf-8') as f: f.write(self.text)
+
+            self.assertEqual(list(BaseListModel.FromJsonStream(path)), self.items)
+
+
+
+class JsonBackends_TestCase(unittest.TestCase):
+    values = [
+        None, True, False, 0, -1, 2 ** 63, 2 ** 64 + 1, -2 ** 70, 0.1, -0.0, 1e16, 1e-7, 1.5e300,
+        '', 'text', 'é ü 漢字 😀', '"quoted" \\ \n \t \u0000',
+        [], { }, [1, [2, [3, []]]], { 'a': { 'b': [1, 2, { }] }, 'é': None },
+        { 'digits': '123456789012345678901234567890' },
+        ]
+    non_finite = [float('nan'), float('inf'), float('-inf'), [1.5, None, float('nan')], { 'limits': [float('-inf'), float('inf')] }]
+
+    def setUp(self):
+        self.backends = [JsonBackends.Get(name) for name in JsonBackends.Names()]
+
+    def tearDown(self):
+        JsonBackends.Set(None)
+
+    def AssertSame(self, decoded, value):
+        # by json form: NaN is not equal to itself
+        self.assertEqual(json.dumps(decoded), json.dumps(value))
+        self.assertEqual(type(decoded), type(value))
+
+    def test_round_trip(self):
+        for backend in self.backends:
+            for value in self.values:
+                for indent in (None, 2, 4):
+                    with self.subTest(backend=backend.Name, value=value, indent=indent):
+                        s = backend.dumps(value, indent=indent)
+                        decoded = backend.loads(s)
+                        self.AssertSame(decoded, value)
+                        self.assertEqual(backend.dumps(decoded, indent=indent), s)
+                        self.AssertSame(backend.loads(s.encode()), value)
+
+    def test_cross_backend(self):
+        for encoder in self.backends:
+            for decoder in self.backends:
+                for value in self.values:
+                    with self.subTest(encoder=encoder.Name, decoder=decoder.Name, value=value):
+                        self.AssertSame(decoder.loads(encoder.dumps(value)), value)
+
+    def test_non_finite(self):
+        stdlib = JsonBackends.Get('stdlib')
+        for value in self.non_finite:
+            for backend in self.backends:
+                with self.subTest(backend=backend.Name, value=value):
+                    self.AssertSame(backend.loads(stdlib.dumps(value)), value)
+                    # orjson writes NaN and Infinity as null
+                    expected = value if backend is stdlib else json.loads(json.dumps(value).replace('-Infinity', 'null').replace('Infinity', 'null').replace('NaN', 'null'))
+                    self.AssertSame(stdlib.loads(backend.dumps(value)), expected)
+
+    def test_indent(self):
+        value = [{ 'a': [1, { 'b': [] }, { }], 'c': { 'd': [[2, 'e  f']] } }, 'g\th', [], 3]
+        for backend in self.backends:
+            for indent in (0, 1, 2, 4, 8, '', '\t', '--'):
+                with self.subTest(backend=backend.Name, indent=indent):
+                    self.assertEqual(backend.dumps(value, indent=indent), json.dumps(value, indent=indent))
+
+    def test_models(self):
+        record = Record(color=Color.Red, when=datetime(2021, 1, 2, 3, 4, 5, 6), start=time(hour=1), tags=Tags({ 'a' }), items=BaseListModel([1, 2]))
+        expected = json.loads(record.ToJsonString(backend='stdlib'))
+        for backend in self.backends:
+            with self.subTest(backend=backend.Name):
+                s = record.ToJsonString(None, backend=backend)
+                self.assertEqual(Record.FromJson(s, backend=backend), expected)
+                self.assertEqual(Record.FromJson(s, backend=backend).ToJsonString(None, backend=backend), s)
+
+    def test_fallback(self):
+        for backend in self.backends:
+            with self.subTest(backend=backend.Name):
+                self.assertEqual(backend.dumps(self.values, ensure_ascii=False), json.dumps(self.values, ensure_ascii=False))
+                self.assertEqual(backend.loads('[1.5]', parse_float=str), ['1.5'])
+                with self.assertRaises(TypeError): backend.dumps(object())
+                with self.assertRaises(json.JSONDecodeError): backend.loads('[1,')
+                self.assertEqual(json.dumps(backend.loads('[NaN, Infinity, -Infinity, 1e400]')), '[NaN, Infinity, -Infinity, Infinity]')
+                # integers beyond 64 bits are found across the slices OrJsonBackend scans
+                document = '[' + ' ' * (OrJsonBackend._slice - 10) + str(2 ** 70) + ']'
+                self.assertEqual(backend.loads(document), [2 ** 70])
+                self.assertEqual(backend.loads(document.encode()), [2 ** 70])
+
+    def test_switch(self):
+        self.assertEqual(JsonBackends.Current().Name, 'orjson' if 'orjson' in JsonBackends.Names() else 'stdlib')
+        stdlib = JsonBackends.Set('stdlib')
+        self.assertIs(JsonBackends.Current(), stdlib)
+        self.assertEqual(Record(a=1).ToJsonString(None), '{"a": 1}')
+        self.assertIs(JsonBackends.Get(stdlib), stdlib)
+        with self.assertRaises(KeyError): JsonBackends.Get('unknown')
+
+
+
+class Clone_TestCase(unittest.TestCase):
+    class Opaque(object):
+        def __init__(self, value): self.value = value
+        def __eq__(self, other): return isinstance(other, type(self)) and other.value == self.value
+        def ToDict(self): return dict(value=self.value)
+
+    def setUp(self):
+        self.record = Record(id=1,
+                             color=Color.Red,
+                             when=datetime(2021, 1, 1),
+                             tags=Tags({ 'a', 'b' }),
+                             nested={ 'list': [1, [2, 3], { 'x': 'y' }], 'tuple': (1, [2]) },
+                             child=Record(name='child', values=[1, 2, 3]),
+                             items=BaseListModel([{ 'a': 1 }, [1, 2]]),
+                             opaque=self.Opaque([1, 2]))
+        self.record.attribute = { 'state': [1] }
+
+    def assertIndependent(self, clone: Record):
+        self.assertEqual(clone, self.record)
+        self.assertIsInstance(clone, Record)
+        self.assertEqual(clone.attribute, self.record.attribute)
+
+        clone['nested']['list'][1].append(4)
+        clone['child']['values'].append(4)
+        clone['items'][0]['a'] = 2
+        clone['tags'].add('c')
+        clone['opaque'].value.append(3)
+        clone.attribute['state'].append(2)
+
+        self.assertEqual(self.record['nested']['list'][1], [2, 3])
+        self.assertEqual(self.record['child']['values'], [1, 2, 3])
+        self.assertEqual(self.record['items'][0], { 'a': 1 })
+        self.assertEqual(self.record['tags'], { 'a', 'b' })
+        self.assertEqual(self.record['opaque'].value, [1, 2])
+        self.assertEqual(self.record.attribute, { 'state': [1] })
+
+    def test_clone(self):
+        clone = self.record.Clone()
+        self.assertIs(type(clone), Record)
+        self.assertIs(type(clone['child']), Record)
+        self.assertIs(type(clone['items']), BaseListModel)
+        self.assertIs(type(clone['tags']), Tags)
+        self.assertIs(clone['color'], Color.Red)
+        self.assertIsNot(clone['opaque'], self.record['opaque'])
+        self.assertIndependent(clone)
+
+    def test_recursive(self):
+        self.record['self'] = self.record
+        clone = self.record.Clone()
+        self.assertIs(clone['self'], clone)
+
+    def test_copy_on_write(self):
+        snapshot = self.record.Clone(copy_on_write=True)
+        self.assertIsInstance(snapshot, Record)
+        self.assertIs(dict.__getitem__(snapshot, 'nested'), self.record['nested'])
+        self.assertEqual(snapshot.ToJsonString(backend='stdlib'), self.record.ToJsonString(backend='stdlib'))
+        self.assertIs(dict.__getitem__(snapshot, 'nested'), self.record['nested'])
+
+        self.assertIsNot(snapshot['nested'], self.record['nested'])
+        self.assertIsInstance(snapshot['child'], Record)
+        self.assertIs(list.__getitem__(snapshot['child']['values'], 0), 1)
+
+        self.record['id'] = 2
+        self.record['child'] = None
+        self.assertEqual(snapshot['id'], 1)
+        self.assertEqual(snapshot['child'], Record(name='child', values=[1, 2, 3]))
+
+        self.record['child'] = Record(name='child', values=[1, 2, 3])
+        self.record['id'] = 1
+        self.assertIndependent(self.record.Clone(copy_on_write=True))
+        self.assertIndependent(_copy.deepcopy(self.record.Clone(copy_on_write=True)))
+
+    def test_copy_on_write_list(self):
+        items = BaseListModel([[1], { 'a': [2] }, BaseListModel([[3]]), 4])
+        snapshot = items.Clone(copy_on_write=True)
+        self.assertEqual(snapshot, items)
+
+        for item in snapshot[:2]: item.clear()
+        snapshot[2][0].append(4)
+        self.assertEqual(items, [[1], { 'a': [2] }, [[3]], 4])
+        self.assertEqual(snapshot, [[], { }, [[3, 4]], 4])
+
+        clone = pickle.loads(pickle.dumps(snapshot))
+        self.assertIs(type(clone), BaseListModel)
+        self.assertEqual(clone, snapshot)
+
+
+
+class BinaryFormat_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.record = Record(id=1,
+                             color=Color.Red,
+                             when=datetime(2021, 1, 2, 3, 4, 5, 6),
+                             start=time(hour=1),
+                             duration=timedelta(seconds=1.5),
+                             tags=Tags({ 'a', 'b' }),
+                             pair=(1, 2),
+                             child=Record(name='child'),
+                             items=BaseListModel([{ 'a': 1 }, [1, 2]]),
+                             big=2 ** 100)
+
+    def test_round_trip(self):
+        data = self.record.ToBytes()
+        result = Record.FromBytes(data)
+        self.assertEqual(result, self.record)
+        self.assertIs(type(result), Record)
+        self.assertIs(result['color'], Color.Red)
+        self.assertIs(type(result['child']), Record)
+        self.assertIs(type(result['tags']), Tags)
+        self.assertEqual(result['pair'], (1, 2))
+
+        self.assertEqual(BaseObjectModel.FromBytes(bytearray(data)), self.record)
+        self.assertEqual(Record.FromBytes(self.record.Clone(copy_on_write=True).ToBytes()), self.record)
+        with self.assertRaises(TypeError): BaseListModel.FromBytes(data)
+
+    def test_time_zones(self):
+        parsed = DateTimeParser().ParseDateTime('Tue, 02 Mar 2021 10:00:00 +0000')
+        zones = [tz.tzutc(), tz.tzoffset(None, 3600), tz.tzoffset('CET', 3600), tz.tzlocal(), tz.gettz('Europe/Paris'), tz.tzstr('EST5EDT'), ZoneInfo('Europe/Paris'), timezone.utc]
+        record = Record(parsed=parsed, zones=[datetime(2021, 6, 1, 12, tzinfo=zone) for zone in zones])
+        result = Record.FromBytes(record.ToBytes())
+        self.assertEqual(result, record)
+        self.assertEqual([value.utcoffset() for value in result['zones']], [value.utcoffset() for value in record['zones']])
+        self.assertIs(result['zones'][-2].tzinfo, ZoneInfo('Europe/Paris'))
+
+        # getattr is only resolved for ZoneInfo
+        data = pickle.dumps(datetime(2021, 1, 1, tzinfo=ZoneInfo('UTC')), 5).replace(b'_unpickle', b'__class__', 1)
+        with self.assertRaises(BinaryFormatError): BinaryFormat.Loads(BinaryFormat._header.pack(BinaryFormat.VERSION, len(data)) + data)
+
+    def test_stream(self):
+        records = [Record(id=i, when=datetime(2021, 1, 1), items=BaseListModel(range(i))) for i in range(5)]
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'records.bin')
+            with open(path, 'wb') as f:
+                for record in records: f.write(record.ToBytes())
+
+            self.assertEqual(list(Record.FromBytesStream(path)), records)
+
+        stream = io.BytesIO(b''.join(record.ToBytes() for record in records)[:-1])
+        with self.assertRaises(BinaryFormatError): list(Record.FromBytesStream(stream))
+
+    def test_invalid(self):
+        data = self.record.ToBytes()
+        with self.assertRaises(BinaryFormatError): Record.FromBytes(data[:-1])
+        with self.assertRaises(BinaryFormatError): Record.FromBytes(data + data)
+        with self.assertRaises(BinaryFormatError): Record.FromBytes(b'\x02' + data[1:])
+        with self.assertRaises(BinaryFormatError): Record.FromBytes(data[:5] + b'\x00' * (len(data) - 5))
+
+        # classes outside of the models must be registered
+        data = Record(point=Point(1, 2)).ToBytes()
+        with self.assertRaises(BinaryFormatError): Record.FromBytes(data)
+        with self.assertRaises(BinaryFormatError): BinaryFormat.Loads(BinaryFormat.Dumps(os.system))
+
+        BinaryFormat.Register(Point)
+        try:
+            self.assertEqual(Record.FromBytes(data)['point'].ToTuple(), (1, 2))
+        finally:
+            BinaryFormat.Unregister(Point)
+
+
+
+class ListIndex_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.items = BaseListModel(dict(id=i, group=i % 3) for i in range(10))
+        self.items.CreateIndex('id', unique=True)
+        self.items.CreateIndex(lambda item: item['group'], name='group')
+
+    def assertIndexed(self):
+        self.assertEqual([self.items.Find(item['id'], index='id') for item in self.items], list(self.items))
+        for group in range(3): self.assertCountEqual(self.items.FindAll(group, index='group'), self.items.Filter(lambda item: item['group'] == group))
+        self.assertEqual(len(self.items.Indexes['id']), len(self.items))
+
+    def test_find(self):
+        self.assertEqual(self.items.Find(4, index='id'), dict(id=4, group=1))
+        self.assertIsNone(self.items.Find(40, index='id'))
+        self.assertEqual(self.items.FindAll(1, index='group'), [dict(id=1, group=1), dict(id=4, group=1), dict(id=7, group=1)])
+        self.assertEqual(self.items.FindAll(5, index='group'), [])
+        with self.assertRaises(KeyError): self.items.Find(4)
+        with self.assertRaises(KeyError): BaseListModel().Find(4)
+
+    def test_maintained(self):
+        self.items.append(dict(id=10, group=0))
+        self.items.extend([dict(id=11, group=1), dict(id=12, group=2)])
+        self.items.insert(0, dict(id=-1, group=2))
+        self.items.remove(dict(id=3, group=0))
+        self.items.pop(1)
+        del self.items[2:4]
+        self.items[0] = dict(id=-2, group=1)
+        self.items[1:3] = [dict(id=20, group=0)]
+        self.items += [dict(id=21, group=0)]
+        self.assertIndexed()
+
+        self.items.clear()
+        self.assertEqual(self.items.FindAll(0, index='group'), [])
+
+    def test_unique(self):
+        expected = list(self.items)
+        for mutate in (lambda: self.items.append(dict(id=1, group=0)),
+                       lambda: self.items.extend([dict(id=30, group=0), dict(id=30, group=0)]),
+                       lambda: self.items.insert(0, dict(id=2, group=0)),
+                       lambda: self.items.__setitem__(0, dict(id=2, group=0))):
+            with self.assertRaises(ValueError): mutate()
+            self.assertEqual(self.items, expected)
+
+        self.items[1] = dict(id=1, group=2)  # replacing an item by one with the same key
+        self.assertIndexed()
+
+    def test_reindex(self):
+        self.items[0]['id'] = 100
+        self.assertIsNone(self.items.Find(100, index='id'))
+        self.items.Reindex()
+        self.assertIs(self.items.Find(100, index='id'), self.items[0])
+
+    def test_copy(self):
+        for clone in (self.items.Clone(), _copy.deepcopy(self.items)):
+            self.assertEqual(clone, self.items)
+            self.assertEqual(list(clone.Indexes), ['id', 'group'])
+            self.assertIs(clone.Find(3, index='id'), clone[3])
+
+        for clone in (pickle.loads(pickle.dumps(self.items)), BaseListModel.FromBytes(self.items.ToBytes())):
+            self.assertEqual(clone, self.items)
+            self.assertIs(type(clone), BaseListModel)
+
+        self.items.DropIndex('group')
+        self.items.DropIndex('id')
+        self.assertIs(type(self.items), BaseListModel)
+        self.assertEqual(self.items.Indexes, { })
+
+
+
+class JsonPatch_TestCase(unittest.TestCase):
+    document = { 'name': 'config', 'a/b~c': 1, 'items': [dict(id=i) for i in range(5)], 'nested': dict(flag=True, values=[1, 2, 3]), 'color': Color.Red, 'none': None }
+
+    def setUp(self):
+        self.old = BaseDictModel(_copy.deepcopy(self.document))
+        self.new = BaseDictModel(_copy.deepcopy(self.document))
+
+    def assertRoundTrip(self, old, new) -> list:
+        patch = old.Diff(new)
+        target = BaseDictModel(_copy.deepcopy(dict(old)))
+        self.assertEqual(target.ApplyPatch(patch), new)
+
+        target = BaseDictModel(json.loads(old.ToJsonString()))
+        self.assertEqual(target.ApplyPatch(JsonPatch.ToJsonString(patch)).ToDict(), json.loads(new.ToJsonString()))
+        return patch
+
+    def test_diff(self):
+        self.assertEqual(self.old.Diff(self.new), [])
+
+        self.new['a/b~c'] = 2
+        del self.new['none']
+        self.new['added'] = dict(x=1)
+        self.new['nested']['values'].insert(0, 0)
+        self.new['items'][2]['id'] = 20
+        self.new['items'].append(dict(id=5))
+        self.new['color'] = Color.Blue
+        patch = self.assertRoundTrip(self.old, self.new)
+        self.assertCountEqual(patch, [dict(op='replace', path='/a~1b~0c', value=2),
+                                      dict(op='remove', path='/none'),
+                                      dict(op='add', path='/added', value=dict(x=1)),
+                                      dict(op='add', path='/nested/values/0', value=0),
+                                      dict(op='replace', path='/items/2/id', value=20),
+                                      dict(op='add', path='/items/5', value=dict(id=5)),
+                                      dict(op='replace', path='/color', value=Color.Blue)])
+
+    def test_bool_int(self):
+        # equal in python (1 == True, 0 == False), different in json
+        old, new = BaseDictModel(x=1, y=[0, 1], z={ 'k': 0, 'n': 1 }), BaseDictModel(x=True, y=[False, 2], z={ 'k': False, 'n': 2 })
+        self.assertCountEqual(old.Diff(new), [dict(op='replace', path='/x', value=True),
+                                              dict(op='replace', path='/y/0', value=False),
+                                              dict(op='replace', path='/y/1', value=2),
+                                              dict(op='replace', path='/z/k', value=False),
+                                              dict(op='replace', path='/z/n', value=2)])
+        self.assertRoundTrip(old, new)
+        self.assertEqual(BaseDictModel(x=1.0).Diff(BaseDictModel(x=1)), [dict(op='replace', path='/x', value=1)])
+
+        # containers that == finds equal are not visited
+        old, new = BaseDictModel(a=[[1, 2], { 'k': [0] }], b=dict(c=1)), BaseDictModel(a=[[1, 2], { 'k': [False] }], b=dict(c=1))
+        self.assertEqual(old.Diff(new), [])
+        self.assertEqual(BaseDictModel(a=[1, 2], b=dict(c=True)).Diff(BaseDictModel(a=[1, 2], b=dict(c=True))), [])
+
+    def test_lists(self):
+        for values in ([], [0, 1, 2, 3, 4], [2], [1, 2, 3, 9, 9, 9], [3, 1, 2], ['x']):
+            self.new['nested'] = dict(values=values)
+            self.old['nested'] = dict(values=[1, 2, 3])
+            self.assertRoundTrip(self.old, self.new)
+
+    def test_identity(self):
+        snapshot = self.new.Clone(copy_on_write=True)
+        self.new['name'] = 'changed'
+        self.new['items'] = self.new['items'] + [dict(id=5)]
+        self.assertEqual(snapshot.Diff(self.new), [dict(op='replace', path='/name', value='changed'), dict(op='add', path='/items/5', value=dict(id=5))])
+        self.assertIs(dict.get(snapshot, 'nested'), dict.get(self.new, 'nested'))  # not unshared by the diff
+
+    def test_apply(self):
+        document = dict(foo=['bar', 'baz'], x=dict(y=1))
+        result = JsonPatch.Apply(document, [dict(op='add', path='/foo/1', value='qux'),
+                                            dict(op='move', path='/foo/-', **{ 'from': '/foo/0' }),
+                                            dict(op='copy', path='/z', **{ 'from': '/x' }),
+                                            dict(op='test', path='/x/y', value=1.0),
+                                            dict(op='replace', path='/x/y', value=[1]),
+                                            dict(op='remove', path='/foo/0')])
+        self.assertIs(result, document)
+        self.assertEqual(document, dict(foo=['baz', 'bar'], x=dict(y=[1]), z=dict(y=1)))
+
+        for operation in (dict(op='test', path='/z/y', value=2),
+                          dict(op='remove', path='/missing'),
+                          dict(op='replace', path='/foo/5', value=1),
+                          dict(op='add', path='/foo/01', value=1),
+                          dict(op='move', path='/x/y/a', **{ 'from': '/x' }),
+                          dict(op='invalid', path='/x'),
+                          dict(op='add', path='x', value=1),
+                          dict(op='add', path='/x')):
+            with self.assertRaises(JsonPatchError): JsonPatch.Apply(document, [operation])
+
+        with self.assertRaises(JsonPatchError): BaseDictModel(a=1).ApplyPatch([dict(op='replace', path='', value=[1])])
+        self.assertEqual(BaseListModel([1]).ApplyPatch([dict(op='replace', path='', value=[2, 3])]), [2, 3])
+
+
+
+class FromJsonMany_TestCase(unittest.TestCase):
+    payloads = [json.dumps(dict(id=i, name=f'record {i}')) for i in range(50)]
+
+    def test_in_process(self):
+        for kwargs in (dict(workers=1), dict(workers=4, chunk_size=len(self.payloads)), dict()):
+            records = Record.FromJsonMany(self.payloads, **kwargs)
+            self.assertEqual(records, [Record.FromJson(payload) for payload in self.payloads])
+            self.assertIsInstance(records[0], Record)
+
+        class Local(BaseDictModel): pass
+        self.assertIsInstance(Local.FromJsonMany(self.payloads, workers=2, chunk_size=5)[0], Local)
+
+    def test_pool(self):
+        expected = [Record.FromJson(payload) for payload in self.payloads]
+        records = Record.FromJsonMany(self.payloads, workers=2, chunk_size=7, backend='stdlib')
+        self.assertEqual(records, expected)
+        self.assertIsInstance(records[-1], Record)
+
+        with ProcessPoolExecutor(2) as pool:
+            self.assertEqual(Record.FromJsonMany(map(str.encode, self.payloads), workers=2, chunk_size=7, pool=pool), expected)
+            self.assertEqual(BaseListModel.FromJsonMany(['[1]', '[2, 3]'], workers=2, chunk_size=1, pool=pool), [[1], [2, 3]])
+
+
+
+class InternPool_TestCase(unittest.TestCase):
+    messages = [json.dumps([dict(sensor='temperature', unit='celsius', id=i % 3, value=21.5, high=1000, ok=True) for i in range(20)]) for _ in range(5)]
+
+    def test_from_json(self):
+        for backend in JsonBackends.Names():
+            pool = InternPool()
+            plain = [BaseListModel.FromJson(message, backend=backend) for message in self.messages]
+            interned = [BaseListModel.FromJson(message, backend=backend, intern=pool) for message in self.messages]
+            self.assertEqual(plain, interned)
+            self.assertIsInstance(interned[0], BaseListModel)
+
+            first, last = interned[0][0], interned[-1][-1]
+            self.assertIs(first['unit'], last['unit'])
+            self.assertIs(first['value'], last['value'])
+            self.assertIs(first['high'], last['high'])
+            self.assertIs(next(iter(first)), next(iter(last)))
+            self.assertGreater(pool.Statistics['hits'], 0)
+            self.assertGreater(pool.Statistics['saved_bytes'], 0)
+
+            self.assertLess(get_size(interned), get_size(plain))
+            self.assertEqual(get_size(interned), get_size(interned))
+
+        self.assertEqual(Record.FromJson('{"a": "b"}', intern=True), dict(a='b'))
+
+    def test_types(self):
+        pool = InternPool()
+        self.assertEqual(pool.Intern([1, 1.0, '1', True]), [1, 1.0, '1', True])
+        result = pool.Intern([1.0, 1, True, 1.0])
+        self.assertEqual(list(map(type, result)), [float, int, bool, float])
+
+    def test_bounds(self):
+        pool = InternPool(max_size=2, max_length=4)
+        long = 'x' * 5
+        pool.Intern(['ab', 'cd', 'ef', long])
+        self.assertEqual(len(pool), 2)
+
+        ef, shared = ''.join(['e', 'f']), ''.join(['a', 'b'])
+        self.assertIsNot(pool.Leaf(ef), 'ef')
+        self.assertIs(pool.Leaf(ef), ef)
+        self.assertIsNot(pool.Leaf(shared), shared)
+        self.assertIsNot(pool.Leaf(''.join(['x'] * 5)), long)
+
+        pool.Clear()
+        self.assertEqual(pool.Statistics, dict(pooled=0, hits=0, keys=0, saved_bytes=0))
+
+    def test_get_size(self):
+        # only containers are walked: iterables such as generators and files are measured without being consumed
+        items = (i for i in range(3))
+        text = io.StringIO('a\nb\n')
+        self.assertGreater(get_size([items, text]), get_size([]))
+        self.assertEqual(list(items), [0, 1, 2])
+        self.assertEqual(text.read(), 'a\nb\n')
+        self.assertGreater(get_size(BaseObjectModel()), 0)  # its __iter__ raises NotImplementedError
+
+        self.assertGreater(get_size(BaseListModel(['x' * 1000])), 1000)
+        self.assertGreater(get_size(BaseDictModel(a=['x' * 1000])), 1000)
+
+
+
+class JsonLines_TestCase(unittest.TestCase):
+    items = [1, 2.5, 'text\nwith a newline \u2028 é', None, [1, [2]], { 'a': { 'b': [1, 2, 3] } }]
+
+    def test_lines(self):
+        records = BaseListModel(Record(id=i, color=Color.Red, tags=Tags({ 'a' })) for i in range(3))
+        for backend in JsonBackends.Names():
+            text = BaseListModel(self.items).ToJsonLines(backend=backend)
+            self.assertEqual(text.count('\n'), len(self.items))
+            self.assertEqual(BaseListModel.FromJsonLines(text, backend=backend), self.items)
+            self.assertEqual(BaseListModel.FromJsonLines(text.encode(), backend=backend), self.items)
+            self.assertEqual(BaseListModel.FromJsonLines(records.ToJsonLines(backend=backend)), json.loads(records.ToJsonString()))
+
+        self.assertEqual(BaseListModel().ToJsonLines(), '')
+        self.assertEqual(BaseListModel.FromJsonLines('\n1\n\n  \n2\r\n'), [1, 2])
+
+        with self.assertRaisesRegex(json.JSONDecodeError, r'line 3'): BaseListModel.FromJsonLines('1\n2\n[3\n')
+
+    def test_stream(self):
+        text = BaseListModel(self.items * 50).ToJsonLines()
+        for chunk_size in (1, 64, 1 << 20):
+            self.assertEqual(list(IterJsonLines(io.BytesIO(text.encode()), chunk_size=chunk_size)), self.items * 50)
+            self.assertEqual(list(IterJsonLines(io.StringIO(text), chunk_size=chunk_size)), self.items * 50)
+
+        batches = list(BaseListModel.FromJsonLinesStream(io.StringIO(text), batch_size=100, chunk_size=64))
+        self.assertEqual([len(batch) for batch in batches], [100, 100, 100])
+        self.assertIsInstance(batches[0], BaseListModel)
+
+        with self.assertRaisesRegex(json.JSONDecodeError, r'line 5'): list(IterJsonLines(io.StringIO('1\n2\n3\n4\n{\n'), chunk_size=4))
+
+    def test_workers(self):
+        text = BaseListModel(self.items * 50).ToJsonLines()
+        self.assertEqual(list(IterJsonLines(io.StringIO(text), chunk_size=64, workers=2)), self.items * 50)
+
+        with ProcessPoolExecutor(2) as pool:
+            self.assertEqual(list(IterJsonLines(io.BytesIO(text.encode()), chunk_size=64, pool=pool, workers=2, backend='stdlib')), self.items * 50)
+            with self.assertRaisesRegex(json.JSONDecodeError, r'line 2'): list(IterJsonLines(io.StringIO('1\n{\n'), pool=pool))
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            file = FilePath.Join(root, 'logs', 'events.jsonl')()  # creates the parent directory, and nothing in the working directory
+            self.assertTrue(os.path.isdir(os.path.join(root, 'logs')))
+            self.assertFalse(os.path.lexists('events.jsonl'))
+            for item in self.items: file.AppendJsonLine(item)
+            file.AppendJsonLines([Record(id=1, color=Color.Blue)])
+            self.assertEqual(list(file.IterJsonLines()), self.items + [dict(id=1, color='blue')])
+            self.assertEqual(list(BaseListModel.FromJsonLinesStream(file)), self.items + [dict(id=1, color='blue')])
+
+            async def run():
+                await file.AppendJsonLineAsync(dict(last=True))
+                return [item async for item in file.IterJsonLinesAsync(chunk_size=16)]
+
+            self.assertEqual(asyncio.run(run()), self.items + [dict(id=1, color='blue'), dict(last=True)])
+
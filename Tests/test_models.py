@@ -0,0 +1,517 @@
+import asyncio
+import copy
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+from datetime import datetime, time, timedelta
+from enum import Enum
+from typing import *
+
+from PythonExtensions.Exceptions import RequestRejectedError
+from PythonExtensions.Json import *
+from PythonExtensions.JsonBackends import JsonBackends
+from PythonExtensions.Models import *
+
+
+
+
+__all__ = [
+    'SchemaModel_TestCase',
+    'ColumnarListModel_TestCase',
+    'LazyDictModel_TestCase',
+    'MultiDictModel_TestCase',
+    'RequestDispatcher_TestCase',
+    'RequestBus_TestCase',
+    ]
+
+class Status(Enum):
+    Active = 'active'
+    Inactive = 'inactive'
+
+
+
+class Tags(BaseSetModel[str]): pass
+
+
+
+class Node(BaseSchemaModel):
+    id: int
+    status: Status
+    created: datetime
+    start: Optional[time] = None
+    duration: Optional[timedelta] = None
+    tags: Tags = None
+    children: List['Node'] = None
+    extra: Any = None
+    Kind: ClassVar[str] = 'node'
+
+
+
+class NamedNode(Node):
+    name: str = ''
+
+
+
+class SchemaModel_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.node = Node(id=1,
+                         status=Status.Active,
+                         created=datetime(2021, 1, 2, 3, 4, 5),
+                         start=time(hour=1),
+                         duration=timedelta(seconds=1.5),
+                         tags=Tags({ 'a' }),
+                         children=[Node(id=2, status=Status.Inactive, created=datetime(2021, 1, 1))],
+                         extra={ 'status': Status.Inactive })
+
+    def test_declaration(self):
+        self.assertEqual(list(Node.__schema__), ['id', 'status', 'created', 'start', 'duration', 'tags', 'children', 'extra'])
+        self.assertEqual(list(NamedNode.__schema__), [*Node.__schema__, 'name'])
+        self.assertEqual(NamedNode.__slots__, ('name',))
+        self.assertTrue(Node.__schema__['id'].Required)
+        self.assertFalse(hasattr(self.node, '__dict__'))
+        self.assertEqual(Node.Kind, 'node')
+
+        with self.assertRaises(TypeError): Node(1, Status.Active, datetime(2021, 1, 1))
+        with self.assertRaises(TypeError): Node(id=1)
+
+    def test_matches_dict_model(self):
+        model = BaseDictModel({ key: getattr(self.node, key) for key in self.node })
+        model['children'] = [BaseDictModel({ key: getattr(child, key) for key in child }) for child in self.node.children]
+
+        self.assertEqual(self.node.ToDict(), { **model.ToDict(), 'children': self.node.children })
+        for indent in (None, 4):
+            self.assertEqual(self.node.ToJsonString(indent), model.ToJsonString(indent))
+            self.assertEqual(''.join(self.node.IterJsonChunks(indent)), model.ToJsonString(indent, backend='stdlib'))
+
+        self.assertEqual(json.loads(BaseListModel([self.node]).ToJsonString()), [json.loads(model.ToJsonString())])
+
+    def test_parse(self):
+        node = Node.FromJson(self.node.ToJsonString())
+        self.assertEqual(node.children[0].status, Status.Inactive)
+        self.assertIsInstance(node.children[0], Node)
+        self.assertIsInstance(node.tags, Tags)
+        self.assertEqual(node.extra, { 'status': 'inactive' })
+
+        node.extra = self.node.extra
+        self.assertEqual(node, self.node)
+
+        self.assertEqual(Node.Parse(dict(id=3, status='active', created='01/02/2021 10:30:00', unknown=1)),
+                         Node(id=3, status=Status.Active, created=datetime(2021, 1, 2, 10, 30)))
+
+        with self.assertRaises(KeyError): Node.Parse(dict(id=3))
+        with self.assertRaises(TypeError): Node.Parse([])
+        with self.assertRaises(TypeError): Node.Parse(dict(id=3, status='active', created=[]))
+
+    def test_unexpected_types(self):
+        self.node.id = Status.Active
+        self.node.created = '2021'
+        self.assertEqual(self.node.ToDict()['id'], 'active')
+        self.assertEqual(json.loads(self.node.ToJsonString())['created'], '2021')
+
+    def test_copy(self):
+        for clone in (self.node.Clone(), copy.deepcopy(self.node), pickle.loads(pickle.dumps(self.node))):
+            self.assertEqual(clone, self.node)
+            self.assertIsNot(clone.children, self.node.children)
+            clone.children[0].id = 3
+            self.assertEqual(self.node.children[0].id, 2)
+
+    def test_patch(self):
+        other = self.node.Clone()
+        other.children[0].status = Status.Active
+        other.children.append(Node(id=3, status=Status.Active, created=datetime(2021, 1, 1)))
+        other.extra = None
+        patch = self.node.Diff(other)
+        self.assertEqual([(operation['op'], operation['path']) for operation in patch], [('replace', '/children/0/status'), ('add', '/children/1'), ('replace', '/extra')])
+
+        self.assertEqual(self.node.ApplyPatch(patch), other)
+        self.assertIsNot(self.node.children[1], other.children[1])
+
+
+
+class ColumnarListModel_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.rows = [dict(id=i, score=i / 2, name=f'name {i % 3}', active=bool(i % 2), status=Status.Active, extra=None) for i in range(10)]
+        self.model = ColumnarListModel(self.rows)
+
+    def test_columns(self):
+        self.assertEqual(self.model.Keys, ('id', 'score', 'name', 'active', 'status', 'extra'))
+        self.assertEqual(self.model.Column('id').typecode, 'q')
+        self.assertEqual(self.model.Column('score').typecode, 'd')
+        self.assertIs(self.model.Column('name')[0], self.model.Column('name')[3])
+        self.assertIsInstance(self.model.Column('active'), list)
+
+        with self.assertRaises(ValueError): ColumnarListModel([dict(a=1), dict(b=1)])
+        with self.assertRaises(ValueError): ColumnarListModel([dict(a=1), dict(a=1, b=2)])
+
+    def test_rows(self):
+        self.assertEqual(len(self.model), 10)
+        self.assertEqual(self.model, self.rows)
+        self.assertEqual(self.model[-1], self.rows[-1])
+        self.assertEqual(dict(self.model[2]), self.rows[2])
+        self.assertEqual(self.model[2:8:2], self.rows[2:8:2])
+        self.assertEqual([row['id'] for row in self.model.Filter(lambda row: row['active'])], [1, 3, 5, 7, 9])
+        self.assertEqual([i for i, row in self.model.enumerate() if row['id'] != i], [])
+        self.assertEqual(self.model.ToDict()[4], self.rows[4])
+        with self.assertRaises(IndexError): self.model[10]
+
+    def test_mutation(self):
+        expected = [dict(row) for row in self.rows]
+
+        self.model[0]['score'] = expected[0]['score'] = 'text'
+        self.model[1]['id'] = expected[1]['id'] = 2 ** 70
+        self.model[2] = expected[2] = dict(self.rows[3])
+        self.model.append(dict(self.rows[4], id=-1))
+        expected.append(dict(self.rows[4], id=-1))
+        self.model.extend(self.rows[:2])
+        expected.extend(self.rows[:2])
+
+        self.assertEqual(self.model.ToList(), expected)
+        self.assertIsInstance(self.model.Column('score'), list)
+        self.assertIsInstance(self.model.Column('id'), list)
+        with self.assertRaises(ValueError): self.model.append(dict(id=1))
+        with self.assertRaises(TypeError): del self.model[0]['id']
+
+    def test_conversion(self):
+        items = BaseListModel(self.rows)
+        self.assertEqual(self.model.ToListModel(), items)
+        self.assertIsInstance(self.model.ToListModel(), BaseListModel)
+        self.assertEqual(ColumnarListModel.FromListModel(items), self.model)
+        self.assertEqual(ColumnarListModel.Parse(self.model), self.model)
+
+        for indent in (None, 4):
+            self.assertEqual(self.model.ToJsonString(indent), items.ToJsonString(indent))
+            self.assertEqual(''.join(self.model.IterJsonChunks(indent)), items.ToJsonString(indent, backend='stdlib'))
+
+        self.assertEqual(ColumnarListModel.FromJson(self.model.ToJsonString()), json.loads(items.ToJsonString()))
+        self.assertEqual(BaseListModel([self.model[0]]).ToJsonString(), BaseListModel(self.rows[:1]).ToJsonString())
+
+
+
+class LazyDictModel_TestCase(unittest.TestCase):
+    document = dict(id=1, name='x}]"\\ é', nested=dict(items=[1, 2, dict(a='{')], empty={ }, deeper=dict(b=None)), flag=True, score=-1.5e3)
+
+    def setUp(self):
+        self.text = json.dumps(self.document, indent=2)
+        self.model = LazyDictModel.FromJson(self.text)
+
+    def test_lazy(self):
+        self.assertEqual(self.model.Pending, list(self.document))
+        self.assertEqual(self.model['name'], self.document['name'])
+        self.assertEqual(self.model.Pending, ['id', 'nested', 'flag', 'score'])
+
+        nested = self.model['nested']
+        self.assertIsInstance(nested, LazyDictModel)
+        self.assertEqual(nested.Pending, ['items', 'empty', 'deeper'])
+        self.assertEqual(nested['items'], self.document['nested']['items'])
+        self.assertEqual(self.model.get('missing', 3), 3)
+        self.assertEqual(self.model.pop('score'), -1.5e3)
+        self.assertEqual(self.model.Pending, ['id', 'flag'])
+
+    def test_sources(self):
+        sources = [self.text, self.text.encode(), bytearray(self.text.encode()), memoryview(self.text.encode())]
+        for source in sources:
+            self.assertEqual(LazyDictModel.FromJson(source), self.document)
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'document.json')
+            with open(path, 'w') as f: f.write(self.text)
+
+            model = LazyDictModel.FromJsonFile(path)
+            self.assertEqual(model['nested']['deeper'], self.document['nested']['deeper'])
+            self.assertEqual(model, self.document)
+
+    def test_errors(self):
+        for text in ('[1]', '{"a": 1,}', '{"a" 1}', '{"a": [1, 2}', '{"a": "x', '{"a": 1} x'):
+            with self.assertRaises(json.JSONDecodeError): LazyDictModel.FromJson(text)
+
+        deep = dict(a=json.loads('[' * 40 + '"]"' + ']' * 40), b=1)
+        self.assertEqual(LazyDictModel.FromJson(json.dumps(deep)), deep)
+        with self.assertRaises(json.JSONDecodeError): LazyDictModel.FromJson('{"a": ' + '[' * 40 + ']' * 39 + '}')
+
+        model = LazyDictModel.FromJson('{"a": [1, 2,], "b": 1}')
+        self.assertEqual(model['b'], 1)
+        with self.assertRaises(ValueError): model['a']
+
+    def test_to_json(self):
+        self.model['nested']['empty']['c'] = [1, 2]
+        self.model['id'] = 2
+        self.model[3] = None
+        expected = dict(self.document, id=2, **{ '3': None })
+        expected['nested'] = dict(expected['nested'], empty=dict(c=[1, 2]))
+
+        for indent in (None, 4):
+            for backend in ('stdlib', 'orjson'):
+                self.assertEqual(json.loads(self.model.ToJsonString(indent, backend=backend)), expected)
+
+        # untouched values are copied verbatim, including their original formatting
+        self.assertIn(json.dumps(self.document['nested']['items'], indent=2).replace('\n', '\n    '), self.model.ToJsonString(2))
+        self.assertEqual(self.model['nested'].Pending, ['items', 'deeper'])
+        self.assertEqual(json.loads(''.join(self.model.IterJsonChunks())), expected)
+
+        # one chunk per member, the untouched ones straight from the document, and nothing is decoded on the way
+        chunks = list(self.model.IterJsonChunks(2))
+        self.assertEqual(''.join(chunks), self.model.ToJsonString(2, backend='stdlib'))
+        self.assertIn(',\n  "flag": true', chunks)
+        self.assertGreater(len(chunks), len(self.model))
+        self.assertEqual(self.model['nested'].Pending, ['items', 'deeper'])
+        self.assertEqual(json.loads(BaseListModel([self.model]).ToJsonString()), [expected])
+
+    def test_copy(self):
+        self.model['nested']['deeper']['b'] = 1
+        for clone in (self.model.Clone(), copy.deepcopy(self.model), self.model.copy(), pickle.loads(pickle.dumps(self.model)), LazyDictModel.FromBytes(self.model.ToBytes())):
+            self.assertEqual(clone, self.model)
+
+        clone = self.model.Clone()
+        clone['nested']['deeper']['b'] = 2
+        self.assertEqual(self.model['nested']['deeper']['b'], 1)
+
+
+
+class MultiDictModel_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = BaseMultiDictModel({ KeyCollection(['en', 'english', 'en-US']): 'English', 'fr': 'French' })
+
+    def test_aliases(self):
+        d = self.d
+        self.assertEqual(d['english'], 'English')
+        self.assertEqual(d[KeyCollection(['en', 'english', 'en-US'])], 'English')
+        self.assertEqual(d.Group('en-US'), ('en', 'english', 'en-US'))
+        self.assertIn('en', d)
+        self.assertIn(FrozenKeyCollection(['fr']), d)
+        self.assertNotIn('de', d)
+        self.assertEqual(d.get('de', 'none'), 'none')
+        with self.assertRaises(KeyError): _ = d['de']
+
+        d['en-US'] = 'American'
+        self.assertEqual(d['en'], 'American')
+        self.assertEqual(len(d), 2)
+
+        d['de'] = 'German'
+        self.assertEqual(d.Group('de'), ('de',))
+        with self.assertRaises(ValueError): d[KeyCollection(['deutsch', 'de'])] = 'German'
+
+        del d['english']
+        self.assertNotIn('en', d)
+        self.assertEqual(set(d.Aliases), { 'fr', 'de' })
+        with self.assertRaises(KeyError): del d['english']
+
+        self.assertEqual(d.pop('fr'), 'French')
+        self.assertEqual(d.pop('fr', None), None)
+        self.assertEqual(d.setdefault('de', 'x'), 'German')
+        d.clear()
+        self.assertEqual(list(d.Aliases), [])
+
+    def test_regroup(self):
+        d = self.d
+        d.AddAlias('fr', 'french', 'fr-FR')
+        self.assertEqual(d['french'], 'French')
+        with self.assertRaises(ValueError): d.AddAlias('fr', 'en')
+
+        d.RemoveAlias('fr')
+        self.assertNotIn('fr', d)
+        self.assertEqual(d.Group('fr-FR'), ('french', 'fr-FR'))
+
+    def test_frozen(self):
+        group = FrozenKeyCollection(['a', 'b', 'a'])
+        self.assertEqual(group, ('a', 'b'))
+        self.assertEqual(hash(group), hash(('a', 'b')))
+        self.assertFalse(hasattr(group, '__dict__'))
+        self.assertIs(FrozenKeyCollection(group), group)
+        self.assertIs(copy.deepcopy(group), group)
+        self.assertEqual(pickle.loads(pickle.dumps(group)), group)
+        self.assertEqual(KeyCollection(['a', 'b']).Freeze(), group)
+        self.assertEqual(group.Thaw(), KeyCollection(['a', 'b']))
+
+    def test_copy(self):
+        for other in (pickle.loads(pickle.dumps(self.d)), copy.deepcopy(self.d), self.d.copy(), self.d.Clone(), BaseMultiDictModel.FromJson(self.d.ToJsonString())):
+            self.assertEqual(other, self.d)
+            self.assertEqual(other['english'], 'English')
+            other['de'] = 'German'
+            self.assertNotIn('de', self.d)
+
+    def test_json(self):
+        self.d['de'] = BaseDictModel(name='German')
+        for backend in JsonBackends.Names():
+            with self.subTest(backend=backend):
+                self.assertEqual(BaseMultiDictModel.FromJson(self.d.ToJsonString(backend=backend), backend=backend), self.d)
+
+        chunks = list(self.d.IterJsonChunks())
+        self.assertEqual(''.join(chunks), self.d.ToJsonString(backend='stdlib'))
+        self.assertGreater(len(chunks), len(self.d))  # one or more chunks per entry, not the whole document at once
+
+        stream = io.StringIO()
+        self.assertEqual(self.d.ToJsonStream(stream, buffer_size=1), len(stream.getvalue()))
+        self.assertEqual(stream.getvalue(), ''.join(chunks))
+
+
+
+class RequestDispatcher_TestCase(unittest.TestCase):
+    def test_request(self):
+        a = InternalRequest(Status.Active, 1, [2, 3], filters=dict(b=[1], a={ 2 }))
+        b = InternalRequest(Status.Active, 1, [2, 3], filters=dict(a={ 2 }, b=[1]))
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, InternalRequest(Status.Active, 1, [2, 3]))
+        self.assertNotEqual(a, InternalRequest(Status.Inactive, 1, [2, 3], filters=dict(b=[1], a={ 2 })))
+        self.assertEqual(len({ a, b }), 1)
+        self.assertEqual(repr(InternalRequest('refresh', 1, page=2)), "InternalRequest('refresh', 1, page=2)")
+
+        # equal in python, different arguments
+        for first, second in (([1], (1,)), (1, True), (1, 1.0), (0, False), ({ 1: 'a' }, { True: 'a' }), ({ 'a': [1] }, { 'a': (1,) }), ({ 1 }, frozenset({ 1 }))):
+            with self.subTest(first=first, second=second):
+                self.assertNotEqual(InternalRequest('get', first), InternalRequest('get', second))
+                self.assertNotEqual(InternalRequest('get', value=first), InternalRequest('get', value=second))
+        self.assertNotEqual(InternalRequest(1), InternalRequest(True))
+
+    def test_coalesce(self):
+        release = threading.Event()
+        calls = []
+
+        def handler(request: InternalRequest):
+            calls.append(request)
+            release.wait(5)
+            return request.kwargs['page'] * 10
+
+        with RequestDispatcher(handler, workers=2) as dispatcher:
+            futures = [dispatcher.Submit('refresh', page=1) for _ in range(10)] + [dispatcher.Submit(InternalRequest('refresh', page=2))]
+            self.assertEqual(dispatcher.InFlight, 2)
+            release.set()
+            self.assertEqual([future.result(5) for future in futures], [10] * 10 + [20])
+            self.assertIs(futures[0], futures[9])
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(dispatcher.Statistics, dict(requests=11, coalesced=9, executed=2, batches=2))
+
+            self.assertEqual(dispatcher.Call('refresh', page=1, timeout=5), 10)
+            self.assertEqual(len(calls), 3)
+
+        # equal in python, different requests: each gets its own result
+        release.clear()
+        with RequestDispatcher(lambda request: release.wait(5) and repr(request.args[0]), workers=5) as dispatcher:
+            futures = [dispatcher.Submit('get', value) for value in ([1], (1,), 1, True, 1.0)]
+            self.assertEqual(dispatcher.InFlight, 5)
+            release.set()
+            self.assertEqual([future.result(5) for future in futures], ['[1]', '(1,)', '1', 'True', '1.0'])
+
+    def test_window(self):
+        batches = []
+
+        def batch_handler(requests: List[InternalRequest]):
+            batches.append(requests)
+            return [request.args[0] * 2 for request in requests]
+
+        with RequestDispatcher(batch_handler=batch_handler, window=0.05) as dispatcher:
+            futures = [dispatcher.Submit('double', i % 5) for i in range(20)]
+            self.assertEqual([future.result(5) for future in futures], [i % 5 * 2 for i in range(20)])
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(dispatcher.Statistics, dict(requests=20, coalesced=15, executed=5, batches=1))
+
+        with RequestDispatcher(batch_handler=batch_handler, window=60, max_batch=3) as dispatcher:
+            self.assertEqual([future.result(5) for future in [dispatcher.Submit('double', i) for i in range(3)]], [0, 2, 4])
+
+    def test_errors(self):
+        def handler(request: InternalRequest): raise KeyError(request.Action)
+
+        with RequestDispatcher(handler) as dispatcher:
+            with self.assertRaises(KeyError): dispatcher.Call('missing')
+
+        with RequestDispatcher(batch_handler=lambda requests: [1], window=0.01) as dispatcher:
+            futures = [dispatcher.Submit('a'), dispatcher.Submit('b')]
+            for future in futures:
+                with self.assertRaises(ValueError): future.result(5)
+
+        with self.assertRaises(ValueError): RequestDispatcher()
+
+    def test_async(self):
+        calls = []
+
+        async def handler(request: InternalRequest):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return request.Action.upper()
+
+        async def run():
+            async with AsyncRequestDispatcher(handler) as dispatcher:
+                results = await asyncio.gather(*(dispatcher.Call('refresh') for _ in range(10)))
+                self.assertEqual(results, ['REFRESH'] * 10)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(dispatcher.Statistics['coalesced'], 9)
+
+            async with AsyncRequestDispatcher(batch_handler=lambda requests: [request.args[0] for request in requests], window=0.01) as dispatcher:
+                self.assertEqual(await asyncio.gather(*(dispatcher.Call('echo', i % 3) for i in range(9))), [i % 3 for i in range(9)])
+                self.assertEqual(dispatcher.Statistics, dict(requests=9, coalesced=6, executed=3, batches=1))
+
+        asyncio.run(run())
+
+
+
+class RequestBus_TestCase(unittest.TestCase):
+    def bus(self, **kwargs) -> Tuple[RequestBus, threading.Event, List]:
+        """ a single worker bus whose 'gate' action blocks the worker until the returned event is set """
+        gate, order = threading.Event(), []
+        bus = RequestBus(workers=1, **kwargs)
+        bus.Register('gate', lambda request: gate.wait(5), priority=0)
+        bus.Register('low', lambda request: order.append(request.args[0]), priority=2)
+        bus.Register('high', lambda request: order.append(request.args[0]), priority=0)
+        return bus, gate, order
+
+    def test_priority(self):
+        bus, gate, order = self.bus()
+        with bus:
+            bus.Post('gate')
+            while bus.Queued[0]: pass  # the worker is blocked in the gate
+
+            futures = [bus.Post('low', 1), bus.Post('low', 2), bus.Post('high', 3), bus.Submit(InternalRequest('low', 4), priority=0)]
+            self.assertEqual(bus.Queued, [2, 0, 2])
+            gate.set()
+            for future in futures: future.result(5)
+
+        self.assertEqual(order, [3, 4, 1, 2])
+        self.assertEqual(bus.Metrics('low').completed, 3)
+        self.assertEqual(bus.Workers, 1)
+
+    def test_backpressure(self):
+        bus, gate, order = self.bus(capacity=2, backpressure=Backpressure.Reject)
+        with bus:
+            bus.Post('gate')
+            while bus.Queued[0]: pass
+
+            bus.Post('low', 1)
+            bus.Post('low', 2)
+            with self.assertRaises(RequestRejectedError): bus.Post('low', 3)
+
+            bus.backpressure = Backpressure.DropOldest
+            first = bus.Post('high', 4)
+            bus.Post('high', 5)
+            bus.Post('high', 6)
+            self.assertTrue(first.cancelled())
+
+            bus.backpressure = Backpressure.Block
+            with self.assertRaises(RequestRejectedError): bus.Submit(InternalRequest('high', 7), timeout=0.01)
+            gate.set()
+
+        self.assertEqual(order, [5, 6, 1, 2])
+        self.assertEqual(bus.Metrics('high').dropped, 1)
+        self.assertEqual(bus.Metrics('high').rejected, 1)
+        self.assertEqual(bus.Metrics('low').rejected, 1)
+
+    def test_handlers(self):
+        with RequestBus(workers=2) as bus:
+            @bus.Register('fail')
+            def fail(request: InternalRequest): raise ValueError(request.args)
+
+            bus.Register('double', lambda request: request.args[0] * 2)
+            self.assertEqual([future.result(5) for future in [bus.Post('double', i) for i in range(10)]], [i * 2 for i in range(10)])
+            with self.assertRaises(ValueError): bus.Post('fail', 1).result(5)
+            with self.assertRaises(KeyError): bus.Post('missing')
+            with self.assertRaises(ValueError): bus.Register('bad', fail, priority=3)
+
+        metrics = bus.Metrics('double').ToDict()
+        self.assertEqual(metrics['completed'], 10)
+        self.assertGreaterEqual(metrics['p99'], metrics['p50'])
+        self.assertEqual(bus.Metrics('fail').failed, 1)
+        with self.assertRaises(RuntimeError): bus.Post('double', 1)
+